@@ -1,30 +1,48 @@
 """FinOps Assistant -- LangGraph agent with AG-UI event streaming.
 
 This agent uses a ReAct pattern to answer fintech operations questions.
+Well-known questions skip the first model call: the ``route`` node calls
+their tool directly (see app/intent_router.py); for the others, likely
+tools are prefetched while the model decides (see app/prefetch.py).
 It streams AG-UI protocol events back to the CopilotKit runtime.
 
-AG-UI Event Flow:
+AG-UI Event Flow (ordering contract in app/streaming.py):
 1. RUN_STARTED -- signals the beginning of an agent run
-2. TEXT_MESSAGE_START -> TEXT_MESSAGE_CONTENT (chunks) -> TEXT_MESSAGE_END -- streamed LLM response
-3. TOOL_CALL_START -> TOOL_CALL_END -- when the agent invokes a tool
-4. STATE_DELTA -- partial state updates pushed to the frontend
-5. RUN_FINISHED -- signals the run is complete
+2. Per model response:
+   TEXT_MESSAGE_START -> TEXT_MESSAGE_CONTENT* -> TEXT_MESSAGE_END -- streamed LLM text,
+   closed before the response's first tool call
+   -> TOOL_CALL_START -> TOOL_CALL_ARGS* -> TOOL_CALL_END -- per tool call
+   -> TOOL_CALL_RESULT -- per tool call, as soon as the tool returns.
+   A response that was not streamed is replayed in the same order: its text,
+   then its tool calls.
+3. STATE_DELTA -- partial state updates pushed to the frontend after each node
+4. RUN_FINISHED -- signals the run is complete
 """
 from __future__ import annotations
 
 import json
+import threading
 import uuid
 from typing import Any, Literal, TypedDict, Annotated
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import ToolNode
 
 from app.tools import get_transaction_summary, get_sla_compliance, get_payment_channel_breakdown
 from app.llm import get_llm
+from app.checkpoint import BoundedMemorySaver, TracedSaver
+from app.sqlite_checkpoint import SqliteSaver
+from app.compaction import COMPACTION_KEY, build_model_messages, compact
+from app.config import settings
+from app.intent_router import check_misroute, route_turn
+from app.model_calls import ainvoke_model
+from app.prefetch import prefetcher
+from app.tool_executor import make_tools_node
 
 
 # ---------------------------------------------------------------------------
@@ -34,8 +52,16 @@ from app.llm import get_llm
 class FinOpsState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
     tenant_id: str
+    # Full tool payloads for the UI by tool call id, from the last step calling
+    # the tool (the model reads digests, see app/digests.py)
     transaction_summary: dict
+    sla_compliance: dict
+    channel_breakdown: dict
     current_intent: str
+    # Ingestion index for incremental AG-UI history (see app/history.py)
+    agui_history: dict
+    # Context compaction cursor + summary (see app/compaction.py)
+    compaction: dict
 
 
 # ---------------------------------------------------------------------------
@@ -55,22 +81,61 @@ The current tenant is: {tenant_id}"""
 
 TOOLS = [get_transaction_summary, get_sla_compliance, get_payment_channel_breakdown]
 
+# State field receiving each tool's full payload
+TOOL_STATE_KEYS = {
+    "get_transaction_summary": "transaction_summary",
+    "get_sla_compliance": "sla_compliance",
+    "get_payment_channel_breakdown": "channel_breakdown",
+}
 
-def build_agent(llm: BaseChatModel | None = None) -> StateGraph:
+
+def build_agent(llm: BaseChatModel | None = None) -> CompiledStateGraph:
     """Construct the FinOps Assistant LangGraph graph."""
     if llm is None:
         llm = get_llm()
 
     llm_with_tools = llm.bind_tools(TOOLS)
+    tools_by_name = {t.name: t for t in TOOLS}
+
+    # --- node: keep the model's context within the token budget ---
+    def compact_context(state: FinOpsState) -> dict[str, Any]:
+        updated = compact(state["messages"], state.get(COMPACTION_KEY))
+        return {COMPACTION_KEY: updated} if updated is not None else {}
 
     # --- node: call the model ---
-    def call_model(state: FinOpsState) -> dict[str, Any]:
+    async def call_model(state: FinOpsState, config: RunnableConfig) -> dict[str, Any]:
         tenant_id = state.get("tenant_id", "tenant-demo-001")
-        system = SystemMessage(content=SYSTEM_PROMPT.format(tenant_id=tenant_id))
-        messages = [system] + state["messages"]
-        response = llm_with_tools.invoke(messages)
+        # Stable tenant system prompt, then the compaction summary and the
+        # recent turns (see app/compaction.py)
+        messages = build_model_messages(
+            SYSTEM_PROMPT.format(tenant_id=tenant_id),
+            state["messages"],
+            state.get(COMPACTION_KEY),
+        )
+        # Likely tool calls start while the model decides (see app/prefetch.py)
+        speculation = prefetcher.start(state["messages"], tenant_id, tools_by_name)
+        try:
+            # Async, concurrency-limited and retried on throttling (see app/model_calls.py)
+            response = await ainvoke_model(
+                llm_with_tools, messages, tenant_id=tenant_id, config=config,
+            )
+        except BaseException:
+            speculation.cancel()
+            raise
+        speculation.settle(response.tool_calls)
+        check_misroute(state["messages"], response)
         return {"messages": [response]}
 
+    # --- node: route well-known questions straight to their tool ---
+    async def route_intent(state: FinOpsState) -> dict[str, Any]:
+        if not settings.intent_router_enabled:
+            return {}
+        return route_turn(
+            state["messages"],
+            state.get("tenant_id", "tenant-demo-001"),
+            settings.intent_router_min_confidence,
+        )
+
     # --- routing ---
     def should_continue(state: FinOpsState) -> Literal["tools", "__end__"]:
         last = state["messages"][-1]
@@ -78,20 +143,70 @@ def build_agent(llm: BaseChatModel | None = None) -> StateGraph:
             return "tools"
         return "__end__"
 
+    def after_route(state: FinOpsState) -> Literal["tools", "agent"]:
+        last = state["messages"][-1]
+        if isinstance(last, AIMessage) and last.tool_calls:
+            return "tools"
+        return "agent"
+
     # --- build graph ---
-    tool_node = ToolNode(TOOLS)
+    # Runs all tool calls of one step concurrently (see app/tool_executor.py)
+    tool_node = make_tools_node(TOOLS, state_keys=TOOL_STATE_KEYS)
 
     graph = StateGraph(FinOpsState)
+    graph.add_node("compact", compact_context)
+    graph.add_node("route", route_intent)
     graph.add_node("agent", call_model)
     graph.add_node("tools", tool_node)
-    graph.set_entry_point("agent")
+    graph.set_entry_point("compact")
+    graph.add_edge("compact", "route")
+    graph.add_conditional_edges("route", after_route, {"tools": "tools", "agent": "agent"})
     graph.add_conditional_edges("agent", should_continue, {"tools": "tools", "__end__": END})
-    graph.add_edge("tools", "agent")
-
-    # CopilotKit SDK requires a checkpointer so it can call aget_state()
-    memory = MemorySaver()
-    return graph.compile(checkpointer=memory)
-
-
-# Singleton compiled graph
-agent_graph = build_agent()
+    graph.add_edge("tools", "compact")
+
+    # CopilotKit SDK requires a checkpointer so it can call aget_state().
+    # Reads and writes are traced per run (see app/telemetry.py).
+    return graph.compile(checkpointer=TracedSaver(build_checkpointer()))
+
+
+def build_checkpointer() -> BaseCheckpointSaver:
+    """Checkpointer selected by ``checkpoint_backend``.
+
+    ``memory`` (default) is bounded so long-running servers don't accumulate
+    every thread forever, but is private to the process. ``sqlite`` shares
+    threads between all workers on the node (see app/sqlite_checkpoint.py).
+    """
+    if settings.checkpoint_backend == "sqlite":
+        return SqliteSaver(
+            settings.checkpoint_sqlite_path,
+            batch_window_seconds=settings.checkpoint_sqlite_batch_ms / 1000,
+            cache_entries=settings.checkpoint_cache_entries,
+            thread_ttl_seconds=settings.checkpoint_thread_ttl_seconds,
+            max_checkpoints_per_thread=settings.checkpoint_max_per_thread,
+        )
+    if settings.checkpoint_backend != "memory":
+        raise ValueError(f"unknown checkpoint_backend: {settings.checkpoint_backend!r}")
+    return BoundedMemorySaver(
+        max_bytes=settings.checkpoint_max_bytes,
+        thread_ttl_seconds=settings.checkpoint_thread_ttl_seconds,
+        max_checkpoints_per_thread=settings.checkpoint_max_per_thread,
+    )
+
+
+# Singleton compiled graph, built on first use (see app/warmup.py)
+_agent_graph: CompiledStateGraph | None = None
+_agent_graph_lock = threading.Lock()
+
+
+def get_agent_graph() -> CompiledStateGraph:
+    """Build (once) and return the compiled graph.
+
+    Blocking: constructs the model client and opens the checkpointer. Async
+    callers go through ``app.warmup.agent_graph`` so the event loop isn't held.
+    """
+    global _agent_graph
+    if _agent_graph is None:
+        with _agent_graph_lock:
+            if _agent_graph is None:
+                _agent_graph = build_agent()
+    return _agent_graph
@@ -0,0 +1,236 @@
+"""Batch runs: many (tenant, prompt) jobs in one request, streamed as NDJSON.
+
+Nightly reports ask the agent the same questions for hundreds of tenants;
+through ``/agui`` that is one SSE session per tenant and question. ``POST
+/batch`` (see app/main.py) takes the whole job list instead:
+
+- jobs run on the agent graph with at most ``concurrency`` in flight
+  (``batch_max_concurrency`` caps it), each admitted through the run
+  scheduler (app/scheduler.py) like an interactive run, so a batch can't
+  starve ``/agui`` traffic or another tenant;
+- tool calls go through the shared tool result cache (app/cache.py), so
+  jobs asking for the same tenant data reuse one computation; identical
+  (tenant, prompt) jobs are run once;
+- one JSON line is streamed per job as it finishes, then a summary line;
+  both report the tool cache hits / misses of the tool calls the batch
+  itself ran (``toolCache``);
+- every job runs on its own checkpointed thread
+  ``batch:<batchId>:<jobId>``. Re-posting the same ``batchId`` and jobs
+  resumes the batch: finished jobs are answered from their checkpoint,
+  interrupted ones continue from their last completed step.
+
+Job ids default to a hash of tenant and prompt, so a resubmitted job list
+maps onto the same threads. Resuming needs the checkpoints to still exist:
+use the SQLite checkpointer (app/sqlite_checkpoint.py) to resume across
+restarts, and keep ``checkpoint_thread_ttl_seconds`` above the batch time.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app import telemetry
+from app.compaction import COMPACTION_KEY
+from app.history import HISTORY_INDEX_KEY
+from app.scheduler import QueueFull, Ticket, scheduler
+from app.streaming import content_text
+
+if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
+
+# Graph state keys left out of a job's ``data``
+INTERNAL_STATE_KEYS = {"messages", HISTORY_INDEX_KEY, COMPACTION_KEY}
+
+
+class BatchRequestError(ValueError):
+    """The batch request body is malformed."""
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    job_id: str
+    tenant_id: str
+    prompt: str
+
+
+def default_job_id(tenant_id: str, prompt: str) -> str:
+    return hashlib.sha256(f"{tenant_id}\0{prompt}".encode()).hexdigest()[:16]
+
+
+def parse_jobs(raw_jobs: Any, default_tenant_id: str) -> list[BatchJob]:
+    """Validate the ``jobs`` list.
+
+    Identical jobs (same id, tenant and prompt) are kept once; an id reused
+    for a different tenant or prompt is an error.
+    """
+    if not isinstance(raw_jobs, list) or not raw_jobs:
+        raise BatchRequestError("jobs must be a non-empty list")
+    jobs: dict[str, BatchJob] = {}
+    for i, raw in enumerate(raw_jobs):
+        if not isinstance(raw, dict) or not isinstance(raw.get("prompt"), str):
+            raise BatchRequestError(f"jobs[{i}] must be an object with a prompt")
+        tenant_id = raw.get("tenantId") or default_tenant_id
+        job_id = str(raw.get("id") or default_job_id(tenant_id, raw["prompt"]))
+        job = jobs.setdefault(job_id, BatchJob(job_id, tenant_id, raw["prompt"]))
+        if (job.tenant_id, job.prompt) != (tenant_id, raw["prompt"]):
+            raise BatchRequestError(f"jobs[{i}] reuses id {job_id!r} for a different job")
+    return list(jobs.values())
+
+
+def parse_concurrency(raw: Any, maximum: int) -> int:
+    """Validate ``concurrency``: a positive integer, capped at ``maximum``."""
+    if raw is None:
+        return maximum
+    if isinstance(raw, bool) or not isinstance(raw, int) or raw < 1:
+        raise BatchRequestError("concurrency must be a positive integer")
+    return min(raw, maximum)
+
+
+def job_config(batch_id: str, job: BatchJob) -> dict[str, Any]:
+    return {"configurable": {"thread_id": f"batch:{batch_id}:{job.job_id}"}}
+
+
+def job_result(values: dict[str, Any]) -> dict[str, Any]:
+    """Answer, tools used and UI state of a finished job thread."""
+    messages = values.get("messages", [])
+    # The job's turn starts at its (only) human message
+    start = next((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), 0)
+    turn = messages[start:]
+    answer = next(
+        (content_text(m.content) for m in reversed(turn)
+         if isinstance(m, AIMessage) and not m.tool_calls),
+        "",
+    )
+    return {
+        "answer": answer,
+        "tools": [m.name for m in turn if isinstance(m, ToolMessage)],
+        "data": {k: v for k, v in values.items() if k not in INTERNAL_STATE_KEYS},
+    }
+
+
+def tool_cache_counts(messages: list[Any]) -> dict[str, int]:
+    """Cache hits / misses reported on the cached tool results in ``messages``."""
+    counts = {"hits": 0, "misses": 0}
+    for m in messages:
+        if not isinstance(m, ToolMessage) or not isinstance(m.artifact, dict):
+            continue
+        cache = m.artifact.get("cache")
+        if cache:
+            counts["hits" if cache["hit"] else "misses"] += 1
+    return counts
+
+
+async def _admit(tenant_id: str) -> Ticket:
+    """A granted scheduler ticket; waits (and retries a full queue) as needed."""
+    while True:
+        try:
+            ticket = scheduler.admit(tenant_id)
+        except QueueFull as e:
+            await asyncio.sleep(e.retry_after_seconds)
+            continue
+        try:
+            while not ticket.granted:
+                await scheduler.wait(ticket)
+        except BaseException:
+            scheduler.release(ticket)
+            raise
+        return ticket
+
+
+async def run_job(graph: CompiledStateGraph, batch_id: str, job: BatchJob) -> dict[str, Any]:
+    """Run (or resume) one job on its thread; never raises for job errors."""
+    config = job_config(batch_id, job)
+    line: dict[str, Any] = {"type": "job", "jobId": job.job_id, "tenantId": job.tenant_id}
+    trace = telemetry.start_run(f"{batch_id}:{job.job_id}", job.tenant_id)
+    started = time.perf_counter()
+    with trace.running():
+        try:
+            snapshot = await graph.aget_state(config)
+            if snapshot.values.get("messages") and not snapshot.next:
+                line["status"] = "ok"
+                line["resumed"] = "done"
+                trace.outcome = "resumed"
+                line.update(job_result(snapshot.values))
+                return line
+            # Tool results this run adds start after the checkpointed messages
+            seen = len(snapshot.values.get("messages", []))
+            ticket = await _admit(job.tenant_id)
+            try:
+                if snapshot.next:
+                    # Interrupted earlier: continue from the last completed step
+                    line["resumed"] = "continued"
+                    values = await graph.ainvoke(None, config)
+                else:
+                    graph_input = {
+                        "messages": [HumanMessage(content=job.prompt)],
+                        "tenant_id": job.tenant_id,
+                    }
+                    values = await graph.ainvoke(graph_input, config)
+            finally:
+                scheduler.release(ticket)
+            line["status"] = "ok"
+            trace.outcome = "ok"
+            line.update(job_result(values))
+            line["toolCache"] = tool_cache_counts(values.get("messages", [])[seen:])
+        except Exception as e:
+            trace.outcome = "error"
+            line["status"] = "error"
+            line["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            line["durationMs"] = round((time.perf_counter() - started) * 1000, 3)
+    return line
+
+
+async def run_batch(
+    graph: CompiledStateGraph, batch_id: str, jobs: list[BatchJob], concurrency: int,
+) -> AsyncIterator[dict[str, Any]]:
+    """Yield a ``batch_started`` line, one line per job as it finishes, then
+    a ``batch_finished`` summary."""
+    started = time.perf_counter()
+    pending: asyncio.Queue[BatchJob] = asyncio.Queue()
+    for job in jobs:
+        pending.put_nowait(job)
+    done: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    async def worker() -> None:
+        while not pending.empty():
+            job = pending.get_nowait()
+            await done.put(await run_job(graph, batch_id, job))
+
+    yield {"type": "batch_started", "batchId": batch_id, "jobs": len(jobs)}
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(jobs))))]
+    counts = {"ok": 0, "error": 0, "resumed": 0}
+    cache_counts = {"hits": 0, "misses": 0}
+    try:
+        for _ in jobs:
+            line = await done.get()
+            counts[line["status"]] += 1
+            counts["resumed"] += "resumed" in line
+            for name, n in line.get("toolCache", {}).items():
+                cache_counts[name] += n
+            yield line
+    finally:
+        # Also reached when the client goes away: unfinished jobs keep their
+        # checkpoints and resume on the next submission
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    yield {
+        "type": "batch_finished",
+        "batchId": batch_id,
+        **counts,
+        "durationMs": round((time.perf_counter() - started) * 1000, 3),
+        "toolCache": cache_counts,
+    }
+
+
+def new_batch_id() -> str:
+    return uuid.uuid4().hex
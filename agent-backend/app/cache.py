@@ -0,0 +1,250 @@
+"""Tenant-scoped tool result cache with per-tool TTL and single-flight.
+
+Tool results are keyed by ``(tool name, tenant_id, normalized args)``. Each
+cached tool declares its own TTL; the cache as a whole is an LRU bounded by
+entry count. Concurrent identical calls share a single in-flight computation
+(threads wait on an event, coroutines await a shared future).
+
+Cached tools return ``(result, artifact)`` so they can be declared with
+``@tool(response_format="content_and_artifact")``: the model only sees the
+result, while the artifact's ``cache`` entry ends up on the ``ToolMessage``
+and is reported in the ``TOOL_CALL_RESULT`` event.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from app.config import settings
+
+CacheKey = tuple[str, str, str]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    created_at: float
+    expires_at: float
+
+
+@dataclass
+class _Flight:
+    """A computation in progress that identical callers can join."""
+
+    event: threading.Event = field(default_factory=threading.Event)
+    future: asyncio.Future | None = None
+    entry: _Entry | None = None
+    error: BaseException | None = None
+
+
+def cache_info(hit: bool, entry: _Entry, coalesced: bool = False) -> dict[str, Any]:
+    return {
+        "hit": hit,
+        "coalesced": coalesced,
+        "age_seconds": round(max(time.time() - entry.created_at, 0.0), 3),
+        "expires_in_seconds": round(max(entry.expires_at - time.monotonic(), 0.0), 3),
+    }
+
+
+class ToolResultCache:
+    """LRU cache of tool results with TTL expiry and single-flight loading."""
+
+    def __init__(self, max_entries: int = 1024, enabled: bool = True) -> None:
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._inflight: dict[CacheKey, _Flight] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    # -- stats / maintenance ------------------------------------------------
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def has(self, key: CacheKey) -> bool:
+        """True if ``key`` is fresh or being computed; not counted in the stats."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return key in self._inflight or (
+                entry is not None and entry.expires_at > time.monotonic()
+            )
+
+    # -- keys ---------------------------------------------------------------
+
+    @staticmethod
+    def make_key(tool_name: str, tenant_id: str, args: dict[str, Any]) -> CacheKey:
+        normalized = {
+            k: v.strip() if isinstance(v, str) else v
+            for k, v in args.items()
+            if k != "tenant_id"
+        }
+        return tool_name, tenant_id, json.dumps(normalized, sort_keys=True, default=str)
+
+    # -- lookup / store (caller holds the lock) ------------------------------
+
+    def _lookup(self, key: CacheKey) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: CacheKey, value: Any, ttl_seconds: float) -> _Entry:
+        now = time.monotonic()
+        entry = _Entry(value=value, created_at=time.time(), expires_at=now + ttl_seconds)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+        return entry
+
+    def _join(
+        self, key: CacheKey, loop: asyncio.AbstractEventLoop | None = None,
+    ) -> tuple[_Entry | None, _Flight, bool]:
+        """Return (fresh entry, flight, is_leader) for ``key``."""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self._counters["hits"] += 1
+                return entry, _Flight(), False
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self._counters["coalesced"] += 1
+                return None, flight, False
+            self._counters["misses"] += 1
+            flight = self._inflight[key] = _Flight()
+            if loop is not None:
+                flight.future = loop.create_future()
+            return None, flight, True
+
+    def _finish(self, key: CacheKey, flight: _Flight, ttl_seconds: float, value: Any = None,
+                error: BaseException | None = None) -> None:
+        with self._lock:
+            if error is None:
+                flight.entry = self._store(key, value, ttl_seconds)
+            else:
+                flight.error = error
+            self._inflight.pop(key, None)
+        flight.event.set()
+
+    # -- loading ------------------------------------------------------------
+
+    def get_or_compute(
+        self, key: CacheKey, ttl_seconds: float, compute: Callable[[], Any],
+    ) -> tuple[Any, dict[str, Any]]:
+        while True:
+            entry, flight, leader = self._join(key)
+            if entry is not None:
+                return entry.value, cache_info(True, entry)
+            if leader:
+                break
+            flight.event.wait()
+            if flight.entry is not None:
+                return flight.entry.value, cache_info(True, flight.entry, coalesced=True)
+            if not isinstance(flight.error, asyncio.CancelledError):
+                raise flight.error
+            # The leader was cancelled (e.g. timed out); retry, possibly as leader
+
+        try:
+            value = compute()
+        except BaseException as e:
+            self._finish(key, flight, ttl_seconds, error=e)
+            raise
+        self._finish(key, flight, ttl_seconds, value=value)
+        return value, cache_info(False, flight.entry)
+
+    async def aget_or_compute(
+        self, key: CacheKey, ttl_seconds: float, compute: Callable[[], Any],
+    ) -> tuple[Any, dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        while True:
+            entry, flight, leader = self._join(key, loop)
+            if entry is not None:
+                return entry.value, cache_info(True, entry)
+            if leader:
+                break
+            if flight.future is not None and flight.future.get_loop() is loop:
+                await asyncio.shield(flight.future)
+            else:
+                # Leader runs in another thread / loop; don't block this loop
+                await asyncio.to_thread(flight.event.wait)
+            if flight.entry is not None:
+                return flight.entry.value, cache_info(True, flight.entry, coalesced=True)
+            if not isinstance(flight.error, asyncio.CancelledError):
+                raise flight.error
+            # The leader was cancelled (e.g. timed out); retry, possibly as leader
+
+        try:
+            value = await compute()
+        except BaseException as e:
+            self._finish(key, flight, ttl_seconds, error=e)
+            flight.future.set_result(None)
+            raise
+        self._finish(key, flight, ttl_seconds, value=value)
+        flight.future.set_result(None)
+        return value, cache_info(False, flight.entry)
+
+    # -- decorator ----------------------------------------------------------
+
+    def cached(self, ttl_seconds: float) -> Callable[[Callable], Callable]:
+        """Cache a tool function's result per tenant for ``ttl_seconds``.
+
+        The wrapped function returns ``(result, {"cache": {...}})``; declare the
+        tool with ``response_format="content_and_artifact"``.
+        """
+        def decorator(fn: Callable) -> Callable:
+            signature = inspect.signature(fn)
+            name = fn.__name__
+
+            def key_for(args: tuple, kwargs: dict) -> CacheKey:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                params = dict(bound.arguments)
+                return self.make_key(name, str(params.get("tenant_id", "")), params)
+
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> tuple[Any, dict]:
+                    if not self.enabled:
+                        return await fn(*args, **kwargs), {}
+                    value, info = await self.aget_or_compute(
+                        key_for(args, kwargs), ttl_seconds, lambda: fn(*args, **kwargs),
+                    )
+                    return value, {"cache": info}
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> tuple[Any, dict]:
+                if not self.enabled:
+                    return fn(*args, **kwargs), {}
+                value, info = self.get_or_compute(
+                    key_for(args, kwargs), ttl_seconds, lambda: fn(*args, **kwargs),
+                )
+                return value, {"cache": info}
+            return wrapper
+
+        return decorator
+
+
+# Shared cache used by app/tools.py
+tool_cache = ToolResultCache(
+    max_entries=settings.tool_cache_max_entries,
+    enabled=settings.tool_cache_enabled,
+)
@@ -0,0 +1,455 @@
+"""Bounded in-process checkpointer for the FinOps agent graph.
+
+``MemorySaver`` keeps every checkpoint of every thread forever. This saver
+keeps the same in-memory model but bounds it:
+
+- a global memory budget (serialized bytes); least-recently-used threads are
+  evicted when the budget is exceeded
+- an idle TTL per thread; threads not read or written within the TTL expire
+- a cap on checkpoints kept per thread; older checkpoints (and their pending
+  writes) are pruned as new ones arrive
+
+Each stored checkpoint is self-contained (channel values are serialized with
+it), so pruning history never breaks ``get_tuple`` / ``aget_state()`` for the
+latest checkpoint.
+
+``TracedSaver`` wraps any saver and times its reads and writes as
+``checkpoint.<op>`` spans of the current run (see app/telemetry.py).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from app import telemetry
+
+# (type, bytes) pair produced by ``SerializerProtocol.dumps_typed``
+Typed = tuple[str, bytes]
+
+
+@dataclass
+class _StoredCheckpoint:
+    checkpoint: Typed
+    metadata: Typed
+    parent_id: str | None
+    # (task_id, write idx) -> (task_id, channel, value, task_path)
+    writes: dict[tuple[str, int], tuple[str, str, Typed, str]] = field(default_factory=dict)
+    nbytes: int = 0
+
+
+@dataclass
+class _ThreadEntry:
+    # checkpoint_ns -> checkpoint_id -> stored checkpoint (insertion == id order)
+    namespaces: dict[str, OrderedDict[str, _StoredCheckpoint]] = field(default_factory=dict)
+    last_access: float = 0.0
+    nbytes: int = 0
+
+
+class BoundedMemorySaver(BaseCheckpointSaver[str]):
+    """In-memory checkpoint saver with LRU, idle-TTL and per-thread bounds.
+
+    Args:
+        max_bytes: Global budget for serialized checkpoint data. ``0`` disables it.
+        thread_ttl_seconds: Idle time after which a thread is dropped. ``0`` disables it.
+        max_checkpoints_per_thread: Checkpoints kept per thread and namespace.
+            ``0`` keeps them all.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = 256 * 1024 * 1024,
+        thread_ttl_seconds: float = 3600.0,
+        max_checkpoints_per_thread: int = 10,
+        serde: SerializerProtocol | None = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.max_bytes = max_bytes
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+
+        # LRU order: least recently used thread first
+        self._threads: OrderedDict[str, _ThreadEntry] = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions_lru": 0,
+            "evictions_ttl": 0,
+            "checkpoints_pruned": 0,
+        }
+
+    # -- stats --------------------------------------------------------------
+
+    def stats(self) -> dict[str, int]:
+        """Return counters plus the current size of the store."""
+        with self._lock:
+            return {
+                **self._counters,
+                "threads": len(self._threads),
+                "bytes_held": self._bytes,
+            }
+
+    # -- internals ----------------------------------------------------------
+
+    def _touch(self, thread_id: str, *, create: bool) -> _ThreadEntry | None:
+        """Expire idle threads, then return ``thread_id``'s entry as MRU."""
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            if not create:
+                return None
+            entry = self._threads[thread_id] = _ThreadEntry()
+        else:
+            self._threads.move_to_end(thread_id)
+        entry.last_access = now
+        return entry
+
+    def _expire(self, now: float) -> None:
+        if self.thread_ttl_seconds <= 0:
+            return
+        cutoff = now - self.thread_ttl_seconds
+        while self._threads:
+            thread_id, entry = next(iter(self._threads.items()))
+            if entry.last_access >= cutoff:
+                break
+            self._drop_thread(thread_id)
+            self._counters["evictions_ttl"] += 1
+
+    def _enforce_budget(self, keep: str) -> None:
+        if self.max_bytes <= 0:
+            return
+        while self._bytes > self.max_bytes and len(self._threads) > 1:
+            thread_id = next(iter(self._threads))
+            if thread_id == keep:
+                break
+            self._drop_thread(thread_id)
+            self._counters["evictions_lru"] += 1
+
+    def _drop_thread(self, thread_id: str) -> None:
+        entry = self._threads.pop(thread_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _resize(self, entry: _ThreadEntry, stored: _StoredCheckpoint, delta: int) -> None:
+        stored.nbytes += delta
+        entry.nbytes += delta
+        self._bytes += delta
+
+    def _prune(self, entry: _ThreadEntry, checkpoints: OrderedDict[str, _StoredCheckpoint]) -> None:
+        limit = self.max_checkpoints_per_thread
+        if limit <= 0:
+            return
+        while len(checkpoints) > limit:
+            _, stored = checkpoints.popitem(last=False)
+            entry.nbytes -= stored.nbytes
+            self._bytes -= stored.nbytes
+            self._counters["checkpoints_pruned"] += 1
+
+    def _to_tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        stored: _StoredCheckpoint,
+        metadata: CheckpointMetadata | None = None,
+    ) -> CheckpointTuple:
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed(stored.checkpoint),
+            metadata=metadata if metadata is not None else self.serde.loads_typed(stored.metadata),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": stored.parent_id,
+                    }
+                }
+                if stored.parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for task_id, channel, value, _ in stored.writes.values()
+            ],
+        )
+
+    # -- BaseCheckpointSaver API --------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            entry = self._touch(thread_id, create=False)
+            checkpoints = entry.namespaces.get(checkpoint_ns) if entry else None
+            if not checkpoints:
+                self._counters["misses"] += 1
+                return None
+            checkpoint_id = get_checkpoint_id(config) or next(reversed(checkpoints))
+            stored = checkpoints.get(checkpoint_id)
+            if stored is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            return self._to_tuple(thread_id, checkpoint_ns, checkpoint_id, stored)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        config_ns = config["configurable"].get("checkpoint_ns") if config else None
+        config_checkpoint_id = get_checkpoint_id(config) if config else None
+        before_id = get_checkpoint_id(before) if before else None
+
+        # Snapshot matching records under the lock; deserialize outside it
+        with self._lock:
+            if config:
+                entry = self._touch(config["configurable"]["thread_id"], create=False)
+                entries = [(config["configurable"]["thread_id"], entry)] if entry else []
+            else:
+                entries = list(self._threads.items())
+            records = [
+                (thread_id, ns, checkpoint_id, stored)
+                for thread_id, entry in entries
+                for ns, checkpoints in entry.namespaces.items()
+                if config_ns is None or ns == config_ns
+                for checkpoint_id, stored in reversed(checkpoints.items())
+                if (not config_checkpoint_id or checkpoint_id == config_checkpoint_id)
+                and (not before_id or checkpoint_id < before_id)
+            ]
+
+        for thread_id, ns, checkpoint_id, stored in records:
+            if limit is not None and limit <= 0:
+                break
+            metadata = self.serde.loads_typed(stored.metadata)
+            if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield self._to_tuple(thread_id, ns, checkpoint_id, stored, metadata)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = _StoredCheckpoint(
+            checkpoint=self.serde.dumps_typed(checkpoint),
+            metadata=self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+            parent_id=config["configurable"].get("checkpoint_id"),
+        )
+        size = len(stored.checkpoint[1]) + len(stored.metadata[1])
+
+        with self._lock:
+            entry = self._touch(thread_id, create=True)
+            checkpoints = entry.namespaces.setdefault(checkpoint_ns, OrderedDict())
+            previous = checkpoints.pop(checkpoint["id"], None)
+            if previous is not None:
+                self._resize(entry, previous, -previous.nbytes)
+            checkpoints[checkpoint["id"]] = stored
+            self._resize(entry, stored, size)
+            self._prune(entry, checkpoints)
+            self._enforce_budget(keep=thread_id)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self._lock:
+            entry = self._touch(thread_id, create=False)
+            checkpoints = entry.namespaces.get(checkpoint_ns) if entry else None
+            stored = checkpoints.get(checkpoint_id) if checkpoints else None
+            if entry is None or stored is None:
+                # Checkpoint was evicted or pruned; nothing left to attach to.
+                return
+            for idx, (channel, value) in enumerate(writes):
+                key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if key[1] >= 0 and key in stored.writes:
+                    continue
+                typed = self.serde.dumps_typed(value)
+                stored.writes[key] = (task_id, channel, typed, task_path)
+                self._resize(entry, stored, len(typed[1]))
+            self._enforce_budget(keep=thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_thread(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+
+class TracedSaver(BaseCheckpointSaver):
+    """Delegating saver that traces every read and write of ``inner``."""
+
+    def __init__(self, inner: BaseCheckpointSaver) -> None:
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+
+    @property
+    def config_specs(self) -> list:
+        return self.inner.config_specs
+
+    def stats(self) -> dict[str, int]:
+        return self.inner.stats() if hasattr(self.inner, "stats") else {}
+
+    def get_next_version(self, current: Any, channel: Any) -> Any:
+        return self.inner.get_next_version(current, channel)
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        with telemetry.span("checkpoint.get"):
+            return self.inner.get_tuple(config)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        with telemetry.span("checkpoint.list"):
+            yield from self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with telemetry.span("checkpoint.put"):
+            return self.inner.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with telemetry.span("checkpoint.put_writes"):
+            self.inner.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.inner.delete_thread(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        with telemetry.span("checkpoint.get"):
+            return await self.inner.aget_tuple(config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        with telemetry.span("checkpoint.list"):
+            async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+                yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with telemetry.span("checkpoint.put"):
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with telemetry.span("checkpoint.put_writes"):
+            await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.inner.adelete_thread(thread_id)
@@ -0,0 +1,239 @@
+"""Context-window compaction for long threads.
+
+``call_model`` used to send ``[system] + state["messages"]`` on every hop, so
+prompt size (and cost and model latency) grew with the whole conversation,
+including every verbose tool payload from earlier turns. The graph now runs a
+``compact`` node before each model call that keeps the model's view within
+``context_max_tokens``:
+
+- Turns older than the last ``context_keep_recent_turns`` are folded, oldest
+  first, into a short extractive summary (user question, tools called with a
+  digest of their result, start of the answer) until the view fits. A turn
+  starts at a user message, so a tool call is never separated from its
+  result and the in-progress turn is always kept whole.
+- ``ToolMessage`` payloads from earlier turns are sent as compact digests
+  (scalar fields kept, lists and nested objects summarized); results of the
+  current turn are sent verbatim.
+- The summary is appended after the tenant ``SYSTEM_PROMPT``, so the prompt
+  prefix stays byte-identical across hops and runs and provider-side prompt
+  caching can reuse it. The summary itself only changes when compaction
+  advances.
+
+Compaction never rewrites ``state["messages"]``: the checkpoint keeps the
+full transcript (the AG-UI history index matches against it), and the
+compaction cursor and summary live in their own state key.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from app.config import settings
+from app.streaming import content_text
+
+# Graph state key holding the compaction cursor and summary
+COMPACTION_KEY = "compaction"
+
+# Rough token estimate: ~4 characters per token plus per-message overhead
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_HEADER = "Summary of earlier conversation (older turns compacted):"
+# Characters kept per item in summary lines
+SUMMARY_ITEM_CHARS = 200
+
+
+def estimate_tokens(msg: BaseMessage) -> int:
+    chars = len(content_text(msg.content))
+    for tc in getattr(msg, "tool_calls", None) or []:
+        chars += len(tc.get("name", "")) + len(json.dumps(tc.get("args", {})))
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+# ---------------------------------------------------------------------------
+# Tool result digests
+# ---------------------------------------------------------------------------
+
+def _digest_value(value: Any, depth: int) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return _clip(value, 80) if isinstance(value, str) else value
+    if isinstance(value, list):
+        return f"<{len(value)} items>"
+    if isinstance(value, dict):
+        if depth == 0:
+            return f"<{len(value)} fields>"
+        return {k: _digest_value(v, depth - 1) for k, v in value.items()}
+    return str(value)
+
+
+def digest_tool_content(content: Any, max_chars: int | None = None) -> str:
+    """Compact stand-in for a stale tool payload."""
+    if max_chars is None:
+        max_chars = settings.context_tool_digest_chars
+    text = content if isinstance(content, str) else json.dumps(content)
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return _clip(text, max_chars)
+    digest = json.dumps(_digest_value(data, depth=1), separators=(",", ":"))
+    return "[digest] " + _clip(digest, max_chars)
+
+
+def _with_digest(msg: ToolMessage) -> ToolMessage:
+    return msg.model_copy(update={"content": digest_tool_content(msg.content)})
+
+
+# ---------------------------------------------------------------------------
+# Turns and summaries
+# ---------------------------------------------------------------------------
+
+def _turn_starts(messages: Sequence[BaseMessage]) -> list[int]:
+    """Indices of the user messages that open each turn."""
+    return [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+
+
+def summarize_turn(turn: Sequence[BaseMessage]) -> list[str]:
+    """Extractive summary lines for one folded turn."""
+    lines: list[str] = []
+    results = {m.tool_call_id: m for m in turn if isinstance(m, ToolMessage)}
+    for msg in turn:
+        if isinstance(msg, HumanMessage):
+            lines.append(f"- User: {_clip(content_text(msg.content), SUMMARY_ITEM_CHARS)}")
+        elif isinstance(msg, AIMessage):
+            for tc in msg.tool_calls:
+                args = json.dumps(tc.get("args", {}), separators=(",", ":"))
+                result = results.get(tc.get("id"))
+                outcome = (
+                    digest_tool_content(result.content, SUMMARY_ITEM_CHARS)
+                    if result is not None else "(no result)"
+                )
+                lines.append(f"  - Called {tc.get('name')}({args}) -> {outcome}")
+            text = content_text(msg.content)
+            if text:
+                lines.append(f"  - Assistant: {_clip(text, SUMMARY_ITEM_CHARS)}")
+    return lines
+
+
+def _summary_text(lines: Sequence[str]) -> str:
+    return SUMMARY_HEADER + "\n" + "\n".join(lines) if lines else ""
+
+
+def _trim_summary(lines: list[str], omitted: int, max_tokens: int) -> tuple[list[str], int]:
+    """Drop the oldest turns' lines until the summary fits ``max_tokens``."""
+    while lines and len(_summary_text(lines)) // CHARS_PER_TOKEN > max_tokens:
+        # A turn's lines start with "- User:"; drop through the next one
+        end = next((i for i in range(1, len(lines)) if lines[i].startswith("- ")), len(lines))
+        del lines[:end]
+        omitted += 1
+    return lines, omitted
+
+
+# ---------------------------------------------------------------------------
+# Graph integration
+# ---------------------------------------------------------------------------
+
+def _visible(messages: Sequence[BaseMessage], compaction: dict[str, Any] | None) -> int:
+    """Index of the first message not folded into the summary."""
+    through = (compaction or {}).get("through_id")
+    if not through:
+        return 0
+    for i, msg in enumerate(messages):
+        if msg.id == through:
+            return i + 1
+    return -1  # cursor no longer in the transcript (history was rebuilt)
+
+
+def model_view(messages: Sequence[BaseMessage], start: int) -> list[BaseMessage]:
+    """Messages sent to the model: unfolded turns, stale tool payloads digested."""
+    view = list(messages[start:])
+    starts = _turn_starts(view)
+    current = starts[-1] if starts else 0
+    return [
+        _with_digest(m) if isinstance(m, ToolMessage) and i < current else m
+        for i, m in enumerate(view)
+    ]
+
+
+def compact(
+    messages: Sequence[BaseMessage],
+    compaction: dict[str, Any] | None,
+    *,
+    max_tokens: int | None = None,
+    keep_recent_turns: int | None = None,
+    summary_max_tokens: int | None = None,
+) -> dict[str, Any] | None:
+    """Advance the compaction cursor until the model view fits the budget.
+
+    Returns the new compaction state, or None if nothing changed.
+    """
+    if max_tokens is None:
+        max_tokens = settings.context_max_tokens
+    if keep_recent_turns is None:
+        keep_recent_turns = settings.context_keep_recent_turns
+    if summary_max_tokens is None:
+        summary_max_tokens = settings.context_summary_max_tokens
+    if max_tokens <= 0:
+        return None
+
+    start = _visible(messages, compaction)
+    reset = start < 0
+    if reset:
+        compaction, start = None, 0
+    lines = list((compaction or {}).get("summary_lines", []))
+    omitted = (compaction or {}).get("omitted_turns", 0)
+
+    view = model_view(messages, start)
+    summary_tokens = len(_summary_text(lines)) // CHARS_PER_TOKEN
+    total = summary_tokens + sum(estimate_tokens(m) for m in view)
+    if total <= max_tokens and not reset:
+        return None
+
+    starts = [start + i for i in _turn_starts(messages[start:])]
+    # Turns that may be folded: all but the most recent ``keep_recent_turns``
+    # (the in-progress turn is always one of those kept).
+    foldable = starts[:max(len(starts) - max(keep_recent_turns, 1), 0)]
+    through_id = (compaction or {}).get("through_id")
+    for n in range(len(foldable)):
+        if total <= max_tokens:
+            break
+        # Messages before the first user message (if any) fold with that turn
+        turn_end = starts[n + 1]
+        lines.extend(summarize_turn(messages[start:turn_end]))
+        lines, omitted = _trim_summary(lines, omitted, summary_max_tokens)
+        start = turn_end
+        through_id = messages[turn_end - 1].id
+        view = model_view(messages, start)
+        total = len(_summary_text(lines)) // CHARS_PER_TOKEN + sum(estimate_tokens(m) for m in view)
+
+    if through_id == (compaction or {}).get("through_id") and not reset:
+        return None
+    return {"through_id": through_id, "summary_lines": lines, "omitted_turns": omitted}
+
+
+def build_model_messages(
+    system_prompt: str,
+    messages: Sequence[BaseMessage],
+    compaction: dict[str, Any] | None,
+) -> list[BaseMessage]:
+    """``[system] + view``: stable system prefix, then the compaction summary."""
+    start = max(_visible(messages, compaction), 0)
+    lines = (compaction or {}).get("summary_lines", []) if start else []
+    system = system_prompt
+    if lines:
+        omitted = (compaction or {}).get("omitted_turns", 0)
+        note = f"\n({omitted} earlier turns omitted)" if omitted else ""
+        system = f"{system_prompt}\n\n{_summary_text(lines)}{note}"
+    return [SystemMessage(content=system)] + model_view(messages, start)
@@ -9,6 +9,99 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
 
+    # Checkpointer bounds (see app/checkpoint.py); 0 disables a limit
+    checkpoint_max_bytes: int = 256 * 1024 * 1024
+    checkpoint_thread_ttl_seconds: float = 3600.0
+    checkpoint_max_per_thread: int = 10
+    # "memory" (per process) or "sqlite" (shared, see app/sqlite_checkpoint.py)
+    checkpoint_backend: str = "memory"
+    checkpoint_sqlite_path: str = ".checkpoints/checkpoints.sqlite"
+    checkpoint_sqlite_batch_ms: float = 2.0
+    checkpoint_cache_entries: int = 256
+
+    # Tool result cache (see app/cache.py)
+    tool_cache_enabled: bool = True
+    tool_cache_max_entries: int = 1024
+
+    # Response cache (see app/response_cache.py); opt-in
+    response_cache_enabled: bool = False
+    response_cache_max_entries: int = 512
+    response_cache_ttl_seconds: float = 300.0
+    response_cache_context_turns: int = 2
+
+    # Tools stage (see app/tool_executor.py)
+    tool_executor_workers: int = 16
+    tool_max_concurrency: int = 8
+    tool_timeout_seconds: float = 30.0
+
+    # Synthetic transaction store (see app/txn_store.py)
+    txn_store_rows_per_tenant: int = 2_000_000
+    txn_store_days: int = 365
+    txn_store_seed: int = 42
+    txn_store_dir: str = ""
+    txn_store_max_tenants: int = 8
+
+    # Model calls (see app/model_calls.py); 0 disables a concurrency limit.
+    # The default executor gets a thread per llm_max_concurrency call
+    llm_max_concurrency: int = 32
+    llm_max_concurrency_per_tenant: int = 8
+    llm_max_retries: int = 4
+    llm_retry_base_seconds: float = 0.5
+    llm_retry_max_seconds: float = 8.0
+    llm_max_pool_connections: int = 50
+    llm_connect_timeout_seconds: float = 5.0
+    llm_read_timeout_seconds: float = 120.0
+
+    # MockLLM, used without AWS credentials (see app/llm.py); ttft / tokens
+    # per second override the profile's
+    mock_llm_profile: str = "instant"
+    mock_llm_ttft_ms: float | None = None
+    mock_llm_tokens_per_second: float | None = None
+    mock_llm_throttle_rate: float = 0.0
+    mock_llm_seed: int = 0
+
+    # Context compaction (see app/compaction.py); 0 max tokens disables it
+    context_max_tokens: int = 24_000
+    context_keep_recent_turns: int = 3
+    context_summary_max_tokens: int = 1_500
+    context_tool_digest_chars: int = 600
+
+    # Intent router (see app/intent_router.py)
+    intent_router_enabled: bool = True
+    intent_router_min_confidence: float = 0.75
+
+    # Speculative tool prefetch (see app/prefetch.py); 0 budget = unlimited
+    prefetch_enabled: bool = True
+    prefetch_max_calls: int = 2
+    prefetch_tenant_budget_per_minute: float = 30.0
+
+    # Run admission (see app/scheduler.py); 0 disables the concurrency cap
+    run_max_concurrency: int = 16
+    run_max_queue: int = 64
+    run_max_queue_per_tenant: int = 16
+    run_queue_timeout_seconds: float = 60.0
+    run_tenant_weights: dict[str, int] = {}
+
+    # Batch runs (see app/batch.py)
+    batch_max_concurrency: int = 4
+    batch_max_jobs: int = 1000
+
+    # Startup warmup and /ready (see app/warmup.py)
+    warmup_enabled: bool = True
+    warmup_model_connections: int = 2
+    warmup_txn_store: bool = True
+
+    # Tracing and /metrics (see app/telemetry.py)
+    metrics_max_tenants: int = 100
+    run_timing_events: bool = False
+
+    # State sync (see app/state_sync.py); false sends one STATE_SNAPSHOT at the end
+    state_deltas: bool = True
+
+    # SSE delta coalescing (see app/sse.py); a 0 window disables coalescing
+    sse_coalesce_window_ms: float = 25.0
+    sse_coalesce_max_bytes: int = 2048
+
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 settings = Settings()
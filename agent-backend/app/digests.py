@@ -0,0 +1,170 @@
+"""Token-lean tool result digests for the model.
+
+Tool results carry everything the frontend renderers need (a 30-entry
+``daily_breakdown`` for ``30d``, every channel with six metrics, ...), but
+the model only needs enough to write the summary. Each tool therefore has
+two views:
+
+- the **digest**, a compact JSON object with totals, trends and outliers,
+  becomes the ``ToolMessage`` content the model reads;
+- the **full payload** travels in the ``ToolMessage`` artifact, is emitted
+  unchanged as the ``TOOL_CALL_RESULT`` content and is stored, by tool call
+  id, in the graph state field of that tool (``transaction_summary``,
+  ``sla_compliance``, ``channel_breakdown``). The tools node then drops it
+  from the artifact of the ``ToolMessage`` it keeps, so a checkpoint holds
+  it only once.
+
+``digested`` wires a digest function onto a cached tool (see
+``app/tools.py``); the cache keeps storing the full payload. The client
+only ever sees full payloads, so when it sends a tool result back as history
+(see app/history.py), ``redigest`` turns it into the digest again.
+"""
+from __future__ import annotations
+
+import functools
+import json
+from typing import Any, Callable
+
+import numpy as np
+
+# Outlier threshold for daily volumes (standard scores)
+OUTLIER_Z = 2.0
+MAX_OUTLIERS = 3
+TOP_MERCHANTS = 3
+
+# Tool name -> digest function, filled in by ``digested``
+DIGESTS: dict[str, Callable[[dict[str, Any]], str]] = {}
+
+
+def _compact(value: dict[str, Any]) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _trend_pct(values: np.ndarray) -> float | None:
+    """Change of the second half's mean over the first half's, in percent."""
+    if len(values) < 2:
+        return None
+    half = len(values) // 2
+    before, after = values[:half].mean(), values[len(values) - half:].mean()
+    return round(float((after - before) / before * 100), 1) if before else None
+
+
+def digest_transaction_summary(result: dict[str, Any]) -> str:
+    daily = result.get("daily_breakdown", [])
+    volume = np.array([d["volume"] for d in daily], dtype=float)
+    daily_digest: dict[str, Any] = {"days": len(daily)}
+    if len(daily):
+        lo, hi = int(volume.argmin()), int(volume.argmax())
+        daily_digest.update({
+            "mean_volume": round(float(volume.mean()), 1),
+            "min": [daily[lo]["date"], daily[lo]["volume"]],
+            "max": [daily[hi]["date"], daily[hi]["volume"]],
+            "trend_pct": _trend_pct(volume),
+        })
+        std = volume.std()
+        if std > 0:
+            z = (volume - volume.mean()) / std
+            outliers = np.flatnonzero(np.abs(z) >= OUTLIER_Z)
+            outliers = outliers[np.argsort(-np.abs(z[outliers]))][:MAX_OUTLIERS]
+            if len(outliers):
+                daily_digest["outliers"] = [
+                    [daily[i]["date"], daily[i]["volume"], round(float(z[i]), 1)]
+                    for i in sorted(outliers)
+                ]
+
+    merchants = result.get("top_merchants", [])
+    total = result.get("total_transactions") or 0
+    return _compact({
+        "tenant_id": result.get("tenant_id"),
+        "date_range": result.get("date_range"),
+        "total_transactions": total,
+        "total_amount_usd": result.get("total_amount_usd"),
+        "success_rate_pct": result.get("success_rate_pct"),
+        "avg_latency_ms": result.get("avg_latency_ms"),
+        "daily_volume": daily_digest,
+        # [name, volume, share of all transactions %]
+        "top_merchants": [
+            [m["name"], m["volume"], round(m["volume"] / total * 100, 1) if total else 0.0]
+            for m in merchants[:TOP_MERCHANTS]
+        ],
+    })
+
+
+def digest_sla_compliance(result: dict[str, Any]) -> str:
+    targets = result.get("sla_targets", {})
+    status = result.get("compliance_status", {})
+    return _compact({
+        "tenant_id": result.get("tenant_id"),
+        "period": result.get("period"),
+        # metric: [value, target, status]
+        "uptime_pct": [result.get("uptime_pct"), targets.get("uptime_target_pct"),
+                       status.get("uptime")],
+        "p95_latency_ms": [result.get("p95_latency_ms"), targets.get("p95_latency_target_ms"),
+                           status.get("latency")],
+        "error_rate_pct": [result.get("error_rate_pct"), targets.get("error_rate_target_pct"),
+                           status.get("error_rate")],
+        "p50_p99_latency_ms": [result.get("p50_latency_ms"), result.get("p99_latency_ms")],
+        "incidents": result.get("incidents"),
+    })
+
+
+def digest_channel_breakdown(result: dict[str, Any]) -> str:
+    channels = result.get("channels", [])
+    active = [c for c in channels if c.get("volume_pct")]
+    digest: dict[str, Any] = {
+        "tenant_id": result.get("tenant_id"),
+        "date_range": result.get("date_range"),
+        "columns": ["channel", "volume_pct", "avg_ticket_usd", "success_rate_pct", "p95_latency_ms"],
+        "channels": [
+            [c["channel"], c["volume_pct"], c["avg_ticket_usd"], c["success_rate_pct"],
+             c["p95_latency_ms"]]
+            for c in active
+        ],
+        "fastest_channel": result.get("fastest_channel"),
+        "highest_value_channel": result.get("highest_value_channel"),
+    }
+    if active:
+        digest["lowest_success_channel"] = min(active, key=lambda c: c["success_rate_pct"])["channel"]
+        digest["slowest_p95_channel"] = max(active, key=lambda c: c["p95_latency_ms"])["channel"]
+    return _compact(digest)
+
+
+def digested(digest: Callable[[dict[str, Any]], str]) -> Callable[[Callable], Callable]:
+    """Turn a cached tool's ``(payload, artifact)`` into ``(digest, artifact + payload)``."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> tuple[str, dict[str, Any]]:
+            payload, artifact = await fn(*args, **kwargs)
+            return digest(payload), {**artifact, "payload": payload}
+
+        DIGESTS[fn.__name__] = digest
+        return wrapper
+
+    return decorator
+
+
+def full_payload(artifact: Any) -> Any:
+    """The full tool payload carried in a ToolMessage artifact, if any."""
+    return artifact.get("payload") if isinstance(artifact, dict) else None
+
+
+def without_payload(artifact: Any) -> Any:
+    """``artifact`` minus its full payload (e.g. the ``cache`` info only)."""
+    if not isinstance(artifact, dict) or "payload" not in artifact:
+        return artifact
+    return {k: v for k, v in artifact.items() if k != "payload"}
+
+
+def redigest(tool_name: str, content: Any) -> Any:
+    """The digest of a full payload the client sent back as tool result content.
+
+    Content that is not the JSON payload of a digested tool is returned as is.
+    """
+    digest = DIGESTS.get(tool_name)
+    if digest is None or not isinstance(content, str):
+        return content
+    try:
+        payload = json.loads(content)
+        return digest(payload) if isinstance(payload, dict) else content
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return content
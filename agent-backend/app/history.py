@@ -0,0 +1,214 @@
+"""Incremental ingestion of AG-UI message history into the thread checkpoint.
+
+Every POST to ``/agui`` carries the whole conversation, but the thread
+checkpoint already holds everything up to the previous run. Rather than
+converting and re-merging the full transcript each turn, we keep a small
+index in the graph state (``agui_history``):
+
+- ``count``: number of client messages ingested on the previous run
+- ``digest``: running hash over those client messages (id, role, content)
+- ``prev_digest``: the running hash one message earlier
+- ``checkpoint_len``: number of checkpoint messages right after that ingestion
+
+On the next run, extending ``prev_digest`` with the client's message at
+``count - 1`` must give ``digest`` again, so checking the prefix costs one
+message whatever the history length. If it matches, only the suffix is
+considered (and hashed into the new index), and messages the agent itself
+produced during the previous run (the checkpoint tail after
+``checkpoint_len``) are skipped by key. If the client's history diverged
+(truncated or regenerated messages, an edit that changes the last known
+message), we fall back to a full rebuild that realigns the checkpoint with
+the client transcript. An in-place edit of an earlier message that keeps
+its id and everything after it is not detected; AG-UI clients edit by
+truncating and regenerating.
+
+Tool results are the exception to "the client's version wins": the client
+holds the full payload (the ``TOOL_CALL_RESULT`` content) while the model read
+its digest (see app/digests.py). A rebuild keeps the checkpoint's own
+``ToolMessage``; any other tool result is re-digested before it is ingested.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+from langchain_core.messages import AIMessage, BaseMessage, RemoveMessage, ToolMessage
+
+from app.digests import redigest
+from app.streaming import content_text
+
+# Graph state key holding the ingestion index
+HISTORY_INDEX_KEY = "agui_history"
+
+_LC_ROLES = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+
+MessageKey = tuple[str, str]
+
+
+def agui_message_key(msg: dict[str, Any]) -> MessageKey:
+    """Identity of an AG-UI message. Tool results are keyed by tool call id."""
+    role = msg.get("role", "user")
+    if role == "tool":
+        return "tool", msg.get("toolCallId", "")
+    return role, msg.get("id", "")
+
+
+def lc_message_key(msg: BaseMessage) -> MessageKey:
+    """Identity of a checkpoint message, comparable with ``agui_message_key``."""
+    if isinstance(msg, ToolMessage):
+        return "tool", msg.tool_call_id
+    return _LC_ROLES.get(msg.type, msg.type), msg.id or ""
+
+
+def _fingerprint(msg: dict[str, Any]) -> bytes:
+    return json.dumps(
+        [
+            msg.get("role", "user"),
+            msg.get("id", ""),
+            content_text(msg.get("content", "")),
+            msg.get("toolCallId", ""),
+            [tc.get("id", "") for tc in msg.get("toolCalls", None) or []],
+        ],
+        separators=(",", ":"),
+    ).encode()
+
+
+def extend_digest(digest: str, messages: list[dict[str, Any]]) -> str:
+    """Extend the running prefix hash ``digest`` with ``messages``."""
+    for msg in messages:
+        digest = hashlib.blake2b(
+            digest.encode() + _fingerprint(msg), digest_size=16,
+        ).hexdigest()
+    return digest
+
+
+@dataclass
+class IngestPlan:
+    """What to feed into the graph for one run."""
+
+    mode: Literal["fresh", "incremental", "rebuild"]
+    # AG-UI messages that still need converting, in client order
+    new_messages: list[dict[str, Any]]
+    # Checkpoint message ids to remove (rebuild only)
+    remove_ids: list[str] = field(default_factory=list)
+    # tool_call_id -> tool name, for the tool results in new_messages
+    tool_names: dict[str, str] = field(default_factory=dict)
+    # Length of the checkpoint's message list once this input is applied
+    checkpoint_len: int = 0
+
+    def graph_messages(self, converted: list[BaseMessage]) -> list[BaseMessage]:
+        """Build the ``messages`` graph input from the converted new messages."""
+        for msg in converted:
+            if isinstance(msg, ToolMessage) and msg.tool_call_id in self.tool_names:
+                # The client holds the full payload; the model reads its digest
+                msg.name = self.tool_names[msg.tool_call_id]
+                msg.content = redigest(msg.name, msg.content)
+        return [RemoveMessage(id=i) for i in self.remove_ids] + converted
+
+
+def plan_ingestion(
+    agui_messages: list[dict[str, Any]],
+    checkpoint_messages: list[BaseMessage],
+    index: dict[str, Any] | None,
+) -> tuple[IngestPlan, dict[str, Any]]:
+    """Decide which client messages the checkpoint is missing.
+
+    Returns the plan and the new ``agui_history`` index to store with the run.
+    """
+    plan, new_index = _plan(agui_messages, checkpoint_messages, index)
+    plan.tool_names = _tool_names(plan.new_messages, agui_messages, checkpoint_messages)
+    return plan, new_index
+
+
+def _plan(
+    agui_messages: list[dict[str, Any]],
+    checkpoint_messages: list[BaseMessage],
+    index: dict[str, Any] | None,
+) -> tuple[IngestPlan, dict[str, Any]]:
+    if not checkpoint_messages:
+        plan = IngestPlan("fresh", list(agui_messages), checkpoint_len=len(agui_messages))
+        return plan, _index(agui_messages, plan)
+
+    if index and len(agui_messages) >= index.get("count", 0):
+        count = index["count"]
+        checkpoint_len = index.get("checkpoint_len", 0)
+        last = agui_messages[count - 1:count]
+        if (
+            checkpoint_len <= len(checkpoint_messages)
+            and extend_digest(index.get("prev_digest", ""), last) == index.get("digest")
+        ):
+            known = {lc_message_key(m) for m in checkpoint_messages[checkpoint_len:]}
+            new = [m for m in agui_messages[count:] if agui_message_key(m) not in known]
+            plan = IngestPlan(
+                "incremental", new, checkpoint_len=len(checkpoint_messages) + len(new),
+            )
+            return plan, _index(agui_messages, plan, base=index)
+
+    return _plan_rebuild(agui_messages, checkpoint_messages)
+
+
+def _plan_rebuild(
+    agui_messages: list[dict[str, Any]],
+    checkpoint_messages: list[BaseMessage],
+) -> tuple[IngestPlan, dict[str, Any]]:
+    client_keys = {agui_message_key(m) for m in agui_messages}
+    remove_ids = [
+        m.id for m in checkpoint_messages
+        if m.id and lc_message_key(m) not in client_keys
+    ]
+    kept = {lc_message_key(m) for m in checkpoint_messages} & client_keys
+    appended = sum(1 for m in agui_messages if agui_message_key(m) not in kept)
+    plan = IngestPlan(
+        "rebuild",
+        # Tool results the checkpoint holds keep the model's version (the digest)
+        [
+            m for m in agui_messages
+            if m.get("role") != "tool" or agui_message_key(m) not in kept
+        ],
+        remove_ids=remove_ids,
+        checkpoint_len=len(checkpoint_messages) - len(remove_ids) + appended,
+    )
+    return plan, _index(agui_messages, plan)
+
+
+def _tool_names(
+    new_messages: list[dict[str, Any]],
+    agui_messages: list[dict[str, Any]],
+    checkpoint_messages: list[BaseMessage],
+) -> dict[str, str]:
+    """Tool name of each tool result in ``new_messages``, by tool call id."""
+    wanted = {m.get("toolCallId", "") for m in new_messages if m.get("role") == "tool"}
+    if not wanted:
+        return {}
+    names: dict[str, str] = {}
+    for msg in checkpoint_messages:
+        if isinstance(msg, AIMessage):
+            names.update((tc["id"], tc["name"]) for tc in msg.tool_calls if tc["id"] in wanted)
+    for msg in agui_messages:
+        for tc in msg.get("toolCalls", None) or []:
+            if tc.get("id") in wanted:
+                names[tc["id"]] = tc.get("function", {}).get("name", "")
+    return names
+
+
+def _index(
+    agui_messages: list[dict[str, Any]],
+    plan: IngestPlan,
+    base: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    if base is not None:
+        prev_digest, digest = base.get("prev_digest", ""), base["digest"]
+        new = agui_messages[base["count"]:]
+    else:
+        prev_digest = digest = ""
+        new = agui_messages
+    for msg in new:
+        prev_digest, digest = digest, extend_digest(digest, [msg])
+    return {
+        "count": len(agui_messages),
+        "digest": digest,
+        "prev_digest": prev_digest,
+        "checkpoint_len": plan.checkpoint_len,
+    }
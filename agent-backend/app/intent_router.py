@@ -0,0 +1,209 @@
+"""Deterministic intent routing ahead of the model.
+
+For the common questions -- SLA compliance, transaction summary, channel
+breakdown -- the first model call only decides which tool to call, so the
+user waits a full Bedrock round trip before any data is fetched. The
+``route`` node (see app/agent.py) classifies each new user turn with a
+local keyword matcher instead:
+
+- every intent scores the distinct terms it finds (strong phrases 1.0,
+  weak keywords 0.5); confidence is the top score (capped at 1) times its
+  margin over the runner-up, halved for open-ended questions ("why",
+  "compare", ...) that need the model's reasoning;
+- the turn's ``current_intent`` is set either way;
+- at ``intent_router_min_confidence`` or above, the node emits the tool
+  call itself (``tenant_id`` from the state, ``date_range`` inferred from
+  phrases like "last 30 days"), so the graph goes straight to ``tools`` and
+  the model's first call is the answer; below it, the model decides.
+
+A route is a misroute when the model, given the routed tool's result, calls
+a tool again (a different tool or other arguments). Routing, fallbacks and
+misroutes are counted per intent on ``/metrics``, with the wall time spent
+on the misrouted tool call (``agent_intent_misroute_seconds``).
+"""
+from __future__ import annotations
+
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from app import telemetry
+from app.streaming import content_text
+
+STRONG_WEIGHT = 1.0
+WEAK_WEIGHT = 0.5
+# Confidence factor for questions asking for analysis rather than data
+OPEN_ENDED_FACTOR = 0.5
+OPEN_ENDED = re.compile(
+    r"\b(why|explain|compare|comparison|recommend|should|forecast|predict|what if|how (can|do|should))\b"
+)
+# Key of the routing decision in the routed AIMessage's response_metadata
+METADATA_KEY = "intent_router"
+# current_intent of turns that match no known intent
+GENERAL_INTENT = "general"
+
+decisions = telemetry.registry.counter(
+    "agent_intent_decisions_total",
+    "User turns classified by the intent router, by decision (routed / model).",
+    ("intent", "decision"),
+)
+misroutes = telemetry.registry.counter(
+    "agent_intent_misroutes_total",
+    "Routed turns where the model then called a tool again.",
+    ("intent",),
+)
+misroute_seconds = telemetry.registry.histogram(
+    "agent_intent_misroute_seconds",
+    "Wall time spent on misrouted tool calls.",
+    ("intent",),
+)
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    tool: str
+    strong: tuple[str, ...]
+    weak: tuple[str, ...] = ()
+
+
+INTENTS = (
+    Intent(
+        "sla_compliance", "get_sla_compliance",
+        strong=("sla", "slas", "compliance", "compliant", "uptime", "availability", "p95", "p99"),
+        weak=("latency", "error rate", "incident", "incidents", "breach", "target"),
+    ),
+    Intent(
+        "transaction_summary", "get_transaction_summary",
+        strong=("transaction", "transactions", "transaction volume", "txn", "txns"),
+        weak=("summary", "volume", "volumes", "success rate", "declines", "amount"),
+    ),
+    Intent(
+        "channel_breakdown", "get_payment_channel_breakdown",
+        strong=("channel", "channels", "payment method", "payment methods"),
+        weak=("breakdown", "payment", "payments", "card", "cards", "wallet", "wallets", "ach"),
+    ),
+)
+
+_TERMS = {
+    intent.name: re.compile(
+        r"\b(" + "|".join(re.escape(t) for t in (*intent.strong, *intent.weak)) + r")\b"
+    )
+    for intent in INTENTS
+}
+
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "quarter": 90, "year": 365}
+_LAST_N = re.compile(r"\b(?:last|past|previous)\s+(\d+)\s*(hour|day|week|month|quarter|year)s?\b")
+_SHORT = re.compile(r"\b(\d+)\s*([hdw])\b")
+_NAMED = (
+    (re.compile(r"\b(today|24 ?hours?)\b"), "24h"),
+    (re.compile(r"\b(this|last|past) week\b|\bweekly\b"), "7d"),
+    (re.compile(r"\b(this|last|past) month\b|\bmonthly\b|\bmtd\b"), "30d"),
+    (re.compile(r"\b(this|last|past) quarter\b|\bquarterly\b|\bqtd\b"), "90d"),
+    (re.compile(r"\b(this|last|past) year\b|\byearly\b|\bannual\b|\bytd\b"), "365d"),
+)
+
+
+@dataclass(frozen=True)
+class IntentMatch:
+    intent: Intent | None
+    confidence: float
+    date_range: str | None = None
+
+    @property
+    def name(self) -> str:
+        return self.intent.name if self.intent is not None else GENERAL_INTENT
+
+
+def infer_date_range(text: str) -> str | None:
+    """``date_range`` tool argument for phrases like "last 30 days" or "90d"."""
+    match = _LAST_N.search(text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        return f"{count}h" if unit == "hour" else f"{count * _UNIT_DAYS[unit]}d"
+    match = _SHORT.search(text)
+    if match:
+        return f"{match.group(1)}{match.group(2)}"
+    for pattern, date_range in _NAMED:
+        if pattern.search(text):
+            return date_range
+    return None
+
+
+def score_intents(text: str) -> list[tuple[float, Intent]]:
+    """Every intent's score for ``text`` (sum of its distinct terms), best first."""
+    text = text.lower()
+    scores = []
+    for intent in INTENTS:
+        found = set(_TERMS[intent.name].findall(text))
+        score = sum(STRONG_WEIGHT if term in intent.strong else WEAK_WEIGHT for term in found)
+        scores.append((score, intent))
+    scores.sort(key=lambda pair: pair[0], reverse=True)
+    return scores
+
+
+def classify(text: str) -> IntentMatch:
+    """Best intent for ``text`` and the confidence of that choice (0..1)."""
+    text = text.lower()
+    scores = score_intents(text)
+    (top, best), (second, _) = scores[0], scores[1]
+    if top <= 0:
+        return IntentMatch(None, 0.0)
+    confidence = min(top, 1.0) * (top - second) / top
+    if OPEN_ENDED.search(text):
+        confidence *= OPEN_ENDED_FACTOR
+    return IntentMatch(best, round(confidence, 3), infer_date_range(text))
+
+
+def route_turn(
+    messages: Sequence[BaseMessage], tenant_id: str, min_confidence: float,
+) -> dict[str, Any]:
+    """State update of the ``route`` node: the intent, and a tool call if confident.
+
+    Only a new user turn (last message from the user) is classified; on
+    every other pass through the node (after tools) nothing changes.
+    """
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return {}
+    match = classify(content_text(messages[-1].content))
+    update: dict[str, Any] = {"current_intent": match.name}
+    if match.intent is None or match.confidence < min_confidence:
+        decisions.inc(intent=match.name, decision="model")
+        return update
+
+    decisions.inc(intent=match.name, decision="routed")
+    args = {"tenant_id": tenant_id}
+    if match.date_range is not None:
+        args["date_range"] = match.date_range
+    update["messages"] = [AIMessage(
+        content="",
+        id=f"route-{uuid.uuid4()}",
+        tool_calls=[{"id": f"call_{uuid.uuid4().hex[:8]}", "name": match.intent.tool, "args": args}],
+        response_metadata={METADATA_KEY: {
+            "intent": match.name,
+            "confidence": match.confidence,
+            "routed_at": time.time(),
+        }},
+    )]
+    return update
+
+
+def check_misroute(messages: Sequence[BaseMessage], response: AIMessage) -> None:
+    """Record a misroute if ``response`` is the model's first answer to a
+    routed turn and it calls a tool again."""
+    routed: dict[str, Any] | None = None
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, AIMessage):
+            routed = msg.response_metadata.get(METADATA_KEY)
+            if routed is None:
+                return  # the model already answered in this turn
+    if routed is None or not response.tool_calls:
+        return
+    misroutes.inc(intent=routed["intent"])
+    misroute_seconds.observe(max(time.time() - routed["routed_at"], 0.0), intent=routed["intent"])
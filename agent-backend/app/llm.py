@@ -1,26 +1,91 @@
-"""LLM provider -- AWS Bedrock with automatic mock fallback."""
+"""LLM provider -- AWS Bedrock with automatic mock fallback.
+
+Without AWS credentials ``get_llm`` returns ``MockLLM``, which streams its
+canned answers with configurable latency and injected throttling
+(``mock_llm_*`` settings), so the full ``/agui`` stack can be load-tested
+offline (see bench/agui.py).
+"""
 from __future__ import annotations
 
+import asyncio
+import dataclasses
+import functools
+import hashlib
 import json
-import uuid
-from typing import Any, Iterator, List, Optional, Sequence
+import math
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
 
 from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import AIMessage, BaseMessage
-from langchain_core.outputs import ChatGeneration, ChatResult
-from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.tools import BaseTool
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 
+from app.compaction import estimate_tokens
 from app.config import settings
+from app.streaming import content_text
+
+
+@functools.lru_cache(maxsize=1)
+def bedrock_client() -> Any:
+    """Shared ``bedrock-runtime`` client, tuned for concurrent use.
+
+    boto3 clients are thread-safe; sharing one keeps a single HTTP connection
+    pool (sized for ``llm_max_concurrency``) with keep-alive across calls.
+    botocore's own retries are disabled because ``app/model_calls.py`` retries
+    throttling with jittered backoff and records it.
+    """
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "bedrock-runtime",
+        region_name=settings.aws_region,
+        aws_access_key_id=settings.aws_access_key_id,
+        aws_secret_access_key=settings.aws_secret_access_key,
+        config=Config(
+            max_pool_connections=max(settings.llm_max_pool_connections, settings.llm_max_concurrency),
+            connect_timeout=settings.llm_connect_timeout_seconds,
+            read_timeout=settings.llm_read_timeout_seconds,
+            tcp_keepalive=True,
+            retries={"total_max_attempts": 1, "mode": "standard"},
+        ),
+    )
+
+
+def bedrock_configured() -> bool:
+    return bool(settings.aws_access_key_id and settings.aws_secret_access_key)
+
+
+def open_bedrock_connection() -> None:
+    """Open one keep-alive connection in ``bedrock_client()``'s pool.
+
+    Sends an unsigned ``GET /`` through the client's own HTTP session: the
+    endpoint answers with an error status (no model is invoked), but DNS, TCP
+    and TLS are done and the connection goes back to the pool for the first
+    real call. Used by the startup warmup (see app/warmup.py).
+    """
+    from botocore.awsrequest import AWSRequest
+
+    client = bedrock_client()
+    request = AWSRequest(method="GET", url=client.meta.endpoint_url + "/").prepare()
+    client._endpoint.http_session.send(request)
 
 
 def get_llm() -> BaseChatModel:
     """Return an LLM instance -- Bedrock if credentials exist, mock otherwise."""
-    if settings.aws_access_key_id and settings.aws_secret_access_key:
+    if bedrock_configured():
         try:
             from langchain_aws import ChatBedrock
             return ChatBedrock(
+                client=bedrock_client(),
                 model_id=settings.bedrock_model_id,
                 region_name=settings.aws_region,
                 credentials_profile_name=None,
@@ -28,16 +93,106 @@ def get_llm() -> BaseChatModel:
             )
         except Exception:
             pass
-    return MockLLM()
+    return MockLLM(
+        profile=mock_profile(),
+        throttle_rate=settings.mock_llm_throttle_rate,
+        seed=settings.mock_llm_seed,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Mock model
+# ---------------------------------------------------------------------------
+
+class ThrottlingException(Exception):
+    """Throttle injected by ``MockLLM``.
+
+    Shaped like botocore's ``ClientError`` (``response["Error"]["Code"]``), so
+    app/model_calls.py retries it like a Bedrock throttle.
+    """
+
+    def __init__(self, message: str = "Too many requests, please wait before trying again") -> None:
+        super().__init__(
+            f"An error occurred (ThrottlingException) when calling the "
+            f"ConverseStream operation: {message}"
+        )
+        self.response = {"Error": {"Code": "ThrottlingException", "Message": message}}
+
+
+@dataclass(frozen=True)
+class MockLatencyProfile:
+    """Latency model of ``MockLLM`` responses.
+
+    Time to first token is lognormal with median ``ttft_ms`` and shape
+    ``ttft_sigma`` (0 = always the median); further tokens arrive at
+    ``tokens_per_second`` (0 = all at once), each gap lognormal with shape
+    ``token_jitter``.
+    """
+
+    ttft_ms: float = 0.0
+    ttft_sigma: float = 0.0
+    tokens_per_second: float = 0.0
+    token_jitter: float = 0.0
+
+
+MOCK_PROFILES = {
+    "instant": MockLatencyProfile(),
+    "fast": MockLatencyProfile(
+        ttft_ms=250, ttft_sigma=0.3, tokens_per_second=150, token_jitter=0.2,
+    ),
+    # In the range of a large model on Bedrock, including the long tail
+    "realistic": MockLatencyProfile(
+        ttft_ms=600, ttft_sigma=0.5, tokens_per_second=60, token_jitter=0.3,
+    ),
+    "slow": MockLatencyProfile(
+        ttft_ms=2000, ttft_sigma=0.7, tokens_per_second=25, token_jitter=0.5,
+    ),
+}
+
+# Conversations whose call count MockLLM remembers (see MockLLM._next_call)
+MOCK_MAX_CONVERSATIONS = 4096
+# Characters of tool call arguments per streamed chunk
+MOCK_ARGS_CHUNK_CHARS = 8
+
+
+def mock_profile() -> MockLatencyProfile:
+    """``mock_llm_profile``, with the ``mock_llm_ttft_ms`` / ``mock_llm_tokens_per_second``
+    overrides applied."""
+    profile = MOCK_PROFILES.get(settings.mock_llm_profile)
+    if profile is None:
+        raise ValueError(f"unknown mock_llm_profile: {settings.mock_llm_profile!r}")
+    overrides = {}
+    if settings.mock_llm_ttft_ms is not None:
+        overrides["ttft_ms"] = settings.mock_llm_ttft_ms
+    if settings.mock_llm_tokens_per_second is not None:
+        overrides["tokens_per_second"] = settings.mock_llm_tokens_per_second
+    return dataclasses.replace(profile, **overrides)
+
+
+def _mock_tool_call(rng: random.Random, name: str, args: dict[str, Any]) -> dict[str, Any]:
+    return {"id": f"call_{rng.getrandbits(32):08x}", "name": name, "args": args}
 
 
 class MockLLM(BaseChatModel):
     """Deterministic mock LLM for local development without AWS credentials.
 
-    Returns canned responses that demonstrate the agent flow including tool calls.
+    Returns canned responses that demonstrate the agent flow including tool
+    calls, streamed token by token (text) or in argument fragments (tool
+    calls) like Bedrock's ConverseStream. ``profile`` sets the latency; a
+    ``throttle_rate`` share of calls fails with ``ThrottlingException``
+    before the first token. Latencies, throttles and ids are drawn from
+    ``seed``, the conversation and how often it was sent before, so a
+    seeded load test replays the same way whatever the interleaving of
+    concurrent calls.
     """
     model_name: str = "mock-finops-llm"
     call_count: int = Field(default=0, exclude=True)
+    profile: MockLatencyProfile = Field(default_factory=MockLatencyProfile, exclude=True)
+    throttle_rate: float = 0.0
+    seed: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    # conversation digest -> calls seen (bounded LRU)
+    _conversations: OrderedDict[str, int] = PrivateAttr(default_factory=OrderedDict)
 
     @property
     def _llm_type(self) -> str:
@@ -51,6 +206,8 @@ class MockLLM(BaseChatModel):
         """Mock bind_tools — returns self since tool routing is hardcoded."""
         return self
 
+    # -- langchain entry points ----------------------------------------------
+
     def _generate(
         self,
         messages: List[BaseMessage],
@@ -58,7 +215,111 @@ class MockLLM(BaseChatModel):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        self.call_count += 1
+        response, chunks, delays = self._plan(messages)
+        time.sleep(sum(delays))
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        response, chunks, delays = self._plan(messages)
+        await asyncio.sleep(sum(delays))
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        _, chunks, delays = self._plan(messages)
+        for chunk, delay in zip(chunks, delays):
+            time.sleep(delay)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        _, chunks, delays = self._plan(messages)
+        for chunk, delay in zip(chunks, delays):
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=chunk)
+
+    # -- response plan -------------------------------------------------------
+
+    def _next_call(self, messages: Sequence[BaseMessage]) -> random.Random:
+        """Count the call and return its random source.
+
+        Seeded by ``seed``, the conversation (message types and text; ids
+        differ between runs) and how many calls sent it before, so a retry
+        draws anew while concurrent calls don't shift each other's draws.
+        """
+        conversation = hashlib.sha256(json.dumps(
+            [(m.type, content_text(m.content)) for m in messages],
+        ).encode()).hexdigest()
+        with self._lock:
+            self.call_count += 1
+            seen = self._conversations.pop(conversation, 0)
+            self._conversations[conversation] = seen + 1
+            while len(self._conversations) > MOCK_MAX_CONVERSATIONS:
+                self._conversations.popitem(last=False)
+        return random.Random(f"{self.seed}:{conversation}:{seen}")
+
+    def _plan(
+        self, messages: Sequence[BaseMessage],
+    ) -> tuple[AIMessage, list[AIMessageChunk], list[float]]:
+        """The response, its stream chunks and the delay before each chunk.
+
+        Raises ``ThrottlingException`` for an injected throttle.
+        """
+        rng = self._next_call(messages)
+        if self.throttle_rate > 0 and rng.random() < self.throttle_rate:
+            raise ThrottlingException()
+        response = self._respond(messages, rng)
+
+        # Chunks carry the seeded message id (LangChain would assign a random run id)
+        msg_id = response.id
+        tokens = re.findall(r"\s*\S+\s*", response.content)
+        chunks = [AIMessageChunk(content=token, id=msg_id) for token in tokens]
+        step = MOCK_ARGS_CHUNK_CHARS
+        # Text tokens and argument fragments; call headers and usage are framing
+        output_tokens = len(tokens)
+        for index, call in enumerate(response.tool_calls):
+            args = json.dumps(call["args"])
+            chunks.append(AIMessageChunk(content="", id=msg_id, tool_call_chunks=[
+                {"id": call["id"], "name": call["name"], "args": "", "index": index},
+            ]))
+            chunks.extend(
+                AIMessageChunk(content="", id=msg_id, tool_call_chunks=[
+                    {"id": None, "name": None, "args": args[i:i + step], "index": index},
+                ])
+                for i in range(0, len(args), step)
+            )
+            output_tokens += -(-len(args) // step)
+        usage = response.usage_metadata
+        usage["output_tokens"] = output_tokens
+        usage["total_tokens"] = usage["input_tokens"] + output_tokens
+        # Usage rides on the last chunk, as with Bedrock's metadata event
+        chunks.append(AIMessageChunk(content="", id=msg_id, usage_metadata=dict(usage)))
+
+        profile = self.profile
+        delays = [profile.ttft_ms / 1000 * math.exp(profile.ttft_sigma * rng.gauss(0, 1))]
+        gap = 1 / profile.tokens_per_second if profile.tokens_per_second > 0 else 0.0
+        delays += [gap * math.exp(profile.token_jitter * rng.gauss(0, 1)) for _ in chunks[1:-1]]
+        delays.append(0.0)
+        return response, chunks, delays
+
+    def _respond(self, messages: Sequence[BaseMessage], rng: random.Random) -> AIMessage:
+        """The canned response to ``messages``."""
         last_msg = messages[-1].content if messages else ""
         last_msg_lower = last_msg.lower() if isinstance(last_msg, str) else ""
 
@@ -66,56 +327,45 @@ class MockLLM(BaseChatModel):
         # (i.e. the last message is a tool result, meaning we should summarize)
         last_is_tool_result = getattr(messages[-1], "type", None) == "tool" if messages else False
 
+        content = ""
+        tool_calls = []
         if last_is_tool_result:
             # Summarize the tool results that just came back
-            response = AIMessage(
-                content=(
-                    "Based on the data I retrieved, here's your FinOps summary:\n\n"
-                    "**Transaction Volume**: Processing is healthy with volumes trending upward. "
-                    "The success rate remains above 98%, well within SLA targets.\n\n"
-                    "**SLA Compliance**: All primary metrics are currently compliant. "
-                    "P95 latency is within the 300ms target.\n\n"
-                    "**Payment Channels**: Credit cards lead at ~43% of volume, with digital wallets "
-                    "showing the fastest growth quarter-over-quarter.\n\n"
-                    "Would you like me to dive deeper into any specific area?"
-                )
+            content = (
+                "Based on the data I retrieved, here's your FinOps summary:\n\n"
+                "**Transaction Volume**: Processing is healthy with volumes trending upward. "
+                "The success rate remains above 98%, well within SLA targets.\n\n"
+                "**SLA Compliance**: All primary metrics are currently compliant. "
+                "P95 latency is within the 300ms target.\n\n"
+                "**Payment Channels**: Credit cards lead at ~43% of volume, with digital wallets "
+                "showing the fastest growth quarter-over-quarter.\n\n"
+                "Would you like me to dive deeper into any specific area?"
             )
         elif "transaction" in last_msg_lower or "summary" in last_msg_lower or "volume" in last_msg_lower:
-            response = AIMessage(
-                content="",
-                tool_calls=[{
-                    "id": f"call_{uuid.uuid4().hex[:8]}",
-                    "name": "get_transaction_summary",
-                    "args": {"tenant_id": "tenant-demo-001", "date_range": "7d"},
-                }],
-            )
+            tool_calls = [_mock_tool_call(
+                rng, "get_transaction_summary", {"tenant_id": "tenant-demo-001", "date_range": "7d"},
+            )]
         elif "sla" in last_msg_lower or "compliance" in last_msg_lower or "uptime" in last_msg_lower:
-            response = AIMessage(
-                content="",
-                tool_calls=[{
-                    "id": f"call_{uuid.uuid4().hex[:8]}",
-                    "name": "get_sla_compliance",
-                    "args": {"tenant_id": "tenant-demo-001"},
-                }],
-            )
+            tool_calls = [_mock_tool_call(rng, "get_sla_compliance", {"tenant_id": "tenant-demo-001"})]
         elif "channel" in last_msg_lower or "payment" in last_msg_lower or "breakdown" in last_msg_lower:
-            response = AIMessage(
-                content="",
-                tool_calls=[{
-                    "id": f"call_{uuid.uuid4().hex[:8]}",
-                    "name": "get_payment_channel_breakdown",
-                    "args": {"tenant_id": "tenant-demo-001"},
-                }],
-            )
+            tool_calls = [_mock_tool_call(
+                rng, "get_payment_channel_breakdown", {"tenant_id": "tenant-demo-001"},
+            )]
         else:
-            response = AIMessage(
-                content=(
-                    "Hello! I'm your FinOps Assistant. I can help you with:\n\n"
-                    "- **Transaction summaries** -- volume, success rates, and trends\n"
-                    "- **SLA compliance** -- uptime, latency percentiles, and incident tracking\n"
-                    "- **Payment channel breakdown** -- volume distribution and performance by channel\n\n"
-                    "What would you like to know about your tenant's operations?"
-                )
+            content = (
+                "Hello! I'm your FinOps Assistant. I can help you with:\n\n"
+                "- **Transaction summaries** -- volume, success rates, and trends\n"
+                "- **SLA compliance** -- uptime, latency percentiles, and incident tracking\n"
+                "- **Payment channel breakdown** -- volume distribution and performance by channel\n\n"
+                "What would you like to know about your tenant's operations?"
             )
 
-        return ChatResult(generations=[ChatGeneration(message=response)])
+        input_tokens = sum(estimate_tokens(m) for m in messages)
+        return AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            id=f"msg_{rng.getrandbits(64):016x}",
+            usage_metadata={
+                "input_tokens": input_tokens, "output_tokens": 0, "total_tokens": input_tokens,
+            },
+        )
@@ -10,18 +10,41 @@ AG-UI Event Flow:
 
 AG-UI Protocol Events:
   RUN_STARTED -> TEXT_MESSAGE_START -> TEXT_MESSAGE_CONTENT* -> TEXT_MESSAGE_END
-              -> TOOL_CALL_START -> TOOL_CALL_ARGS -> TOOL_CALL_END
-              -> STATE_SNAPSHOT -> RUN_FINISHED
+              -> TOOL_CALL_START -> TOOL_CALL_ARGS* -> TOOL_CALL_END
+              -> TOOL_CALL_RESULT -> STATE_DELTA* -> RUN_FINISHED
+
+State is synced with JSON Patch ``STATE_DELTA`` events after each graph
+node; ``STATE_SNAPSHOT`` is only sent when the client holds no state or a
+patch would not be smaller (see ``app/state_sync.py``).
+
+Events are emitted while the graph runs (``astream_events``), so the first
+token reaches the client as soon as the model produces it. See
+``app/streaming.py`` for the translation rules and ``app/sse.py`` for frame
+encoding / delta coalescing.
+
+Runs are admitted by a fair per-tenant scheduler (``app/scheduler.py``);
+a full queue answers ``429`` with ``Retry-After``. A run is cancelled
+when its client disconnects. Every run is traced (model, tools,
+checkpointer, SSE writes); ``/metrics`` serves Prometheus text metrics and
+``/metrics/runs`` recent run traces (see ``app/telemetry.py``).
+
+The graph is built lazily; startup warms it up in the background and
+``/ready`` reports when that is done (see ``app/warmup.py``).
 """
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
+import time
 import uuid
-from typing import Any
+import weakref
+from contextlib import aclosing, asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 from langchain_core.messages import (
     AIMessage,
@@ -31,10 +54,48 @@ from langchain_core.messages import (
     ToolMessage,
 )
 
-from app.agent import agent_graph
+from app import telemetry
+from app.batch import (
+    BatchRequestError,
+    new_batch_id,
+    parse_concurrency,
+    parse_jobs,
+    run_batch,
+)
+from app.cache import tool_cache
+from app.compaction import COMPACTION_KEY
 from app.config import settings
-
-app = FastAPI(title="ag-starter Agent Backend", version="0.1.0")
+from app.history import HISTORY_INDEX_KEY, plan_ingestion
+from app.model_calls import model_call_executor, model_stats
+from app.prefetch import prefetcher
+from app.response_cache import response_cache
+from app.scheduler import QueueFull, Ticket, scheduler
+from app.sse import dumps, stream_frames
+from app.state_sync import StateSync
+from app.streaming import AguiEvent, RunEventTranslator
+from app.warmup import agent_graph, checkpoint_stats, warmup
+
+if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Blocking model calls each hold a default executor thread (see app/model_calls.py)
+    executor = model_call_executor()
+    if executor is not None:
+        asyncio.get_running_loop().set_default_executor(executor)
+    # Warm up in the background so the server accepts connections (and
+    # /health answers) immediately; /ready reports when it's done.
+    task = asyncio.create_task(warmup.run()) if warmup.enabled else None
+    try:
+        yield
+    finally:
+        if task is not None:
+            task.cancel()
+
+
+app = FastAPI(title="ag-starter Agent Backend", version="0.1.0", lifespan=lifespan)
 
 # CORS -- allow the Next.js frontend in dev
 app.add_middleware(
@@ -97,142 +158,334 @@ def agui_messages_to_langchain(messages: list[dict[str, Any]]) -> list[BaseMessa
 
 
 # ---------------------------------------------------------------------------
-# AG-UI SSE event helpers
+# AG-UI streaming endpoint
 # ---------------------------------------------------------------------------
 
-def agui_event(event_type: str, data: dict[str, Any]) -> str:
-    """Format an AG-UI SSE event as a plain-text SSE frame.
+# Graph state keys never sent to the client (STATE_SNAPSHOT / STATE_DELTA)
+INTERNAL_STATE_KEYS = {"messages", HISTORY_INDEX_KEY, COMPACTION_KEY}
+
+
+def run_timing_event(trace: telemetry.RunTrace) -> AguiEvent:
+    return "CUSTOM", {"name": "run_timing", "value": trace.summary()}
+
 
-    Uses \\n line endings (not \\r\\n) because the AG-UI client's SSE parser
-    splits on /\\n\\n/ to separate events.
+async def queue_events(ticket: Ticket) -> AsyncIterator[AguiEvent]:
+    """``CUSTOM`` ``queue`` events while ``ticket`` waits for a run slot.
+
+    Sent whenever the estimated position changes, and once more with
+    position 0 on admission. Stops without admission on queue timeout.
+    """
+    with telemetry.span("agui.queue"):
+        timeout = settings.run_queue_timeout_seconds
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        position = None
+        while not ticket.granted:
+            if (current := scheduler.position(ticket)) != position:
+                position = current
+                yield "CUSTOM", {
+                    "name": "queue",
+                    "value": {"position": position, "queued": scheduler.queued},
+                }
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if (remaining is not None and remaining <= 0) or not await scheduler.wait(ticket, remaining):
+                return
+    yield "CUSTOM", {"name": "queue", "value": {"position": 0, "queued": scheduler.queued}}
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """Return once the client has closed the connection."""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def close_cancelled_turn(graph: CompiledStateGraph, config: dict[str, Any]) -> None:
+    """Answer tool calls a cancelled run left open, so the thread stays valid.
+
+    LangGraph only checkpoints completed steps, so a cancelled run leaves the
+    thread at its last step boundary; if that was the model asking for tools,
+    the calls get error results before the next run appends a user message.
     """
-    payload = json.dumps({"type": event_type, **data})
-    return f"data: {payload}\n\n"
+    # Deferred like the graph itself (see app/warmup.py)
+    from app.tool_executor import cancelled_tool_results
 
+    snapshot = await graph.aget_state(config)
+    results = cancelled_tool_results(snapshot.values.get("messages", []))
+    if results:
+        await graph.aupdate_state(config, {"messages": results}, as_node="tools")
 
-# ---------------------------------------------------------------------------
-# AG-UI streaming endpoint
-# ---------------------------------------------------------------------------
 
 @app.post("/agui")
 async def agui_stream(request: Request):
     """AG-UI protocol endpoint -- accepts RunAgentInput, streams SSE events."""
+    arrived = time.perf_counter()
     body = await request.json()
 
     thread_id = body.get("threadId", str(uuid.uuid4()))
     run_id = body.get("runId", str(uuid.uuid4()))
     messages = body.get("messages", [])
-    state = body.get("state", {})
-
-    # Convert AG-UI messages to LangChain format
-    lc_messages = agui_messages_to_langchain(messages)
-
-    # Build initial state for the graph
-    tenant_id = state.get("tenant_id", settings.default_tenant_id)
-    graph_input = {
-        "messages": lc_messages,
-        "tenant_id": tenant_id,
-    }
+    client_state = body.get("state")
+    state = client_state if isinstance(client_state, dict) else {}
 
     config = {"configurable": {"thread_id": thread_id}}
+    tenant_id = state.get("tenant_id", settings.default_tenant_id)
+    trace = telemetry.start_run(run_id, tenant_id, started_at=arrived)
+
+    # Repeated questions are answered from the response cache without
+    # running the graph (see app/response_cache.py)
+    cache_key = response_cache.key_for(tenant_id, messages)
+    cached = response_cache.get(cache_key, tenant_id) if cache_key else None
+    if cached is not None:
+        async def replay_generator():
+            with trace.running():
+                yield "RUN_STARTED", {"threadId": thread_id, "runId": run_id}
+                for agui_event in response_cache.replay(cached):
+                    trace.mark_event()
+                    yield agui_event
+                trace.outcome = "cached"
+                if settings.run_timing_events:
+                    yield run_timing_event(trace)
+                yield "RUN_FINISHED", {"threadId": thread_id, "runId": run_id}
+
+        return StreamingResponse(
+            stream_frames(replay_generator()),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+        )
+
+    # Admission control: a slot now, a place in the tenant's queue, or a
+    # fast 429 when the queue is full (see app/scheduler.py)
+    try:
+        ticket = scheduler.admit(tenant_id)
+    except QueueFull as e:
+        telemetry.runs_total.inc(tenant=trace.tenant, outcome="rejected")
+        return JSONResponse(
+            {"error": str(e), "code": "QUEUE_FULL", "retryAfterSeconds": e.retry_after_seconds},
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after_seconds)},
+        )
 
     async def event_generator():
-        """Stream AG-UI events from the LangGraph agent."""
-        # RUN_STARTED
-        yield agui_event("RUN_STARTED", {"threadId": thread_id, "runId": run_id})
-
+        """Produce AG-UI events from the LangGraph agent as they happen."""
+        with trace.running():
+            try:
+                # RUN_STARTED
+                yield "RUN_STARTED", {"threadId": thread_id, "runId": run_id}
+
+                if not ticket.granted:
+                    async with aclosing(queue_events(ticket)) as waiting:
+                        async for queue_event in waiting:
+                            yield queue_event
+                    if not ticket.granted:
+                        trace.outcome = "queue_timeout"
+                        yield "RUN_ERROR", {
+                            "message": "Timed out waiting for a run slot",
+                            "code": "QUEUE_TIMEOUT",
+                        }
+                        return
+
+                async with aclosing(run_events()) as running:
+                    async for agui_event in running:
+                        yield agui_event
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client disconnected (see stream_frames): the graph run,
+                # with its pending model and tool calls, is cancelled.
+                trace.outcome = "cancelled"
+                telemetry.cancelled_runs.inc(
+                    tenant=trace.tenant, stage="running" if ticket.granted else "queued",
+                )
+                if ticket.granted:
+                    # The response's cancel scope cancels every await from here
+                    # on; shielded, the cleanup still finishes in its own task
+                    await asyncio.shield(close_cancelled_turn(await agent_graph(), config))
+                raise
+            finally:
+                scheduler.release(ticket)
+
+    async def run_events():
+        """The graph run itself, once a run slot is held."""
+        state_sync = (
+            StateSync(client_state, INTERNAL_STATE_KEYS) if settings.state_deltas else None
+        )
+        translator = RunEventTranslator(state_sync)
+        # Events between RUN_STARTED and RUN_FINISHED, kept for the response cache
+        recorded: list[AguiEvent] = []
         try:
-            # Run the LangGraph agent and collect the final state
-            # We use invoke (not stream) since our mock LLM is synchronous
-            # and the graph is simple enough. For production with real LLMs,
-            # switch to astream_events for token-level streaming.
-            result = await agent_graph.ainvoke(graph_input, config=config)
-            result_messages: list[BaseMessage] = result.get("messages", [])
-
-            # Find new messages (those produced by the agent, not the input)
-            input_ids = {m.id for m in lc_messages if m.id}
-            new_messages = [m for m in result_messages if m.id not in input_ids]
-
-            for msg in new_messages:
-                if isinstance(msg, AIMessage):
-                    if msg.tool_calls:
-                        # Emit tool call events for each tool call
-                        for tc in msg.tool_calls:
-                            tc_id = tc.get("id", str(uuid.uuid4()))
-                            tc_name = tc.get("name", "unknown")
-                            tc_args = tc.get("args", {})
-
-                            yield agui_event("TOOL_CALL_START", {
-                                "toolCallId": tc_id,
-                                "toolCallName": tc_name,
-                                "parentMessageId": msg.id or str(uuid.uuid4()),
-                            })
-                            yield agui_event("TOOL_CALL_ARGS", {
-                                "toolCallId": tc_id,
-                                "delta": json.dumps(tc_args),
-                            })
-                            yield agui_event("TOOL_CALL_END", {
-                                "toolCallId": tc_id,
-                            })
-
-                    if msg.content:
-                        # Emit text message events
-                        msg_id = msg.id or str(uuid.uuid4())
-                        yield agui_event("TEXT_MESSAGE_START", {
-                            "messageId": msg_id,
-                            "role": "assistant",
-                        })
-
-                        # Stream content in chunks for a more natural feel
-                        content = msg.content
-                        chunk_size = 20
-                        for i in range(0, len(content), chunk_size):
-                            chunk = content[i:i + chunk_size]
-                            yield agui_event("TEXT_MESSAGE_CONTENT", {
-                                "messageId": msg_id,
-                                "delta": chunk,
-                            })
-
-                        yield agui_event("TEXT_MESSAGE_END", {
-                            "messageId": msg_id,
-                        })
-
-                elif isinstance(msg, ToolMessage):
-                    # Emit tool result
-                    yield agui_event("TOOL_CALL_RESULT", {
-                        "messageId": msg.id or str(uuid.uuid4()),
-                        "toolCallId": msg.tool_call_id,
-                        "content": msg.content if isinstance(msg.content, str) else json.dumps(msg.content),
-                        "role": "tool",
-                    })
+            # Only convert the messages the thread checkpoint doesn't already
+            # hold; read after admission so a queued run sees the latest state
+            with telemetry.span("agui.ingest"):
+                graph = await agent_graph()
+                snapshot = await graph.aget_state(config)
+                plan, history_index = plan_ingestion(
+                    messages,
+                    snapshot.values.get("messages", []),
+                    snapshot.values.get(HISTORY_INDEX_KEY),
+                )
+                lc_messages = agui_messages_to_langchain(plan.new_messages)
+
+            # Build initial state for the graph
+            graph_input = {
+                "messages": plan.graph_messages(lc_messages),
+                "tenant_id": tenant_id,
+                HISTORY_INDEX_KEY: history_index,
+            }
+
+            # Bring the client's state up to the server's before the run
+            # (usually nothing to send, see app/state_sync.py)
+            if state_sync is not None:
+                for agui_event in state_sync.start({**snapshot.values, **graph_input}):
+                    trace.mark_event()
+                    yield agui_event
+
+            # astream_events surfaces model tokens / tool-call deltas, tool
+            # results and state deltas while the ReAct loop is still running.
+            graph_events = graph.astream_events(graph_input, config=config, version="v2")
+            async with aclosing(graph_events):
+                async for event in graph_events:
+                    for agui_event in translator.translate(event):
+                        trace.mark_event()
+                        # State events patch this client's state; the cache
+                        # records a full snapshot instead (below)
+                        if cache_key and not agui_event[0].startswith("STATE_"):
+                            recorded.append(agui_event)
+                        yield agui_event
+            for agui_event in translator.close():
+                if cache_key:
+                    recorded.append(agui_event)
+                yield agui_event
 
-            # Emit final state snapshot
             final_state = {
-                k: v for k, v in result.items()
-                if k != "messages"
+                k: v for k, v in (translator.final_state or {}).items()
+                if k not in INTERNAL_STATE_KEYS
             }
-            if final_state:
-                yield agui_event("STATE_SNAPSHOT", {
-                    "snapshot": final_state,
-                })
+            if state_sync is not None:
+                for agui_event in state_sync.finish(translator.final_state):
+                    yield agui_event
+            elif final_state:
+                yield "STATE_SNAPSHOT", {"snapshot": final_state}
+            if cache_key and final_state:
+                recorded.append(("STATE_SNAPSHOT", {"snapshot": final_state}))
 
         except Exception as e:
-            yield agui_event("RUN_ERROR", {
-                "message": str(e),
-                "code": "AGENT_ERROR",
-            })
+            trace.outcome = "error"
+            if settings.run_timing_events:
+                yield run_timing_event(trace)
+            yield "RUN_ERROR", {"message": str(e), "code": "AGENT_ERROR"}
             return
 
+        if cache_key:
+            response_cache.put(cache_key, recorded)
+
+        trace.outcome = "ok"
+        if settings.run_timing_events:
+            yield run_timing_event(trace)
+
         # RUN_FINISHED
-        yield agui_event("RUN_FINISHED", {"threadId": thread_id, "runId": run_id})
+        yield "RUN_FINISHED", {"threadId": thread_id, "runId": run_id}
 
+    # Encoded as SSE frames, with content deltas coalesced (see app/sse.py);
+    # the run is cancelled if the client disconnects
+    stream = stream_frames(
+        event_generator(), disconnected=functools.partial(wait_for_disconnect, request),
+    )
+    # Frees the slot even if the response is dropped before streaming starts
+    weakref.finalize(stream, scheduler.release, ticket)
     return StreamingResponse(
-        event_generator(),
+        stream,
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
     )
 
 
+# ---------------------------------------------------------------------------
+# Batch runs
+# ---------------------------------------------------------------------------
+
+@app.post("/batch")
+async def batch(request: Request):
+    """Run many (tenant, prompt) jobs; streams one NDJSON line per finished job.
+
+    Body: ``{"batchId"?, "jobs": [{"id"?, "tenantId"?, "prompt"}], "concurrency"?}``.
+    Re-posting the same ``batchId`` and jobs resumes an interrupted batch
+    (see app/batch.py).
+    """
+    body = await request.json()
+    try:
+        jobs = parse_jobs(body.get("jobs"), settings.default_tenant_id)
+        concurrency = parse_concurrency(body.get("concurrency"), settings.batch_max_concurrency)
+    except BatchRequestError as e:
+        return JSONResponse({"error": str(e), "code": "INVALID_BATCH"}, status_code=400)
+    if len(jobs) > settings.batch_max_jobs:
+        return JSONResponse(
+            {"error": f"at most {settings.batch_max_jobs} jobs per batch", "code": "INVALID_BATCH"},
+            status_code=400,
+        )
+    batch_id = str(body.get("batchId") or new_batch_id())
+    graph = await agent_graph()
+
+    async def lines() -> AsyncIterator[bytes]:
+        async with aclosing(run_batch(graph, batch_id, jobs, concurrency)) as results:
+            async for line in results:
+                yield dumps(line) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+telemetry.register_stats(
+    "agent_model_calls", model_stats, "Model call totals",
+    counters=(
+        "calls", "errors", "cancelled", "retries", "throttled", "input_tokens", "output_tokens",
+    ),
+)
+telemetry.register_stats(
+    "agent_tool_cache", tool_cache.stats, "Tool result cache",
+    counters=("hits", "misses", "coalesced", "evictions"),
+)
+telemetry.register_stats(
+    "agent_prefetch", prefetcher.stats, "Speculative tool prefetch",
+    counters=(
+        "started", "hit", "wasted", "cancelled", "over_budget", "already_cached",
+        "wasted_seconds",
+    ),
+)
+telemetry.register_stats(
+    "agui_response_cache", response_cache.stats, "Response cache",
+    counters=("hits", "misses", "stored", "skipped", "evictions"),
+)
+telemetry.register_stats("agui_scheduler", scheduler.stats, "Run scheduler")
+# Memory (app/checkpoint.py) and SQLite (app/sqlite_checkpoint.py) savers
+telemetry.register_stats(
+    "agent_checkpoint", checkpoint_stats, "Checkpointer",
+    counters=(
+        "hits", "misses", "evictions_lru", "evictions_ttl", "checkpoints_pruned",
+        "cache_hits", "cache_misses", "batches", "writes_batched", "threads_expired",
+    ),
+)
+telemetry.register_stats("agent_startup", warmup.stats, "Startup warmup")
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of run, span, token and cache metrics."""
+    return PlainTextResponse(telemetry.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/runs")
+async def metrics_runs() -> dict[str, Any]:
+    """Timing summaries and spans of the most recent runs."""
+    return {"runs": telemetry.recent_runs()}
+
+
 @app.get("/health")
 async def health() -> dict[str, str]:
     return {"status": "ok", "agent": "finops_assistant"}
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    """Readiness: 200 once startup warmup has finished and checkpoints can be written."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
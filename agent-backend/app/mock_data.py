@@ -1,85 +1,181 @@
-"""Mock data generators for the FinOps Assistant.
+"""Mock data layer for the FinOps Assistant.
 
-These provide realistic fintech data when no real data source is connected.
+Results are vectorized aggregations over the tenant's synthetic columnar
+transaction dataset (see app/txn_store.py), so latency percentiles, success
+rates and breakdowns are computed from real rows for any ``date_range`` up to
+a year instead of being drawn at random per request.
+
+Transaction summaries and SLA metrics are answered from pre-aggregated
+hourly / daily rollups (see app/rollups.py); the channel breakdown still
+scans the rows in range.
 """
-import random
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.rollups import get_rollups, sketch_quantiles
+from app.txn_store import (
+    CHANNELS,
+    MERCHANTS,
+    SECONDS_PER_DAY,
+    STATUS_SUCCESS,
+    get_store,
+    parse_date_range,
+)
+
+SLA_TARGETS = {
+    "uptime_target_pct": 99.95,
+    "p95_latency_target_ms": 300,
+    "error_rate_target_pct": 0.10,
+}
+
+# A 5-minute bucket counts as downtime when most of its traffic errors out
+DOWNTIME_ERROR_SHARE = 0.5
+
+
+def _date(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _pct(part: float, total: float, digits: int = 2) -> float:
+    return round(float(part) / float(total) * 100, digits) if total else 0.0
+
+
+def _status_for(value: float, target: float, *, at_risk_margin: float) -> str:
+    """Classify ``value`` against an upper-bound target."""
+    if value <= target:
+        return "COMPLIANT"
+    if value <= target * (1 + at_risk_margin):
+        return "AT_RISK"
+    return "NON_COMPLIANT"
 
 
 def get_transaction_summary(tenant_id: str, date_range: str = "7d") -> dict:
-    """Return mock transaction summary for a tenant."""
-    days = int(date_range.replace("d", "")) if date_range.endswith("d") else 7
+    """Return the transaction summary for a tenant over ``date_range``."""
+    store = get_store(tenant_id)
+    start = store.window_start(parse_date_range(date_range))
+    agg = get_rollups(store).aggregate(start, store.end_ts)
 
-    base_volume = random.randint(850_000, 1_200_000)
-    success_rate = round(random.uniform(97.2, 99.8), 2)
-    avg_latency_ms = round(random.uniform(120, 280), 1)
+    # Fold rollup buckets (daily, or hourly for sub-day ranges) into days
+    bucket_ts = agg.bucket_start + np.arange(len(agg.bucket_volume)) * agg.bucket_seconds
+    day_ts = bucket_ts - bucket_ts % SECONDS_PER_DAY
+    days, day_idx = np.unique(day_ts, return_inverse=True)
+    day_volume = np.bincount(day_idx, weights=agg.bucket_volume, minlength=len(days))
+    day_amount = np.bincount(day_idx, weights=agg.bucket_amount, minlength=len(days))
 
-    daily_volumes = []
-    for i in range(days):
-        date = (datetime.now() - timedelta(days=days - 1 - i)).strftime("%Y-%m-%d")
-        volume = base_volume + random.randint(-100_000, 150_000)
-        daily_volumes.append({"date": date, "volume": volume, "amount_usd": round(volume * random.uniform(42, 78), 2)})
+    top = np.argsort(agg.merchant_volume)[::-1][:5]
 
     return {
         "tenant_id": tenant_id,
         "date_range": date_range,
-        "total_transactions": sum(d["volume"] for d in daily_volumes),
-        "total_amount_usd": round(sum(d["amount_usd"] for d in daily_volumes), 2),
-        "success_rate_pct": success_rate,
-        "avg_latency_ms": avg_latency_ms,
-        "daily_breakdown": daily_volumes,
+        "total_transactions": agg.volume,
+        "total_amount_usd": round(agg.amount, 2),
+        "success_rate_pct": _pct(agg.success, agg.volume),
+        "avg_latency_ms": round(agg.latency_sum / agg.volume, 1) if agg.volume else 0.0,
+        "daily_breakdown": [
+            {
+                "date": _date(int(days[i])),
+                "volume": int(day_volume[i]),
+                "amount_usd": round(float(day_amount[i]), 2),
+            }
+            for i in range(len(days))
+        ],
         "top_merchants": [
-            {"name": "Stripe Connect", "volume": random.randint(200_000, 400_000), "amount_usd": round(random.uniform(8_000_000, 15_000_000), 2)},
-            {"name": "PayPal Commerce", "volume": random.randint(150_000, 300_000), "amount_usd": round(random.uniform(5_000_000, 12_000_000), 2)},
-            {"name": "Square POS", "volume": random.randint(100_000, 250_000), "amount_usd": round(random.uniform(3_000_000, 8_000_000), 2)},
-            {"name": "Adyen Gateway", "volume": random.randint(80_000, 200_000), "amount_usd": round(random.uniform(4_000_000, 10_000_000), 2)},
-            {"name": "Worldpay Direct", "volume": random.randint(50_000, 150_000), "amount_usd": round(random.uniform(2_000_000, 6_000_000), 2)},
+            {
+                "name": MERCHANTS[i],
+                "volume": int(agg.merchant_volume[i]),
+                "amount_usd": round(float(agg.merchant_amount[i]), 2),
+            }
+            for i in top
+            if agg.merchant_volume[i]
         ],
     }
 
 
-def get_sla_compliance(tenant_id: str) -> dict:
-    """Return mock SLA compliance metrics."""
+def get_sla_compliance(tenant_id: str, date_range: str | None = None) -> dict:
+    """Return SLA compliance metrics for the current month or ``date_range``."""
+    store = get_store(tenant_id)
+    if date_range:
+        start = store.window_start(parse_date_range(date_range))
+    else:
+        month_start = datetime.fromtimestamp(store.end_ts, tz=timezone.utc).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0,
+        )
+        start = int(month_start.timestamp())
+    rollups = get_rollups(store)
+    agg = rollups.aggregate(start, store.end_ts)
+
+    # Uptime: share of 5-minute buckets that were not dominated by errors
+    down = rollups.downtime_buckets(start, store.end_ts, DOWNTIME_ERROR_SHARE)
+    incidents = int(np.count_nonzero(np.diff(down.astype(np.int8), prepend=0) == 1))
+
+    p50, p95, p99 = sketch_quantiles(agg.latency_hist, [0.50, 0.95, 0.99])
+    uptime = round(100.0 - _pct(np.count_nonzero(down), len(down), digits=6), 3)
+    error_rate = _pct(agg.errors, agg.volume, digits=3)
+
     return {
         "tenant_id": tenant_id,
-        "period": "current_month",
-        "uptime_pct": round(random.uniform(99.90, 99.99), 3),
-        "p50_latency_ms": round(random.uniform(45, 85), 1),
-        "p95_latency_ms": round(random.uniform(180, 350), 1),
-        "p99_latency_ms": round(random.uniform(400, 800), 1),
-        "error_rate_pct": round(random.uniform(0.01, 0.15), 3),
-        "sla_targets": {
-            "uptime_target_pct": 99.95,
-            "p95_latency_target_ms": 300,
-            "error_rate_target_pct": 0.10,
-        },
+        "period": date_range or "current_month",
+        "uptime_pct": uptime,
+        "p50_latency_ms": round(p50, 1),
+        "p95_latency_ms": round(p95, 1),
+        "p99_latency_ms": round(p99, 1),
+        "error_rate_pct": error_rate,
+        "sla_targets": dict(SLA_TARGETS),
         "compliance_status": {
-            "uptime": "COMPLIANT",
-            "latency": random.choice(["COMPLIANT", "COMPLIANT", "AT_RISK"]),
-            "error_rate": random.choice(["COMPLIANT", "COMPLIANT", "NON_COMPLIANT"]),
+            "uptime": "COMPLIANT" if uptime >= SLA_TARGETS["uptime_target_pct"] else (
+                "AT_RISK" if uptime >= SLA_TARGETS["uptime_target_pct"] - 0.05 else "NON_COMPLIANT"
+            ),
+            "latency": _status_for(p95, SLA_TARGETS["p95_latency_target_ms"], at_risk_margin=0.1),
+            "error_rate": _status_for(
+                error_rate, SLA_TARGETS["error_rate_target_pct"], at_risk_margin=0.25,
+            ),
         },
-        "incidents_this_month": random.randint(0, 3),
+        # Over the same window as every other metric (``period``)
+        "incidents": incidents,
     }
 
 
-def get_payment_channel_breakdown(tenant_id: str) -> dict:
-    """Return mock payment channel data."""
+def get_payment_channel_breakdown(tenant_id: str, date_range: str = "30d") -> dict:
+    """Return per-channel volume, ticket size, success rate and latency."""
+    store = get_store(tenant_id)
+    start = store.window_start(parse_date_range(date_range, default_days=30))
+    rows = store.view(store.rows_between(start))
+    channel = rows["channel"]
+    total = len(channel)
+    n = len(CHANNELS)
+
+    volume = np.bincount(channel, minlength=n)
+    amount = np.bincount(channel, weights=rows["amount"], minlength=n)
+    success = np.bincount(channel, weights=rows["status"] == STATUS_SUCCESS, minlength=n)
+
+    # Per-channel latency percentiles: group rows by channel once (stable
+    # sort on a uint8 key is a radix sort), then partition each contiguous run.
+    grouped_latency = rows["latency"][np.argsort(channel, kind="stable")]
+    bounds = np.concatenate(([0], np.cumsum(volume)))
+    latency = np.zeros((n, 2))
+    for i in range(n):
+        if volume[i]:
+            latency[i] = np.percentile(grouped_latency[bounds[i]:bounds[i + 1]], [50, 95])
+
     channels = [
-        {"channel": "Credit Card", "volume_pct": round(random.uniform(38, 48), 1), "avg_ticket_usd": round(random.uniform(65, 120), 2), "success_rate_pct": round(random.uniform(97, 99.5), 2)},
-        {"channel": "Debit Card", "volume_pct": round(random.uniform(20, 30), 1), "avg_ticket_usd": round(random.uniform(35, 75), 2), "success_rate_pct": round(random.uniform(98, 99.8), 2)},
-        {"channel": "ACH/Bank Transfer", "volume_pct": round(random.uniform(10, 18), 1), "avg_ticket_usd": round(random.uniform(250, 1200), 2), "success_rate_pct": round(random.uniform(99, 99.9), 2)},
-        {"channel": "Digital Wallet", "volume_pct": round(random.uniform(8, 15), 1), "avg_ticket_usd": round(random.uniform(40, 90), 2), "success_rate_pct": round(random.uniform(98.5, 99.9), 2)},
-        {"channel": "Wire Transfer", "volume_pct": round(random.uniform(2, 6), 1), "avg_ticket_usd": round(random.uniform(5000, 50000), 2), "success_rate_pct": round(random.uniform(99.5, 100), 2)},
+        {
+            "channel": CHANNELS[i].name,
+            "volume_pct": _pct(volume[i], total, digits=1),
+            "avg_ticket_usd": round(float(amount[i] / volume[i]), 2) if volume[i] else 0.0,
+            "success_rate_pct": _pct(success[i], volume[i]),
+            "p50_latency_ms": round(float(latency[i, 0]), 1),
+            "p95_latency_ms": round(float(latency[i, 1]), 1),
+        }
+        for i in range(n)
     ]
-    # Normalize percentages to sum to 100
-    total = sum(c["volume_pct"] for c in channels)
-    for c in channels:
-        c["volume_pct"] = round(c["volume_pct"] / total * 100, 1)
+    active = [c for c, v in zip(channels, volume) if v]
 
     return {
         "tenant_id": tenant_id,
+        "date_range": date_range,
         "channels": channels,
-        "total_channels_active": len(channels),
-        "fastest_channel": "Digital Wallet",
-        "highest_value_channel": "Wire Transfer",
+        "total_channels_active": len(active),
+        "fastest_channel": min(active, key=lambda c: c["p50_latency_ms"])["channel"] if active else None,
+        "highest_value_channel": max(active, key=lambda c: c["avg_ticket_usd"])["channel"] if active else None,
     }
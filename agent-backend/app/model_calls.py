@@ -0,0 +1,334 @@
+"""Async model invocation with concurrency limits, retries and call stats.
+
+``call_model`` awaits the model through ``ainvoke_model`` instead of a
+blocking ``invoke``, so the event loop keeps serving other runs while a call
+is in flight. ``ChatBedrock`` has no native async path, though: LangChain runs
+its blocking call on the loop's default executor, so each Bedrock call still
+holds an executor thread for its whole duration. The app's lifespan handler
+therefore installs ``model_call_executor()``, a default executor with a
+thread for each of the ``llm_max_concurrency`` calls; without it, calls the
+semaphore admitted would queue for a thread.
+
+- A global semaphore bounds in-flight model calls (``llm_max_concurrency``)
+  and a per-tenant semaphore (``llm_max_concurrency_per_tenant``) keeps one
+  busy tenant from taking every slot. Semaphores belong to one event loop,
+  so each loop gets its own ``ModelCallLimiter`` (``loop_limiter()``); a
+  tenant's semaphore is dropped once it has no call in flight or waiting.
+- A cancelled run (client disconnected) cancels the pending call; it is
+  counted as ``cancelled``, not as an error.
+- Throttling / transient service errors are retried with full-jitter
+  exponential backoff (``llm_max_retries``), but only while the attempt has
+  not streamed anything: once a chunk has reached the client, replaying the
+  call would repeat it, so a mid-stream error (ConverseStream can send
+  ``InternalServerException`` after the first tokens) fails the call.
+- Every call records queue time, latency, retries and token usage; totals
+  are available from ``model_stats()`` and recent calls from
+  ``recent_calls()``. Calls are also traced as ``model`` spans of the
+  current run (see app/telemetry.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Sequence
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import AIMessage, BaseMessage
+
+from app import telemetry
+from app.config import settings
+
+if TYPE_CHECKING:  # runtime import is slow; deferred to graph build (see app/warmup.py)
+    from langchain_core.runnables import Runnable, RunnableConfig
+
+# Bedrock error codes worth retrying (botocore ClientError "Error.Code")
+RETRYABLE_ERROR_CODES = frozenset({
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+})
+
+RECENT_CALLS = 256
+# Default executor threads on top of llm_max_concurrency, for the loop's
+# other asyncio.to_thread work (checkpoint reads, cache waits, warmup)
+EXECUTOR_HEADROOM = 8
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for throttling / transient service errors.
+
+    ``botocore`` is not imported here: the error code is read from the
+    ``ClientError.response`` shape, and langchain-aws wraps client errors in
+    a ``ValueError`` whose message carries the original code.
+    """
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code in RETRYABLE_ERROR_CODES:
+            return True
+    if type(error).__name__ in RETRYABLE_ERROR_CODES:
+        return True
+    message = str(error)
+    return any(code in message for code in RETRYABLE_ERROR_CODES)
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry ``attempt`` (1-based)."""
+    cap = min(settings.llm_retry_max_seconds, settings.llm_retry_base_seconds * 2 ** (attempt - 1))
+    return random.uniform(0, cap)
+
+
+class StreamWatch(AsyncCallbackHandler):
+    """Notes whether a model call has streamed a chunk yet."""
+
+    def __init__(self) -> None:
+        self.streamed = False
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.streamed = True
+
+
+# ---------------------------------------------------------------------------
+# Concurrency limits
+# ---------------------------------------------------------------------------
+
+def model_call_executor() -> ThreadPoolExecutor | None:
+    """Default executor sized for ``llm_max_concurrency`` blocking model calls.
+
+    None when model calls are unlimited: the loop keeps asyncio's default.
+    """
+    if settings.llm_max_concurrency <= 0:
+        return None
+    return ThreadPoolExecutor(
+        max_workers=settings.llm_max_concurrency + EXECUTOR_HEADROOM,
+        thread_name_prefix="model-call",
+    )
+
+
+class ModelCallLimiter:
+    """Global + per-tenant concurrency limits for the model calls of one loop."""
+
+    def __init__(self, max_concurrency: int, max_per_tenant: int) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_per_tenant = max_per_tenant
+        self._global = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        # tenant -> [semaphore, callers holding or waiting]; dropped when idle
+        self._tenants: dict[str, list[Any]] = {}
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: str) -> AsyncIterator[None]:
+        tenant = None
+        if self.max_per_tenant > 0:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is None:
+                tenant = self._tenants[tenant_id] = [asyncio.Semaphore(self.max_per_tenant), 0]
+            tenant[1] += 1
+        try:
+            # Tenant slot first, so a tenant at its limit doesn't hold a global slot
+            if tenant is not None:
+                await tenant[0].acquire()
+            try:
+                if self._global is not None:
+                    await self._global.acquire()
+                try:
+                    yield
+                finally:
+                    if self._global is not None:
+                        self._global.release()
+            finally:
+                if tenant is not None:
+                    tenant[0].release()
+        finally:
+            if tenant is not None:
+                tenant[1] -= 1
+                if tenant[1] == 0:
+                    self._tenants.pop(tenant_id, None)
+
+    def in_use(self) -> dict[str, int]:
+        return {tenant: users for tenant, (_, users) in list(self._tenants.items())}
+
+
+# One limiter per event loop; dropped with its loop
+_limiters: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ModelCallLimiter] = (
+    weakref.WeakKeyDictionary()
+)
+_limiters_lock = threading.Lock()
+
+
+def loop_limiter() -> ModelCallLimiter:
+    """The running event loop's limiter."""
+    loop = asyncio.get_running_loop()
+    with _limiters_lock:
+        limiter = _limiters.get(loop)
+        if limiter is None:
+            limiter = _limiters[loop] = ModelCallLimiter(
+                max_concurrency=settings.llm_max_concurrency,
+                max_per_tenant=settings.llm_max_concurrency_per_tenant,
+            )
+        return limiter
+
+
+# ---------------------------------------------------------------------------
+# Call stats
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ModelCall:
+    tenant_id: str
+    started_at: float
+    queue_ms: float
+    latency_ms: float
+    attempts: int
+    input_tokens: int
+    output_tokens: int
+    error: str | None = None
+
+
+class ModelCallStats:
+    """Running totals plus a ring buffer of the most recent calls."""
+
+    def __init__(self, recent: int = RECENT_CALLS) -> None:
+        self._lock = threading.Lock()
+        self._recent: deque[ModelCall] = deque(maxlen=recent)
+        self.calls = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.retries = 0
+        self.throttled = 0
+        self.latency_ms_total = 0.0
+        self.queue_ms_total = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, call: ModelCall, throttled: int) -> None:
+        with self._lock:
+            self._recent.append(call)
+            self.calls += 1
+            self.errors += call.error not in (None, "CancelledError")
+            self.cancelled += call.error == "CancelledError"
+            self.retries += call.attempts - 1
+            self.throttled += throttled
+            self.latency_ms_total += call.latency_ms
+            self.queue_ms_total += call.queue_ms
+            self.input_tokens += call.input_tokens
+            self.output_tokens += call.output_tokens
+
+    def recent(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [asdict(c) for c in self._recent]
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "cancelled": self.cancelled,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "avg_latency_ms": round(self.latency_ms_total / self.calls, 1) if self.calls else 0.0,
+                "avg_queue_ms": round(self.queue_ms_total / self.calls, 1) if self.calls else 0.0,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+            }
+
+
+def _token_usage(message: Any) -> tuple[int, int]:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return int(usage.get("input_tokens", 0)), int(usage.get("output_tokens", 0))
+
+
+# ---------------------------------------------------------------------------
+# Invocation
+# ---------------------------------------------------------------------------
+
+call_stats = ModelCallStats()
+
+
+async def ainvoke_model(
+    model: Runnable[Sequence[BaseMessage], AIMessage],
+    messages: Sequence[BaseMessage],
+    *,
+    tenant_id: str,
+    config: RunnableConfig | None = None,
+    max_retries: int | None = None,
+) -> AIMessage:
+    """Invoke ``model`` asynchronously under the concurrency limits, with retries."""
+    # Deferred like the Runnable imports above; loaded by the graph by now
+    from langchain_core.runnables.config import merge_configs
+
+    if max_retries is None:
+        max_retries = settings.llm_max_retries
+    queued_at = time.perf_counter()
+    attempts = throttled = 0
+    response: AIMessage | None = None
+    error: BaseException | None = None
+
+    async with loop_limiter().slot(tenant_id):
+        started = time.perf_counter()
+        while True:
+            attempts += 1
+            watch = StreamWatch()
+            try:
+                response = await model.ainvoke(
+                    messages, merge_configs(config, {"callbacks": [watch]}),
+                )
+                break
+            except asyncio.CancelledError as e:
+                # Run cancelled (client disconnected): record, then re-raise
+                error = e
+                break
+            except Exception as e:
+                retryable = is_retryable(e)
+                throttled += retryable
+                # Chunks already sent to the client would be streamed again
+                if not retryable or watch.streamed or attempts > max_retries:
+                    error = e
+                    break
+                await asyncio.sleep(backoff_seconds(attempts))
+        finished = time.perf_counter()
+
+    input_tokens, output_tokens = _token_usage(response)
+    call_stats.record(
+        ModelCall(
+            tenant_id=tenant_id,
+            started_at=time.time() - (finished - queued_at),
+            queue_ms=round((started - queued_at) * 1000, 2),
+            latency_ms=round((finished - started) * 1000, 2),
+            attempts=attempts,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            error=type(error).__name__ if error is not None else None,
+        ),
+        throttled,
+    )
+    telemetry.record_span(
+        "model", started, finished,
+        error=error is not None and not isinstance(error, asyncio.CancelledError),
+        queue_ms=round((started - queued_at) * 1000, 2), attempts=attempts,
+    )
+    telemetry.record_tokens(input_tokens, output_tokens)
+    if error is not None:
+        raise error
+    return response
+
+
+def model_stats() -> dict[str, Any]:
+    in_flight: Counter[str] = Counter()
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        in_flight.update(limiter.in_use())
+    return {**call_stats.snapshot(), "tenants_in_flight": dict(in_flight)}
+
+
+def recent_calls() -> list[dict[str, Any]]:
+    return call_stats.recent()
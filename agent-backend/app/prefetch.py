@@ -0,0 +1,327 @@
+"""Speculative tool prefetch while the model decides which tools to call.
+
+When the intent router (app/intent_router.py) isn't confident enough to call
+a tool itself, the model's first call of a turn is usually just the tool
+choice, and tools only start once it returns, so tool latency adds to model
+latency. ``call_model`` (see app/agent.py) now starts a ``Speculation``
+alongside that call:
+
+- likely calls are predicted from the user message -- every intent scoring
+  at least ``MIN_INTENT_SCORE`` in the router's matcher -- or, for a message
+  that matches no intent, from the tenant's recent tool calls (its dominant
+  tool). ``tenant_id`` comes from the state; ``date_range`` from the
+  message, else the tenant's last one for that tool, else the tool default;
+- up to ``prefetch_max_calls`` predictions run through the tool result
+  cache (app/cache.py): when the model asks for the same call, the tools
+  node gets a cache hit, or joins the prefetch still in flight;
+- once the model answers, matching prefetches are kept and the others are
+  cancelled (blocking work already handed to the tool thread pool still
+  finishes there; its result is dropped);
+- each tenant has a budget of ``prefetch_tenant_budget_per_minute``
+  speculative calls. Hits are refunded, so only wasted work spends it, and
+  a tenant whose questions can't be predicted stops being prefetched for.
+
+Predictions that are already cached or in flight are not started again.
+Outcomes (``hit`` / ``wasted`` / ``cancelled`` / ``over_budget``) are counted
+per tenant and tool in ``agent_prefetch_calls_total``, the wall time of
+wasted work in ``agent_prefetch_wasted_seconds_total``; the other
+``agent_prefetch_*_total`` counters carry the totals, gauges the hit rate and
+calls in flight. Prefetch needs the tool cache.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, ToolCall
+
+from app import telemetry
+from app.cache import CacheKey, tool_cache
+from app.config import settings
+from app.intent_router import infer_date_range, score_intents
+from app.streaming import content_text
+
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
+
+# An intent needs one strong term (or two weak ones) to be prefetched
+MIN_INTENT_SCORE = 1.0
+# Recent model tool calls kept per tenant, for at most this many tenants
+HISTORY_CALLS = 32
+HISTORY_TENANTS = 1024
+# A message matching no intent prefetches the tenant's dominant tool if it
+# made at least this share of (at least HISTORY_MIN_CALLS) recent calls
+HISTORY_MIN_SHARE = 0.6
+HISTORY_MIN_CALLS = 3
+
+calls_total = telemetry.registry.counter(
+    "agent_prefetch_calls_total",
+    "Speculative tool calls by outcome (hit / wasted / cancelled / over_budget).",
+    ("tenant", "tool", "outcome"),
+)
+wasted_seconds_total = telemetry.registry.counter(
+    "agent_prefetch_wasted_seconds_total",
+    "Wall time of speculative tool calls the model did not make.",
+    ("tenant", "tool"),
+)
+
+
+def call_key(tool: BaseTool, args: dict[str, Any]) -> CacheKey | None:
+    """Tool cache key of a call, defaults applied; None for invalid args."""
+    try:
+        params = tool.args_schema.model_validate(args).model_dump()
+    except Exception:
+        return None
+    return tool_cache.make_key(tool.name, str(params.get("tenant_id", "")), params)
+
+
+# ---------------------------------------------------------------------------
+# Prediction
+# ---------------------------------------------------------------------------
+
+class ToolHistory:
+    """The model's recent tool calls per tenant."""
+
+    def __init__(
+        self, max_calls: int = HISTORY_CALLS, max_tenants: int = HISTORY_TENANTS,
+    ) -> None:
+        self.max_calls = max_calls
+        self.max_tenants = max_tenants
+        self._tenants: OrderedDict[str, deque[tuple[str, dict[str, Any]]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, tenant_id: str, tool_calls: Sequence[ToolCall]) -> None:
+        if not tool_calls:
+            return
+        with self._lock:
+            calls = self._tenants.get(tenant_id)
+            if calls is None:
+                calls = self._tenants[tenant_id] = deque(maxlen=self.max_calls)
+            self._tenants.move_to_end(tenant_id)
+            calls.extend((call["name"], call["args"]) for call in tool_calls)
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+
+    def calls(self, tenant_id: str) -> list[tuple[str, dict[str, Any]]]:
+        with self._lock:
+            return list(self._tenants.get(tenant_id, ()))
+
+
+def predict(
+    text: str, tenant_id: str, history: Sequence[tuple[str, dict[str, Any]]], max_calls: int,
+) -> list[tuple[str, dict[str, Any]]]:
+    """Likely ``(tool name, args)`` calls for a user message, most likely first."""
+    text = text.lower()
+    tools = [intent.tool for score, intent in score_intents(text) if score >= MIN_INTENT_SCORE]
+    if not tools and len(history) >= HISTORY_MIN_CALLS:
+        tool, count = Counter(name for name, _ in history).most_common(1)[0]
+        if count / len(history) >= HISTORY_MIN_SHARE:
+            tools = [tool]
+    date_range = infer_date_range(text)
+    predictions = []
+    for tool in tools[:max_calls]:
+        args: dict[str, Any] = {"tenant_id": tenant_id}
+        last_range = next(
+            (a.get("date_range") for name, a in reversed(history) if name == tool), None,
+        )
+        if date_range or last_range:
+            args["date_range"] = date_range or last_range
+        predictions.append((tool, args))
+    return predictions
+
+
+# ---------------------------------------------------------------------------
+# Budget
+# ---------------------------------------------------------------------------
+
+class TenantBudget:
+    """Token bucket of speculative calls per tenant, refilled per minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.per_minute = per_minute
+        # tenant -> [tokens, refilled at]
+        self._buckets: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, bucket: list[float], now: float) -> None:
+        bucket[0] = min(self.per_minute, bucket[0] + (now - bucket[1]) * self.per_minute / 60)
+        bucket[1] = now
+
+    def take(self, tenant_id: str) -> bool:
+        if self.per_minute <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(tenant_id, [self.per_minute, now])
+            self._refill(bucket, now)
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            if len(self._buckets) > HISTORY_TENANTS:
+                self._drop_full(now)
+            return True
+
+    def refund(self, tenant_id: str) -> None:
+        with self._lock:
+            bucket = self._buckets.get(tenant_id)
+            if bucket is not None:
+                bucket[0] = min(self.per_minute, bucket[0] + 1)
+
+    def _drop_full(self, now: float) -> None:
+        # A full bucket is the same as no bucket
+        for tenant_id, bucket in list(self._buckets.items()):
+            self._refill(bucket, now)
+            if bucket[0] >= self.per_minute:
+                del self._buckets[tenant_id]
+
+
+# ---------------------------------------------------------------------------
+# Speculation
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _Call:
+    tool: str
+    key: CacheKey
+    started: float
+    finished: float | None = None
+    task: asyncio.Task | None = None
+
+
+class Speculation:
+    """The prefetches started for one model call."""
+
+    def __init__(
+        self, prefetcher: Prefetcher, tenant_id: str, tools_by_name: dict[str, BaseTool],
+    ) -> None:
+        self.prefetcher = prefetcher
+        self.tenant_id = tenant_id
+        self.tools_by_name = tools_by_name
+        self.calls: list[_Call] = []
+
+    def launch(self, tool: BaseTool, args: dict[str, Any], key: CacheKey) -> None:
+        call = _Call(tool.name, key, time.perf_counter())
+        # The task copies this context, so its span lands on the current run
+        call.task = asyncio.create_task(self._run(call, tool, args))
+        self.prefetcher.track(call.task)
+        self.calls.append(call)
+
+    async def _run(self, call: _Call, tool: BaseTool, args: dict[str, Any]) -> None:
+        try:
+            with telemetry.span(f"prefetch.{tool.name}"):
+                await asyncio.wait_for(
+                    tool.coroutine(**args), timeout=settings.tool_timeout_seconds or None,
+                )
+        except Exception:
+            pass  # the model's own call of this tool, if any, reports the error
+        finally:
+            call.finished = time.perf_counter()
+
+    def settle(self, tool_calls: Sequence[ToolCall]) -> None:
+        """The model answered: keep prefetches it asked for, cancel the rest."""
+        self.prefetcher.history.record(self.tenant_id, tool_calls)
+        wanted = set()
+        for tool_call in tool_calls:
+            tool = self.tools_by_name.get(tool_call["name"])
+            if tool is not None:
+                wanted.add(call_key(tool, tool_call["args"]))
+        for call in self.calls:
+            if call.key in wanted:
+                self.prefetcher.budget.refund(self.tenant_id)
+                self.prefetcher.record(self.tenant_id, call.tool, "hit")
+            else:
+                self._drop(call)
+        self.calls = []
+
+    def cancel(self) -> None:
+        """The model call failed or was cancelled: drop every prefetch."""
+        for call in self.calls:
+            self._drop(call)
+        self.calls = []
+
+    def _drop(self, call: _Call) -> None:
+        if call.finished is None:
+            call.task.cancel()
+            outcome, finished = "cancelled", time.perf_counter()
+        else:
+            outcome, finished = "wasted", call.finished
+        self.prefetcher.record(self.tenant_id, call.tool, outcome, finished - call.started)
+
+
+class Prefetcher:
+    """Starts speculations and keeps the history, budget and stats they share."""
+
+    def __init__(
+        self, enabled: bool = True, max_calls: int = 2, budget_per_minute: float = 30.0,
+    ) -> None:
+        self.enabled = enabled
+        self.max_calls = max_calls
+        self.history = ToolHistory()
+        self.budget = TenantBudget(budget_per_minute)
+        self._tasks: set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {
+            "started": 0, "hit": 0, "wasted": 0, "cancelled": 0, "over_budget": 0,
+            "already_cached": 0, "wasted_seconds": 0.0,
+        }
+
+    def start(
+        self, messages: Sequence[BaseMessage], tenant_id: str, tools_by_name: dict[str, BaseTool],
+    ) -> Speculation:
+        """Prefetch the likely tool calls of a new user turn (none otherwise)."""
+        speculation = Speculation(self, tenant_id, tools_by_name)
+        if not (self.enabled and tool_cache.enabled) or self.max_calls <= 0:
+            return speculation
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return speculation
+        text = content_text(messages[-1].content)
+        for name, args in predict(text, tenant_id, self.history.calls(tenant_id), self.max_calls):
+            tool = tools_by_name.get(name)
+            key = call_key(tool, args) if tool is not None else None
+            if key is None:
+                continue
+            if tool_cache.has(key):
+                self._count("already_cached")
+            elif not self.budget.take(tenant_id):
+                self.record(tenant_id, name, "over_budget")
+            else:
+                self._count("started")
+                speculation.launch(tool, args, key)
+        return speculation
+
+    def track(self, task: asyncio.Task) -> None:
+        # Hits keep running after their speculation is settled
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def record(self, tenant_id: str, tool: str, outcome: str, wasted_seconds: float = 0.0) -> None:
+        tenant = telemetry.tenant_label(tenant_id)
+        calls_total.inc(tenant=tenant, tool=tool, outcome=outcome)
+        self._count(outcome)
+        if outcome in ("wasted", "cancelled"):
+            wasted_seconds_total.inc(wasted_seconds, tenant=tenant, tool=tool)
+            self._count("wasted_seconds", wasted_seconds)
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+        settled = stats["hit"] + stats["wasted"] + stats["cancelled"]
+        stats["hit_rate"] = round(stats["hit"] / settled, 4) if settled else 0.0
+        stats["in_flight"] = len(self._tasks)
+        return stats
+
+
+# Shared prefetcher used by app/agent.py
+prefetcher = Prefetcher(
+    enabled=settings.prefetch_enabled,
+    max_calls=settings.prefetch_max_calls,
+    budget_per_minute=settings.prefetch_tenant_budget_per_minute,
+)
@@ -0,0 +1,197 @@
+"""Opt-in per-tenant cache of complete agent responses.
+
+Operators on the same tenant keep asking the same canned questions ("show me
+SLA compliance", "transaction summary for 7d"), and each one costs a full
+``agent -> tools -> agent`` loop with two model calls. With
+``RESPONSE_CACHE_ENABLED`` the AG-UI events of a successful run are recorded
+and later identical questions are answered by replaying them.
+
+- Key: tenant, the normalized last user message and the normalized previous
+  ``response_cache_context_turns`` user messages of the conversation (so a
+  follow-up only hits after the same preceding questions).
+- Expiry: an entry lives as long as the tool data it was built from; the
+  TTL is the smallest ``expiresInSeconds`` of the run's cached tool results,
+  capped at ``response_cache_ttl_seconds``. Runs using uncached tool data
+  (tool cache disabled, tool errors) are not stored.
+- Replay: message and tool call ids are regenerated, tool result ``cache``
+  fields report the replay as a hit with the data's current age, and a
+  ``CUSTOM`` ``response_cache`` event tells the client the answer was served
+  from cache. The graph and the thread checkpoint are not touched; the
+  replayed messages are ingested with the client history on the next run.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from app.config import settings
+from app.streaming import AguiEvent, content_text
+
+# Event fields holding ids that must be unique per replay
+_ID_FIELDS = ("messageId", "toolCallId", "parentMessageId")
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a question."""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", text.strip().lower()))
+
+
+@dataclass
+class CachedResponse:
+    events: list[AguiEvent]
+    created_at: float
+    expires_at: float
+    hits: int = 0
+
+
+@dataclass
+class _Counters:
+    hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    skipped: int = 0
+    evictions: int = 0
+    by_tenant: dict[str, int] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """LRU of recorded AG-UI runs, keyed per tenant and question."""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 300.0,
+        context_turns: int = 2,
+        enabled: bool = False,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.context_turns = context_turns
+        self.enabled = enabled
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = _Counters()
+
+    # -- keys ---------------------------------------------------------------
+
+    def key_for(self, tenant_id: str, messages: list[dict[str, Any]]) -> str | None:
+        """Cache key for a run, or None if the run is not cacheable."""
+        if not self.enabled or not messages or messages[-1].get("role", "user") != "user":
+            return None
+        questions = [
+            normalize_question(content_text(m.get("content", "")))
+            for m in messages
+            if m.get("role", "user") == "user"
+        ]
+        if not questions[-1]:
+            return None
+        context = questions[-1 - self.context_turns:-1] if self.context_turns > 0 else []
+        raw = json.dumps([tenant_id, questions[-1], context], separators=(",", ":"))
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+    # -- lookup / store -----------------------------------------------------
+
+    def get(self, key: str, tenant_id: str) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._counters.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self._counters.hits += 1
+            self._counters.by_tenant[tenant_id] = self._counters.by_tenant.get(tenant_id, 0) + 1
+            return entry
+
+    def put(self, key: str, events: list[AguiEvent]) -> bool:
+        """Store a successful run's events; False if its data can't be cached."""
+        ttl = self.ttl_seconds
+        for event_type, data in events:
+            if event_type != "TOOL_CALL_RESULT":
+                continue
+            expires_in = (data.get("cache") or {}).get("expiresInSeconds")
+            if expires_in is None:
+                with self._lock:
+                    self._counters.skipped += 1
+                return False
+            ttl = min(ttl, expires_in)
+        if ttl <= 0:
+            return False
+        entry = CachedResponse(
+            events=list(events),
+            created_at=time.time(),
+            expires_at=time.monotonic() + ttl,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._counters.stored += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters.evictions += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            c = self._counters
+            return {
+                "hits": c.hits,
+                "misses": c.misses,
+                "stored": c.stored,
+                "skipped": c.skipped,
+                "evictions": c.evictions,
+                "entries": len(self._entries),
+                "hits_by_tenant": dict(c.by_tenant),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # -- replay -------------------------------------------------------------
+
+    @staticmethod
+    def replay(entry: CachedResponse) -> Iterator[AguiEvent]:
+        """The recorded events with fresh ids and updated tool cache info."""
+        elapsed = max(time.time() - entry.created_at, 0.0)
+        yield "CUSTOM", {
+            "name": "response_cache",
+            "value": {"hit": True, "ageSeconds": round(elapsed, 3)},
+        }
+        ids: dict[str, str] = {}
+        for event_type, data in entry.events:
+            data = dict(data)
+            for id_field in _ID_FIELDS:
+                if id_field in data:
+                    data[id_field] = ids.setdefault(data[id_field], str(uuid.uuid4()))
+            cache = data.get("cache")
+            if event_type == "TOOL_CALL_RESULT" and cache:
+                data["cache"] = {
+                    "hit": True,
+                    "coalesced": False,
+                    "ageSeconds": round(cache["ageSeconds"] + elapsed, 3),
+                    "expiresInSeconds": round(max(cache["expiresInSeconds"] - elapsed, 0.0), 3),
+                }
+            yield event_type, data
+
+
+# Shared cache used by app/main.py
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    context_turns=settings.response_cache_context_turns,
+    enabled=settings.response_cache_enabled,
+)
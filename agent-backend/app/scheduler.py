@@ -0,0 +1,231 @@
+"""Admission control and fair per-tenant scheduling of agent runs.
+
+``/agui`` used to start a graph run for every request, so one tenant looping
+a script could occupy every model and tool slot. Runs now pass through a
+``RunScheduler`` before the graph starts:
+
+- at most ``run_max_concurrency`` runs execute at once;
+- further runs wait in per-tenant FIFO queues, bounded globally
+  (``run_max_queue``) and per tenant (``run_max_queue_per_tenant``), so a
+  single tenant can't fill the whole queue;
+- freed slots are handed out by weighted round-robin over the tenants with
+  waiting runs (``run_tenant_weights``, default weight 1): a tenant with
+  weight ``w`` gets up to ``w`` consecutive slots per turn;
+- when a queue is full the request is rejected before streaming starts with
+  ``429`` and a ``Retry-After`` estimated from recent run durations.
+
+A queued run still gets its SSE stream immediately: ``RUN_STARTED`` is
+followed by ``CUSTOM`` ``queue`` events carrying the estimated position
+until the run is admitted (see app/main.py). Response cache replays don't
+go through the scheduler.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from app import telemetry
+from app.config import settings
+
+# Weight of the newest run in the average run duration used for Retry-After
+DURATION_EMA_ALPHA = 0.2
+
+queued_runs = telemetry.registry.gauge(
+    "agui_queued_runs", "AG-UI runs waiting for a run slot.", ("tenant",),
+)
+rejected_runs = telemetry.registry.counter(
+    "agui_rejected_runs_total", "AG-UI runs rejected because the queue was full.", ("tenant",),
+)
+queue_wait = telemetry.registry.histogram(
+    "agui_queue_wait_seconds", "Time AG-UI runs waited for a run slot.", ("tenant",),
+)
+
+
+class QueueFull(Exception):
+    """The run queue (global or the tenant's) is full."""
+
+    def __init__(self, retry_after_seconds: int) -> None:
+        super().__init__(f"run queue full, retry after {retry_after_seconds}s")
+        self.retry_after_seconds = retry_after_seconds
+
+
+@dataclass
+class Ticket:
+    """A run's place in the scheduler: granted immediately or queued."""
+
+    tenant_id: str
+    tenant: str  # metrics label
+    granted: bool = False
+    released: bool = False
+    queued_at: float = field(default_factory=time.monotonic)
+    admitted_at: float | None = None
+    # Set whenever the queue moves (admission of this or another run)
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class RunScheduler:
+    """Global run cap, bounded per-tenant queues and weighted round-robin."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_queue: int = 64,
+        max_queue_per_tenant: int = 16,
+        weights: dict[str, int] | None = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self.weights = dict(weights or {})
+        self.active = 0
+        self._queues: dict[str, deque[Ticket]] = {}
+        # Tenants with waiting runs, in round-robin order; head is being served
+        self._rotation: deque[str] = deque()
+        self._credits = 0  # slots left in the head tenant's turn
+        self._avg_run_seconds = 1.0
+
+    # -- admission ----------------------------------------------------------
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def admit(self, tenant_id: str) -> Ticket:
+        """Grant a slot, queue the run, or raise ``QueueFull``."""
+        ticket = Ticket(tenant_id=tenant_id, tenant=telemetry.tenant_label(tenant_id))
+        if self.max_concurrency <= 0 or (self.active < self.max_concurrency and not self._rotation):
+            self._grant(ticket)
+            return ticket
+        tenant_queue = self._queues.get(tenant_id)
+        tenant_waiting = len(tenant_queue) if tenant_queue else 0
+        if self.queued >= self.max_queue or tenant_waiting >= self.max_queue_per_tenant:
+            rejected_runs.inc(tenant=ticket.tenant)
+            raise QueueFull(self.retry_after_seconds())
+        if tenant_queue is None:
+            tenant_queue = self._queues[tenant_id] = deque()
+            self._rotation.append(tenant_id)
+            if len(self._rotation) == 1:
+                self._credits = self._weight(tenant_id)
+        tenant_queue.append(ticket)
+        queued_runs.inc(tenant=ticket.tenant)
+        return ticket
+
+    async def wait(self, ticket: Ticket, timeout: float | None = None) -> bool:
+        """Wait until ``ticket`` is granted or the queue moves; False on timeout."""
+        if ticket.granted:
+            return True
+        ticket.changed.clear()
+        try:
+            await asyncio.wait_for(ticket.changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def position(self, ticket: Ticket) -> int:
+        """Estimated number of runs admitted before ``ticket`` (1 = next)."""
+        if ticket.granted:
+            return 0
+        tenant_queue = self._queues.get(ticket.tenant_id)
+        if not tenant_queue or ticket not in tenant_queue:
+            return 0
+        index = tenant_queue.index(ticket)
+        turn = self._rotation.index(ticket.tenant_id)
+        # Each round admits one run per waiting tenant (weights ignored): the
+        # tenant's earlier runs, plus each other tenant's runs in the rounds
+        # before this one and, for tenants served earlier, in this round.
+        ahead = index + sum(
+            min(len(self._queues[t]), index + (1 if i < turn else 0))
+            for i, t in enumerate(self._rotation) if t != ticket.tenant_id
+        )
+        return ahead + 1
+
+    def release(self, ticket: Ticket) -> None:
+        """Free ``ticket``'s slot (or drop it from the queue) and admit waiters."""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self.active -= 1
+            if ticket.admitted_at is not None:
+                elapsed = time.monotonic() - ticket.admitted_at
+                self._avg_run_seconds += DURATION_EMA_ALPHA * (elapsed - self._avg_run_seconds)
+        else:
+            self._remove(ticket)
+        self._dispatch()
+
+    def retry_after_seconds(self) -> int:
+        slots = max(self.max_concurrency, 1)
+        return max(1, math.ceil((self.queued / slots + 1) * self._avg_run_seconds))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "avg_run_seconds": round(self._avg_run_seconds, 3),
+            "queued_by_tenant": {t: len(q) for t, q in self._queues.items()},
+        }
+
+    # -- internals ----------------------------------------------------------
+
+    def _weight(self, tenant_id: str) -> int:
+        return max(int(self.weights.get(tenant_id, 1)), 1)
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted = True
+        ticket.admitted_at = time.monotonic()
+        self.active += 1
+        ticket.changed.set()
+
+    def _remove(self, ticket: Ticket) -> None:
+        tenant_queue = self._queues.get(ticket.tenant_id)
+        if tenant_queue is None or ticket not in tenant_queue:
+            return
+        tenant_queue.remove(ticket)
+        queued_runs.dec(tenant=ticket.tenant)
+        if not tenant_queue:
+            self._drop_tenant(ticket.tenant_id)
+        self._notify()
+
+    def _drop_tenant(self, tenant_id: str) -> None:
+        del self._queues[tenant_id]
+        was_head = self._rotation[0] == tenant_id
+        self._rotation.remove(tenant_id)
+        if was_head and self._rotation:
+            self._credits = self._weight(self._rotation[0])
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting runs, round-robin over tenants."""
+        admitted = False
+        while self._rotation and (self.max_concurrency <= 0 or self.active < self.max_concurrency):
+            tenant_id = self._rotation[0]
+            ticket = self._queues[tenant_id].popleft()
+            queued_runs.dec(tenant=ticket.tenant)
+            queue_wait.observe(time.monotonic() - ticket.queued_at, tenant=ticket.tenant)
+            self._grant(ticket)
+            admitted = True
+            self._credits -= 1
+            if not self._queues[tenant_id]:
+                self._drop_tenant(tenant_id)
+            elif self._credits <= 0:
+                self._rotation.rotate(-1)
+                self._credits = self._weight(self._rotation[0])
+        if admitted:
+            self._notify()
+
+    def _notify(self) -> None:
+        for tenant_queue in self._queues.values():
+            for ticket in tenant_queue:
+                ticket.changed.set()
+
+
+# Shared scheduler used by app/main.py
+scheduler = RunScheduler(
+    max_concurrency=settings.run_max_concurrency,
+    max_queue=settings.run_max_queue,
+    max_queue_per_tenant=settings.run_max_queue_per_tenant,
+    weights=settings.run_tenant_weights,
+)
@@ -0,0 +1,600 @@
+"""Shared on-disk checkpointer: SQLite in WAL mode.
+
+``BoundedMemorySaver`` (app/checkpoint.py) keeps threads in one process, so a
+follow-up turn that lands on another uvicorn worker or replica starts from an
+empty thread. ``SqliteSaver`` stores checkpoints in one SQLite file that any
+number of worker processes on the node can share:
+
+- **WAL mode**: readers never block the writer or each other; concurrent
+  writers from different processes serialize on SQLite's write lock (with a
+  ``busy_timeout``), so no sticky sessions are needed.
+- **Batched writes**: ``put`` / ``put_writes`` are queued to one writer
+  thread per process, which commits everything queued within
+  ``checkpoint_sqlite_batch_ms`` in a single transaction (group commit).
+  Callers still wait for their batch to commit, so a checkpoint is visible
+  to the other workers and survives a crash of any worker process when
+  ``put`` returns. With ``synchronous=NORMAL`` the WAL is only fsynced at
+  WAL checkpoints, so a power loss or OS crash can roll back the last
+  commits. A batch that fails on lock contention (``OperationalError``,
+  after the busy timeout) fails as a whole; other errors are retried one
+  operation at a time so only the bad operation's caller sees them.
+- **Compact encoding**: values are stored as the serializer's msgpack bytes,
+  zlib-compressed when that saves space (type suffix ``+z``).
+- **Read-through cache**: decoded checkpoints are kept in an in-process LRU
+  keyed by checkpoint id. Checkpoints are immutable once written, so a read
+  only queries the latest id and its (small) pending writes; the blob is
+  fetched and decoded on a cache miss only.
+
+If the writer thread cannot open its connection, every queued and later
+write fails with that error instead of waiting forever; ``writer_error``
+holds it and ``GET /ready`` reports it (see app/warmup.py).
+
+Retention mirrors the memory saver: at most ``checkpoint_max_per_thread``
+checkpoints per thread and namespace, and threads idle for
+``checkpoint_thread_ttl_seconds`` are deleted (swept by the writer thread).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from concurrent.futures import Future
+from contextlib import closing
+from typing import Any, Callable
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+logger = logging.getLogger(__name__)
+
+# Values at least this large are zlib-compressed when it saves space
+COMPRESS_MIN_BYTES = 512
+COMPRESSED_SUFFIX = "+z"
+# Seconds between idle-thread sweeps by the writer thread
+SWEEP_INTERVAL_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS checkpoints_created ON checkpoints (created_at);
+"""
+# Both tables have nine columns
+_PLACEHOLDERS = ", ".join("?" * 9)
+
+# (type, bytes) pair produced by ``SerializerProtocol.dumps_typed``
+Typed = tuple[str, bytes]
+CheckpointKey = tuple[str, str, str]
+# Decoded checkpoint, metadata and parent checkpoint id
+Loaded = tuple[Checkpoint, CheckpointMetadata, "str | None"]
+WriteOp = Callable[[sqlite3.Connection], None]
+
+
+def encode(typed: Typed) -> Typed:
+    """Compress a serialized value when that makes it smaller."""
+    type_, data = typed
+    if len(data) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(data, 1)
+        if len(packed) < len(data):
+            return type_ + COMPRESSED_SUFFIX, packed
+    return type_, data
+
+
+def decode(type_: str, data: bytes) -> Typed:
+    if type_.endswith(COMPRESSED_SUFFIX):
+        return type_[: -len(COMPRESSED_SUFFIX)], zlib.decompress(data)
+    return type_, data
+
+
+class SqliteSaver(BaseCheckpointSaver[int]):
+    """Checkpoint saver on a WAL-mode SQLite file shared by worker processes.
+
+    Args:
+        path: Database file; created (with its directory) if missing.
+        batch_window_seconds: How long the writer waits for more operations
+            to join a transaction.
+        cache_entries: Decoded checkpoints kept in memory. ``0`` disables it.
+        thread_ttl_seconds: Idle time after which a thread is deleted. ``0`` disables it.
+        max_checkpoints_per_thread: Checkpoints kept per thread and namespace.
+            ``0`` keeps them all.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        batch_window_seconds: float = 0.002,
+        cache_entries: int = 256,
+        thread_ttl_seconds: float = 3600.0,
+        max_checkpoints_per_thread: int = 10,
+        busy_timeout_seconds: float = 10.0,
+        serde: SerializerProtocol | None = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.path = path
+        self.batch_window_seconds = batch_window_seconds
+        self.cache_entries = cache_entries
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.busy_timeout_seconds = busy_timeout_seconds
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+        self._local = threading.local()
+        # (thread_id, checkpoint_ns, checkpoint_id) -> decoded checkpoint; LRU order
+        self._cache: OrderedDict[CheckpointKey, Loaded] = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "batches": 0,
+            "writes_batched": 0,
+            "checkpoints_pruned": 0,
+            "threads_expired": 0,
+        }
+        self._ops: queue.SimpleQueue[tuple[WriteOp, Future]] = queue.SimpleQueue()
+        # Set if the writer thread could not start; writes fail with it
+        self.writer_error: Exception | None = None
+        self._writer = threading.Thread(
+            target=self._write_loop, name="checkpoint-writer", daemon=True,
+        )
+        self._writer.start()
+
+    # -- connections --------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout_seconds, isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Commits survive process crashes; only a power loss or OS crash can
+        # roll back those made since the last WAL checkpoint
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # -- stats --------------------------------------------------------------
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "cached_checkpoints": len(self._cache)}
+
+    # -- batched writer -----------------------------------------------------
+
+    def _submit(self, op: WriteOp) -> Future:
+        future: Future = Future()
+        self._ops.put((op, future))
+        if self.writer_error is not None:
+            self._fail_queued()
+        return future
+
+    def _fail_queued(self) -> None:
+        while True:
+            try:
+                _, future = self._ops.get_nowait()
+            except queue.Empty:
+                return
+            future.set_exception(self.writer_error)
+
+    def _write_loop(self) -> None:
+        try:
+            conn = self._connect()
+        except Exception as e:
+            logger.exception("checkpoint writer could not open %s", self.path)
+            # Set before draining: writes submitted from now on drain themselves
+            self.writer_error = e
+            self._fail_queued()
+            return
+        last_sweep = time.monotonic()
+        while True:
+            batch = [self._ops.get()]
+            deadline = time.monotonic() + self.batch_window_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._ops.get(timeout=remaining))
+                    else:
+                        batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(conn, batch)
+            due = time.monotonic() - last_sweep > SWEEP_INTERVAL_SECONDS
+            if self.thread_ttl_seconds > 0 and due:
+                last_sweep = time.monotonic()
+                self._commit(conn, [(self._sweep, Future())])
+
+    def _commit(self, conn: sqlite3.Connection, batch: list[tuple[WriteOp, Future]]) -> None:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op, _ in batch:
+                op(conn)
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+            # A locked or unusable database fails every operation alike, and
+            # each retry would wait out the busy timeout again: fail the batch
+            if len(batch) == 1 or isinstance(e, sqlite3.OperationalError):
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            # Retry one by one so a bad operation only fails its own caller
+            for item in batch:
+                self._commit(conn, [item])
+            return
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["writes_batched"] += len(batch)
+        for _, future in batch:
+            future.set_result(None)
+
+    def _sweep(self, conn: sqlite3.Connection) -> None:
+        cutoff = time.time() - self.thread_ttl_seconds
+        idle = [
+            row[0] for row in conn.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                (cutoff,),
+            )
+        ]
+        for thread_id in idle:
+            self._delete(conn, thread_id)
+        with self._lock:
+            self._counters["threads_expired"] += len(idle)
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, thread_id: str) -> None:
+        conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    # -- cache --------------------------------------------------------------
+
+    def _cache_get(self, key: CheckpointKey) -> Loaded | None:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._counters["cache_misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._counters["cache_hits"] += 1
+            return entry
+
+    def _cache_put(self, key: CheckpointKey, entry: Loaded) -> None:
+        if self.cache_entries <= 0:
+            return
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    # -- reads --------------------------------------------------------------
+
+    def _load(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Loaded | None:
+        key = (thread_id, checkpoint_ns, checkpoint_id)
+        entry = self._cache_get(key)
+        if entry is None:
+            row = self._reader.execute(
+                "SELECT type, checkpoint, metadata_type, metadata, parent_id FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            type_, blob, metadata_type, metadata, parent_id = row
+            entry = (
+                self.serde.loads_typed(decode(type_, blob)),
+                self.serde.loads_typed(decode(metadata_type, metadata)),
+                parent_id,
+            )
+            self._cache_put(key, entry)
+        checkpoint, metadata, parent_id = entry
+        return copy_checkpoint(checkpoint), metadata, parent_id
+
+    def _tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        loaded: Loaded,
+    ) -> CheckpointTuple:
+        checkpoint, metadata, parent_id = loaded
+        writes = self._reader.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(decode(type_, value)))
+                for task_id, channel, type_, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            row = self._reader.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+            if row is None:
+                return None
+            checkpoint_id = row[0]
+        loaded = self._load(thread_id, checkpoint_ns, checkpoint_id)
+        if loaded is None:
+            return None
+        return self._tuple(thread_id, checkpoint_ns, checkpoint_id, loaded)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id FROM checkpoints"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+        rows = self._reader.execute(query, params).fetchall()
+
+        for thread_id, ns, checkpoint_id in rows:
+            if limit is not None and limit <= 0:
+                break
+            loaded = self._load(thread_id, ns, checkpoint_id)
+            if loaded is None:
+                continue
+            if filter and not all(loaded[1].get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield self._tuple(thread_id, ns, checkpoint_id, loaded)
+
+    # -- writes -------------------------------------------------------------
+
+    def _put_op(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+    ) -> tuple[RunnableConfig, WriteOp, Callable[[], None]]:
+        """Config of the new checkpoint, its write operation and a cache fill to run on commit."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        metadata = get_checkpoint_metadata(config, metadata)
+        type_, blob = encode(self.serde.dumps_typed(checkpoint))
+        metadata_type, metadata_blob = encode(self.serde.dumps_typed(metadata))
+        row = (
+            thread_id, checkpoint_ns, checkpoint["id"], parent_id,
+            type_, blob, metadata_type, metadata_blob, time.time(),
+        )
+        limit = self.max_checkpoints_per_thread
+
+        def op(conn: sqlite3.Connection) -> None:
+            conn.execute(f"INSERT OR REPLACE INTO checkpoints VALUES ({_PLACEHOLDERS})", row)
+            if limit > 0:
+                pruned = conn.execute(
+                    "DELETE FROM checkpoints"
+                    " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ("
+                    "  SELECT checkpoint_id FROM checkpoints"
+                    "  WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?)",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns, limit - 1),
+                ).rowcount
+                if pruned:
+                    conn.execute(
+                        "DELETE FROM writes"
+                        " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                        "  SELECT checkpoint_id FROM checkpoints"
+                        "  WHERE thread_id = ? AND checkpoint_ns = ?)",
+                        (thread_id, checkpoint_ns, thread_id, checkpoint_ns),
+                    )
+                    with self._lock:
+                        self._counters["checkpoints_pruned"] += pruned
+
+        key = (thread_id, checkpoint_ns, checkpoint["id"])
+        entry = (copy_checkpoint(checkpoint), metadata, parent_id)
+        next_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        return next_config, op, lambda: self._cache_put(key, entry)
+
+    def _put_writes_op(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str,
+    ) -> WriteOp:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel,
+                *encode(self.serde.dumps_typed(value)), task_path,
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # Regular writes keep the first value per index; special ones (errors,
+        # interrupts; negative index) are replaced, as in the in-memory saver
+        keep = [row for row in rows if row[4] >= 0]
+        replace = [row for row in rows if row[4] < 0]
+
+        def op(conn: sqlite3.Connection) -> None:
+            if keep:
+                conn.executemany(f"INSERT OR IGNORE INTO writes VALUES ({_PLACEHOLDERS})", keep)
+            if replace:
+                conn.executemany(f"INSERT OR REPLACE INTO writes VALUES ({_PLACEHOLDERS})", replace)
+
+        return op
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config, op, cache = self._put_op(config, checkpoint, metadata)
+        self._submit(op).result()
+        cache()
+        return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._submit(self._put_writes_op(config, writes, task_id, task_path)).result()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == thread_id]:
+                del self._cache[key]
+        self._submit(lambda conn: self._delete(conn, thread_id)).result()
+
+    # -- async API ----------------------------------------------------------
+    # Reads run on a worker thread (each with its own connection); writes
+    # await their batch's commit without blocking the event loop.
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)),
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config, op, cache = self._put_op(config, checkpoint, metadata)
+        await asyncio.wrap_future(self._submit(op))
+        cache()
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        op = self._put_writes_op(config, writes, task_id, task_path)
+        await asyncio.wrap_future(self._submit(op))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,246 @@
+"""AG-UI SSE frame encoding with adaptive delta coalescing.
+
+Every AG-UI event goes out as one ``data: {json}\\n\\n`` frame (``\\n`` line
+endings, not ``\\r\\n``, because the AG-UI client's SSE parser splits on
+``/\\n\\n/``). Content deltas dominate the stream, so ``EventWriter``:
+
+- serializes with ``orjson`` when available (stdlib ``json`` otherwise) using
+  compact separators;
+- encodes ``TEXT_MESSAGE_CONTENT`` / ``TOOL_CALL_ARGS`` from a per-message
+  pre-encoded frame prefix, so only the delta itself is serialized;
+- throttles deltas to at most one frame per ``window_seconds``: a delta that
+  arrives after a quiet period is sent immediately, while deltas arriving
+  faster than the window are coalesced (same message / tool call) until the
+  window elapses or ``max_bytes`` of delta text accumulate. Slow streams
+  therefore see no added latency and fast streams collapse into few frames;
+- flushes before any other event, so message and tool-call boundaries are
+  never delayed or reordered.
+
+``stream_frames`` drives a writer from an async event source and flushes on
+the window deadline even when the source is idle, so a buffered delta never
+waits for the next model token. All frames ready at the same moment are
+joined into one chunk, i.e. one write to the socket; the time each write
+takes is traced as an ``sse.write`` span (see app/telemetry.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from app import telemetry
+from app.config import settings
+from app.streaming import AguiEvent
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson ships with langsmith
+    orjson = None
+
+
+def _dumps_stdlib(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+dumps: Callable[[Any], bytes] = orjson.dumps if orjson is not None else _dumps_stdlib
+
+# Delta event type -> id field; consecutive deltas for the same id coalesce
+DELTA_EVENTS = {
+    "TEXT_MESSAGE_CONTENT": "messageId",
+    "TOOL_CALL_ARGS": "toolCallId",
+}
+
+_FRAME_END = b"}\n\n"
+
+
+def encode_event(event_type: str, data: dict[str, Any]) -> bytes:
+    """Encode one AG-UI event as a complete SSE frame."""
+    return b"data: " + dumps({"type": event_type, **data}) + b"\n\n"
+
+
+class EventWriter:
+    """Turns AG-UI events into SSE frames, coalescing content deltas."""
+
+    def __init__(
+        self,
+        window_seconds: float | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        if window_seconds is None:
+            window_seconds = settings.sse_coalesce_window_ms / 1000
+        if max_bytes is None:
+            max_bytes = settings.sse_coalesce_max_bytes
+        self.window_seconds = window_seconds
+        self.max_bytes = max_bytes
+        # Pre-encoded frame prefixes: (event type, id) -> b'data: {"type":..,"<idField>":..,"delta":'
+        self._prefixes: dict[tuple[str, str], bytes] = {}
+        # Pending coalesced delta
+        self._pending_key: tuple[str, str] | None = None
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        # Delta stream being throttled and when its last frame went out
+        self._stream_key: tuple[str, str] | None = None
+        self._last_delta_at = float("-inf")
+        self.frames_written = 0
+        self.events_in = 0
+
+    @property
+    def deadline(self) -> float | None:
+        """``time.monotonic()`` by which the pending delta must be flushed (None if idle)."""
+        if self._pending_key is None:
+            return None
+        return self._last_delta_at + self.window_seconds
+
+    def write(self, event_type: str, data: dict[str, Any]) -> list[bytes]:
+        """Accept one event; return the frames that are ready to send now."""
+        self.events_in += 1
+        id_field = DELTA_EVENTS.get(event_type)
+        if id_field is None or self.window_seconds <= 0:
+            frames = self.flush()
+            frames.append(self._frame(event_type, data))
+            self._stream_key = None
+            return frames
+
+        key = (event_type, data[id_field])
+        frames = []
+        if key != self._stream_key:
+            # New message / tool call: its first delta goes out immediately
+            frames = self.flush()
+            self._stream_key = key
+            self._last_delta_at = float("-inf")
+        self._pending_key = key
+        delta = data["delta"]
+        self._pending.append(delta)
+        self._pending_bytes += len(delta)
+        if self._pending_bytes >= self.max_bytes or time.monotonic() >= self.deadline:
+            frames.extend(self.flush())
+        return frames
+
+    def flush(self) -> list[bytes]:
+        """Emit the pending coalesced delta, if any."""
+        if self._pending_key is None:
+            return []
+        frame = self._delta_frame(self._pending_key, "".join(self._pending))
+        self._last_delta_at = time.monotonic()
+        self._pending_key = None
+        self._pending = []
+        self._pending_bytes = 0
+        return [frame]
+
+    def _frame(self, event_type: str, data: dict[str, Any]) -> bytes:
+        id_field = DELTA_EVENTS.get(event_type)
+        if id_field is not None and data.keys() == {id_field, "delta"}:
+            return self._delta_frame((event_type, data[id_field]), data["delta"])
+        self.frames_written += 1
+        return encode_event(event_type, data)
+
+    def _delta_frame(self, key: tuple[str, str], delta: str) -> bytes:
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            event_type, id_value = key
+            prefix = (
+                b'data: {"type":' + dumps(event_type)
+                + b',"' + DELTA_EVENTS[event_type].encode() + b'":' + dumps(id_value)
+                + b',"delta":'
+            )
+            self._prefixes[key] = prefix
+        self.frames_written += 1
+        return prefix + dumps(delta) + _FRAME_END
+
+
+_DONE = object()
+_FLUSH = object()
+_CANCELLED = object()
+
+
+async def stream_frames(
+    events: AsyncIterator[AguiEvent],
+    writer: EventWriter | None = None,
+    *,
+    disconnected: Callable[[], Awaitable[Any]] | None = None,
+) -> AsyncIterator[bytes]:
+    """Encode ``events`` through ``writer``; yields one joined chunk per write.
+
+    ``events`` is consumed by a single producer task (so context variables
+    set inside it stay consistent), which lets pending deltas be flushed when
+    their window expires even if ``events`` has nothing new yet.
+
+    ``disconnected`` resolves when the client goes away; the producer is then
+    cancelled (raising ``CancelledError`` wherever ``events`` is waiting),
+    ``events`` is closed and the stream ends without further frames.
+    """
+    writer = writer or EventWriter()
+    queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=256)
+
+    async def produce() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+        except asyncio.CancelledError:
+            # Nobody will read the pending frames; make room for the stop marker
+            while queue.full():
+                queue.get_nowait()
+            queue.put_nowait(_CANCELLED)
+            raise
+        except Exception as e:
+            await queue.put(e)
+            return
+        finally:
+            # Close ``events`` even if it was suspended at a yield, so its
+            # cleanup (e.g. cancelling a graph run) happens now
+            await events.aclose()
+        await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    watcher = None
+    if disconnected is not None:
+        watcher = asyncio.create_task(disconnected())
+        watcher.add_done_callback(
+            lambda task: producer.cancel() if not task.cancelled() and not producer.done() else None
+        )
+    try:
+        done = False
+        error: Exception | None = None
+        while not done:
+            deadline = writer.deadline
+            frames: list[bytes] = []
+            if deadline is None:
+                item = await queue.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(
+                        queue.get(), timeout=max(deadline - time.monotonic(), 0.0),
+                    )
+                except asyncio.TimeoutError:
+                    item = _FLUSH
+            # Encode everything already queued so it goes out as one write
+            while item is not _FLUSH:
+                if item is _CANCELLED:
+                    return
+                if item is _DONE or isinstance(item, Exception):
+                    error = item if isinstance(item, Exception) else None
+                    done = True
+                    break
+                frames.extend(writer.write(*item))
+                if queue.empty():
+                    break
+                item = queue.get_nowait()
+            if item is _FLUSH or done:
+                frames.extend(writer.flush())
+            if frames:
+                chunk = b"".join(frames)
+                started = time.perf_counter()
+                yield chunk
+                # Time the server took to accept the chunk (socket backpressure)
+                telemetry.record_span("sse.write", started, time.perf_counter(), bytes=len(chunk))
+                telemetry.record_sse_bytes(len(chunk))
+        if error is not None:
+            raise error
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        # A producer already being cancelled is finishing its cleanup
+        if not producer.done() and not producer.cancelling():
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
@@ -0,0 +1,139 @@
+"""Incremental AG-UI state sync: ``STATE_DELTA`` (JSON Patch) events.
+
+``/agui`` used to send one ``STATE_SNAPSHOT`` with every non-message state
+key when the run finished, so nothing reached the UI while the run was in
+progress and every run re-sent all tool payloads. A ``StateSync`` now keeps
+the state the client is known to hold and, whenever it changes, sends the
+RFC 6902 patch from that state to the new one:
+
+- **start**: the baseline is the ``state`` of the RunAgentInput (what the
+  client holds). The server state at the start of the run (checkpoint
+  values plus this run's input) is sent as a patch against it -- usually
+  empty -- or as a ``STATE_SNAPSHOT`` when the client sent no state;
+- **after each node**: the node's update (tool payloads, intent, ...) is
+  applied and the diff sent as ``STATE_DELTA``;
+- **finish**: the final graph state is authoritative; any difference left
+  (e.g. from a reducer the per-node merge doesn't model) is sent as a last
+  delta.
+
+A full ``STATE_SNAPSHOT`` is sent instead of a patch whenever the patch
+would not be smaller (resync). Internal keys (messages, ingestion and
+compaction bookkeeping) are never sent.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Collection, Iterator
+
+from app.streaming import AguiEvent
+
+# Patches at least this large are compared with the size of a full snapshot
+RESYNC_CHECK_MIN_BYTES = 512
+
+
+def _pointer(path: str, token: str | int) -> str:
+    return f"{path}/{str(token).replace('~', '~0').replace('/', '~1')}"
+
+
+def _same(a: Any, b: Any) -> bool:
+    # 1 == True == 1.0 in Python, but not in JSON; this holds for nested
+    # values too, so containers are compared element by element
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[key], b[key]) for key in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def json_patch(old: Any, new: Any, path: str = "") -> list[dict[str, Any]]:
+    """RFC 6902 operations turning ``old`` into ``new``.
+
+    Objects are diffed key by key and same-length or appended-to arrays
+    element by element; anything else that differs is replaced whole.
+    """
+    if _same(old, new):
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: list[dict[str, Any]] = [
+            {"op": "remove", "path": _pointer(path, key)} for key in old if key not in new
+        ]
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+            else:
+                ops.extend(json_patch(old[key], value, _pointer(path, key)))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) >= len(old):
+        ops = []
+        for i, value in enumerate(old):
+            ops.extend(json_patch(value, new[i], _pointer(path, i)))
+        ops.extend(
+            {"op": "add", "path": _pointer(path, i), "value": new[i]}
+            for i in range(len(old), len(new))
+        )
+        return ops
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class StateSync:
+    """Tracks the client's copy of the run state and emits patches to it."""
+
+    def __init__(self, client_state: Any, internal_keys: Collection[str]) -> None:
+        self.internal_keys = frozenset(internal_keys)
+        # None until the client is known to hold a state (first event sends it)
+        self._sent: dict[str, Any] | None = (
+            self._visible(client_state) if isinstance(client_state, dict) else None
+        )
+        self._state: dict[str, Any] = {}
+
+    def start(self, state: dict[str, Any]) -> Iterator[AguiEvent]:
+        """Sync the client to the server state at the start of the run."""
+        self._state = self._visible(state)
+        yield from self._sync()
+
+    def update(self, node_output: Any) -> Iterator[AguiEvent]:
+        """Apply one node's state update."""
+        if not isinstance(node_output, dict):
+            return
+        changed = self._visible(node_output)
+        if changed:
+            self._state = {**self._state, **changed}
+            yield from self._sync()
+
+    def finish(self, final_state: dict[str, Any] | None) -> Iterator[AguiEvent]:
+        """Reconcile with the final graph state."""
+        if final_state is not None:
+            self._state = self._visible(final_state)
+        yield from self._sync()
+
+    def snapshot(self) -> dict[str, Any]:
+        return self._state
+
+    # -- internals ----------------------------------------------------------
+
+    def _visible(self, state: dict[str, Any]) -> dict[str, Any]:
+        return {k: v for k, v in state.items() if k not in self.internal_keys}
+
+    def _sync(self) -> Iterator[AguiEvent]:
+        if self._sent is None:
+            yield from self._snapshot()
+            return
+        patch = json_patch(self._sent, self._state)
+        if not patch:
+            return
+        patch_bytes = _size(patch)
+        if patch_bytes >= RESYNC_CHECK_MIN_BYTES and patch_bytes >= _size(self._state):
+            yield from self._snapshot()
+            return
+        self._sent = self._state
+        yield "STATE_DELTA", {"delta": patch}
+
+    def _snapshot(self) -> Iterator[AguiEvent]:
+        self._sent = self._state
+        yield "STATE_SNAPSHOT", {"snapshot": self._state}
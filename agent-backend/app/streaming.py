@@ -0,0 +1,221 @@
+"""LangGraph event stream -> AG-UI event translation.
+
+``agui_stream`` runs the graph with ``astream_events(version="v2")`` and feeds
+every event through a ``RunEventTranslator``. The translator turns model token
+and tool-call deltas into ``TEXT_MESSAGE_*`` / ``TOOL_CALL_*`` events as they
+arrive, and emits ``TOOL_CALL_RESULT`` as soon as each tool call returns.
+
+Ordering contract (per model call):
+  TEXT_MESSAGE_START -> TEXT_MESSAGE_CONTENT* -> TEXT_MESSAGE_END
+  -> TOOL_CALL_START -> TOOL_CALL_ARGS* -> TOOL_CALL_END   (per tool call)
+  -> TOOL_CALL_RESULT                                       (per tool call)
+
+A text message is always closed before the first tool call of the same model
+response is opened. Models that do not stream (no ``on_chat_model_stream``
+events) are replayed from their final ``AIMessage`` in the same order: its
+text in ``FALLBACK_CHUNK_SIZE`` deltas, then its tool calls.
+
+With a ``StateSync`` (see app/state_sync.py), each graph node's state update
+is followed by the ``STATE_DELTA`` it causes, after the node's own events.
+"""
+from __future__ import annotations
+
+import json
+import uuid
+from typing import TYPE_CHECKING, Any, Iterator
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+from app.digests import full_payload
+
+if TYPE_CHECKING:
+    from app.state_sync import StateSync
+
+# Graph node names whose model / tool events are surfaced to the client.
+AGENT_NODE = "agent"
+TOOLS_NODE = "tools"
+# Emits tool calls without a model (see app/intent_router.py)
+ROUTER_NODE = "route"
+
+# Chunk size used when replaying a non-streamed AIMessage as content deltas
+FALLBACK_CHUNK_SIZE = 20
+
+AguiEvent = tuple[str, dict[str, Any]]
+
+
+def content_text(content: Any) -> str:
+    """Extract the text portion of a message / chunk ``content`` value.
+
+    Bedrock (Anthropic) chunks may carry a list of content blocks instead of a
+    plain string; only ``text`` blocks are forwarded to the client.
+    """
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else part.get("text", "")
+            for part in content
+            if isinstance(part, str) or (isinstance(part, dict) and part.get("type") == "text")
+        )
+    return ""
+
+
+def tool_result_content(msg: ToolMessage) -> str:
+    """Content sent to the client: the full payload when the model saw a digest."""
+    payload = full_payload(msg.artifact)
+    if payload is not None:
+        return json.dumps(payload)
+    return msg.content if isinstance(msg.content, str) else json.dumps(msg.content)
+
+
+class RunEventTranslator:
+    """Stateful translator for the events of a single agent run."""
+
+    def __init__(self, state_sync: StateSync | None = None) -> None:
+        self.final_state: dict[str, Any] | None = None
+        self.state_sync = state_sync
+        # Currently open text message id (None when no text message is open)
+        self._text_id: str | None = None
+        # Model run ids that produced at least one stream chunk
+        self._streamed_runs: set[str] = set()
+        # model run id -> {tool call chunk index -> tool call id}
+        self._tool_calls: dict[str, dict[int, str]] = {}
+        # Tool call ids whose TOOL_CALL_RESULT was already emitted
+        self._results_sent: set[str] = set()
+
+    # -- public API ---------------------------------------------------------
+
+    def translate(self, event: dict[str, Any]) -> Iterator[AguiEvent]:
+        """Yield the AG-UI events produced by one LangGraph stream event."""
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chat_model_stream" and node == AGENT_NODE:
+            yield from self._on_model_chunk(event["run_id"], event["data"]["chunk"])
+        elif kind == "on_chat_model_end" and node == AGENT_NODE:
+            yield from self._on_model_end(event["run_id"], event["data"].get("output"))
+        elif kind == "on_tool_end" and node == TOOLS_NODE:
+            output = event["data"].get("output")
+            if isinstance(output, ToolMessage):
+                yield from self._tool_result(output)
+        elif kind == "on_chain_end" and event["name"] == TOOLS_NODE and node == TOOLS_NODE:
+            # Sweep up results the tool callbacks did not report (e.g. errors
+            # converted into ToolMessages by ToolNode's error handling).
+            output = event["data"].get("output")
+            if isinstance(output, dict):
+                for msg in output.get("messages", []):
+                    if isinstance(msg, ToolMessage):
+                        yield from self._tool_result(msg)
+            if self.state_sync is not None:
+                yield from self.state_sync.update(output)
+        elif kind == "on_chain_end" and event["name"] == ROUTER_NODE and node == ROUTER_NODE:
+            output = event["data"].get("output")
+            if isinstance(output, dict):
+                for msg in output.get("messages", []):
+                    if isinstance(msg, AIMessage):
+                        yield from self._replay_message(msg)
+            if self.state_sync is not None:
+                yield from self.state_sync.update(output)
+        elif kind == "on_chain_end" and node is not None and event["name"] == node:
+            # A graph node finished: its output is the node's state update
+            if self.state_sync is not None:
+                yield from self.state_sync.update(event["data"].get("output"))
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            output = event["data"].get("output")
+            if isinstance(output, dict):
+                self.final_state = output
+
+    def close(self) -> Iterator[AguiEvent]:
+        """Close anything still open at the end of the run."""
+        yield from self._end_text()
+
+    # -- model events -------------------------------------------------------
+
+    def _on_model_chunk(self, run_id: str, chunk: BaseMessage) -> Iterator[AguiEvent]:
+        self._streamed_runs.add(run_id)
+
+        text = content_text(chunk.content)
+        if text:
+            if self._text_id is None:
+                self._text_id = chunk.id or str(uuid.uuid4())
+                yield "TEXT_MESSAGE_START", {"messageId": self._text_id, "role": "assistant"}
+            yield "TEXT_MESSAGE_CONTENT", {"messageId": self._text_id, "delta": text}
+
+        open_calls = self._tool_calls.setdefault(run_id, {})
+        for tcc in getattr(chunk, "tool_call_chunks", None) or []:
+            index = tcc.get("index")
+            if index is None:
+                index = len(open_calls) - 1 if tcc.get("id") is None else len(open_calls)
+            tc_id = open_calls.get(index)
+            if tc_id is None:
+                yield from self._end_text()
+                tc_id = tcc.get("id") or str(uuid.uuid4())
+                open_calls[index] = tc_id
+                yield "TOOL_CALL_START", {
+                    "toolCallId": tc_id,
+                    "toolCallName": tcc.get("name") or "unknown",
+                    "parentMessageId": chunk.id or str(uuid.uuid4()),
+                }
+            if tcc.get("args"):
+                yield "TOOL_CALL_ARGS", {"toolCallId": tc_id, "delta": tcc["args"]}
+
+    def _on_model_end(self, run_id: str, output: Any) -> Iterator[AguiEvent]:
+        if run_id in self._streamed_runs:
+            yield from self._end_text()
+            for tc_id in self._tool_calls.pop(run_id, {}).values():
+                yield "TOOL_CALL_END", {"toolCallId": tc_id}
+            self._streamed_runs.discard(run_id)
+            return
+
+        if isinstance(output, AIMessage):
+            yield from self._replay_message(output)
+
+    def _replay_message(self, msg: AIMessage) -> Iterator[AguiEvent]:
+        """Emit a complete (non-streamed) AIMessage as AG-UI events."""
+        msg_id = msg.id or str(uuid.uuid4())
+        content = content_text(msg.content)
+        if content:
+            yield "TEXT_MESSAGE_START", {"messageId": msg_id, "role": "assistant"}
+            for i in range(0, len(content), FALLBACK_CHUNK_SIZE):
+                yield "TEXT_MESSAGE_CONTENT", {
+                    "messageId": msg_id,
+                    "delta": content[i:i + FALLBACK_CHUNK_SIZE],
+                }
+            yield "TEXT_MESSAGE_END", {"messageId": msg_id}
+
+        for tc in msg.tool_calls:
+            tc_id = tc.get("id") or str(uuid.uuid4())
+            yield "TOOL_CALL_START", {
+                "toolCallId": tc_id,
+                "toolCallName": tc.get("name", "unknown"),
+                "parentMessageId": msg_id,
+            }
+            yield "TOOL_CALL_ARGS", {"toolCallId": tc_id, "delta": json.dumps(tc.get("args", {}))}
+            yield "TOOL_CALL_END", {"toolCallId": tc_id}
+
+    def _end_text(self) -> Iterator[AguiEvent]:
+        if self._text_id is not None:
+            yield "TEXT_MESSAGE_END", {"messageId": self._text_id}
+            self._text_id = None
+
+    # -- tool events --------------------------------------------------------
+
+    def _tool_result(self, msg: ToolMessage) -> Iterator[AguiEvent]:
+        if msg.tool_call_id in self._results_sent:
+            return
+        self._results_sent.add(msg.tool_call_id)
+        data = {
+            "messageId": msg.id or str(uuid.uuid4()),
+            "toolCallId": msg.tool_call_id,
+            "content": tool_result_content(msg),
+            "role": "tool",
+        }
+        cache = msg.artifact.get("cache") if isinstance(msg.artifact, dict) else None
+        if cache:
+            data["cache"] = {
+                "hit": cache["hit"],
+                "coalesced": cache["coalesced"],
+                "ageSeconds": cache["age_seconds"],
+                "expiresInSeconds": cache.get("expires_in_seconds"),
+            }
+        yield "TOOL_CALL_RESULT", data
@@ -0,0 +1,417 @@
+"""Run-level tracing and Prometheus-style metrics, without an external collector.
+
+Each ``/agui`` request gets a ``RunTrace`` held in a context variable, so
+code deep inside the graph (model calls, tools, checkpointer) can attach
+spans to the run that triggered it without threading it through LangGraph:
+
+- ``span(name)`` times a block and records it on the current run (if any)
+  and in the ``agent_span_duration_seconds`` histogram. Span names:
+  ``agui.ingest`` (checkpoint read + history planning), ``model``,
+  ``tool.<name>``, ``checkpoint.<op>`` and ``sse.write`` (time the server
+  took to accept each chunk).
+- ``RunTrace.running()`` brackets the streamed run: active-run gauge, run
+  duration, outcome and time to first event (first event after
+  ``RUN_STARTED``, measured from request arrival).
+- Model token usage is added to the run and to per-tenant counters.
+
+``render_metrics()`` returns the Prometheus text exposition served at
+``/metrics``; ``recent_runs()`` returns per-run summaries with their spans.
+With ``RUN_TIMING_EVENTS`` the summary is also sent to the client as a
+``CUSTOM`` ``run_timing`` event before ``RUN_FINISHED`` / ``RUN_ERROR``.
+
+Tenants beyond ``metrics_max_tenants`` distinct values are reported under
+the ``other`` label to bound series cardinality.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator
+
+from app.config import settings
+
+# Seconds; roughly Prometheus' defaults extended for long model calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans kept per run (aggregates per span name are always complete)
+MAX_SPANS_PER_RUN = 256
+RECENT_RUNS = 128
+
+_INF_BUCKET = 'le="+Inf"'
+
+
+# ---------------------------------------------------------------------------
+# Metric registry
+# ---------------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str], lock: threading.Lock) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = lock
+        self._values: dict[tuple[str, ...], Any] = {}
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args: Any, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(*args)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (non-cumulative), sum, count]
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.label_names, key, _INF_BUCKET)} {count}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {count}"
+
+
+class Registry:
+    """Metrics plus collectors that export other modules' stats at scrape time."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[tuple[str, str, str, float]]]] = []
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels, self._lock))
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels, self._lock))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = ()) -> Histogram:
+        return self._add(Histogram(name, help, labels, self._lock))
+
+    def _add(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(
+        self, collect: Callable[[], Iterable[tuple[str, str, str, float]]],
+    ) -> None:
+        """``collect()`` yields ``(name, kind, help, value)`` samples at scrape time.
+
+        ``kind`` is ``counter`` or ``gauge``. A name already taken by a
+        registered metric is skipped.
+        """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [line for metric in self._metrics for line in metric.render()]
+            names = {metric.name for metric in self._metrics}
+        for collect in self._collectors:
+            for name, kind, help, value in collect():
+                if name in names:
+                    continue
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+runs_total = registry.counter(
+    "agui_runs_total",
+    "AG-UI runs by outcome (ok, error, cached, cancelled, rejected, queue_timeout, aborted).",
+    ("tenant", "outcome"),
+)
+active_runs = registry.gauge("agui_active_runs", "AG-UI runs currently streaming.", ("tenant",))
+run_duration = registry.histogram(
+    "agui_run_duration_seconds", "Request arrival to end of the event stream.", ("tenant",),
+)
+time_to_first_event = registry.histogram(
+    "agui_time_to_first_event_seconds",
+    "Request arrival to the first event after RUN_STARTED.", ("tenant",),
+)
+cancelled_runs = registry.counter(
+    "agui_cancelled_runs_total",
+    "AG-UI runs cancelled because the client disconnected, by stage (queued, running).",
+    ("tenant", "stage"),
+)
+span_duration = registry.histogram(
+    "agent_span_duration_seconds", "Duration of traced operations.", ("span", "tenant"),
+)
+span_errors = registry.counter(
+    "agent_span_errors_total", "Traced operations that raised.", ("span", "tenant"),
+)
+model_tokens = registry.counter(
+    "agent_model_tokens_total", "Model tokens by direction (input, output).", ("tenant", "direction"),
+)
+sse_bytes = registry.counter("agui_sse_bytes_total", "SSE bytes written.", ("tenant",))
+
+
+# ---------------------------------------------------------------------------
+# Run traces
+# ---------------------------------------------------------------------------
+
+_tenants_seen: set[str] = set()
+_tenants_lock = threading.Lock()
+
+
+def tenant_label(tenant_id: str) -> str:
+    """``tenant_id``, or ``other`` once ``metrics_max_tenants`` tenants have been seen."""
+    with _tenants_lock:
+        if tenant_id in _tenants_seen:
+            return tenant_id
+        if len(_tenants_seen) < settings.metrics_max_tenants:
+            _tenants_seen.add(tenant_id)
+            return tenant_id
+    return "other"
+
+
+@dataclass
+class Span:
+    name: str
+    start_ms: float
+    duration_ms: float
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RunTrace:
+    run_id: str
+    tenant_id: str
+    started_at: float = field(default_factory=time.perf_counter)
+    outcome: str = "aborted"
+    first_event_ms: float | None = None
+    duration_ms: float | None = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    spans: list[Span] = field(default_factory=list)
+    # span name -> [count, total ms, max ms]
+    totals: dict[str, list[float]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.tenant = tenant_label(self.tenant_id)
+
+    def _ms(self, at: float) -> float:
+        return round((at - self.started_at) * 1000, 3)
+
+    def add_span(self, name: str, start: float, end: float, **attrs: Any) -> None:
+        duration_ms = round((end - start) * 1000, 3)
+        if len(self.spans) < MAX_SPANS_PER_RUN:
+            self.spans.append(Span(name, self._ms(start), duration_ms, attrs))
+        total = self.totals.setdefault(name, [0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += duration_ms
+        total[2] = max(total[2], duration_ms)
+
+    def add_tokens(self, input_tokens: int, output_tokens: int) -> None:
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+
+    def mark_event(self) -> None:
+        """Record time to first event (no-op after the first call)."""
+        if self.first_event_ms is None:
+            self.first_event_ms = self._ms(time.perf_counter())
+            time_to_first_event.observe(self.first_event_ms / 1000, tenant=self.tenant)
+
+    @contextmanager
+    def running(self) -> Iterator[RunTrace]:
+        """Bracket the streamed run: active gauge, duration and outcome metrics."""
+        active_runs.inc(tenant=self.tenant)
+        try:
+            yield self
+        finally:
+            active_runs.dec(tenant=self.tenant)
+            self.duration_ms = self._ms(time.perf_counter())
+            run_duration.observe(self.duration_ms / 1000, tenant=self.tenant)
+            runs_total.inc(tenant=self.tenant, outcome=self.outcome)
+            _recent_runs.append(self)
+
+    def summary(self) -> dict[str, Any]:
+        """Per-run timing summary (the ``run_timing`` event value)."""
+        return {
+            "runId": self.run_id,
+            "tenantId": self.tenant_id,
+            "elapsedMs": self._ms(time.perf_counter()) if self.duration_ms is None else self.duration_ms,
+            "timeToFirstEventMs": self.first_event_ms,
+            "inputTokens": self.input_tokens,
+            "outputTokens": self.output_tokens,
+            "spans": {
+                name: {"count": int(count), "totalMs": round(total, 3), "maxMs": peak}
+                for name, (count, total, peak) in self.totals.items()
+            },
+        }
+
+
+_current_run: ContextVar[RunTrace | None] = ContextVar("agui_run_trace", default=None)
+_recent_runs: deque[RunTrace] = deque(maxlen=RECENT_RUNS)
+
+
+def start_run(run_id: str, tenant_id: str, started_at: float | None = None) -> RunTrace:
+    """Create a run trace and make it current for this request's context."""
+    trace = RunTrace(run_id=run_id, tenant_id=tenant_id)
+    if started_at is not None:
+        trace.started_at = started_at
+    _current_run.set(trace)
+    return trace
+
+
+def current_run() -> RunTrace | None:
+    return _current_run.get()
+
+
+def record_span(name: str, start: float, end: float, *, error: bool = False, **attrs: Any) -> None:
+    """Record an already-timed operation (``time.perf_counter()`` bounds)."""
+    trace = _current_run.get()
+    tenant = trace.tenant if trace is not None else ""
+    span_duration.observe(end - start, span=name, tenant=tenant)
+    if error:
+        span_errors.inc(span=name, tenant=tenant)
+    if trace is not None:
+        trace.add_span(name, start, end, **({"error": True, **attrs} if error else attrs))
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[dict[str, Any]]:
+    """Time a block as span ``name``; the yielded dict can add attributes."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield attrs
+    except asyncio.CancelledError:
+        attrs["cancelled"] = True
+        raise
+    except Exception:
+        error = True
+        raise
+    finally:
+        record_span(name, start, time.perf_counter(), error=error, **attrs)
+
+
+def record_tokens(input_tokens: int, output_tokens: int) -> None:
+    trace = _current_run.get()
+    tenant = trace.tenant if trace is not None else ""
+    model_tokens.inc(input_tokens, tenant=tenant, direction="input")
+    model_tokens.inc(output_tokens, tenant=tenant, direction="output")
+    if trace is not None:
+        trace.add_tokens(input_tokens, output_tokens)
+
+
+def record_sse_bytes(nbytes: int) -> None:
+    trace = _current_run.get()
+    sse_bytes.inc(nbytes, tenant=trace.tenant if trace is not None else "")
+
+
+def register_stats(
+    prefix: str,
+    stats: Callable[[], dict[str, Any]],
+    help: str,
+    counters: Iterable[str] = (),
+) -> None:
+    """Export the numeric fields of ``stats()`` as ``<prefix>_<field>`` gauges.
+
+    Fields named in ``counters`` only ever go up; they are exported as
+    ``<prefix>_<field>_total`` counters so ``rate()`` and reset detection work.
+    """
+    counters = frozenset(counters)
+
+    def collect() -> Iterator[tuple[str, str, str, float]]:
+        for name, value in stats().items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            if name in counters:
+                yield f"{prefix}_{name}_total", "counter", f"{help} ({name}).", value
+            else:
+                yield f"{prefix}_{name}", "gauge", f"{help} ({name}).", value
+
+    registry.register_collector(collect)
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+def recent_runs() -> list[dict[str, Any]]:
+    return [
+        {
+            **trace.summary(),
+            "outcome": trace.outcome,
+            "spanList": [
+                {"name": s.name, "startMs": s.start_ms, "durationMs": s.duration_ms, **s.attrs}
+                for s in trace.spans
+            ],
+        }
+        for trace in list(_recent_runs)
+    ]
@@ -0,0 +1,141 @@
+"""Concurrent execution of the tool calls in one agent step.
+
+When the model asks for several tools at once (e.g. summary + SLA + channels
+for an "overview" question) they are independent, so the tools stage runs
+them concurrently: step latency becomes the slowest tool instead of the sum.
+
+- Tools are async; blocking data access is pushed onto a bounded, shared
+  thread pool via ``run_blocking``.
+- At most ``tool_max_concurrency`` calls of one step run at a time.
+- Each call has its own timeout; a timeout or failure becomes an error
+  ``ToolMessage`` for that call only and never blocks the others.
+- Results are returned in the order of the model's ``tool_calls``.
+- Each call is traced as a ``tool.<name>`` span (see app/telemetry.py).
+- A tool's full payload (``artifact["payload"]``, see app/digests.py) is
+  moved to the graph state field mapped to that tool, keyed by tool call id
+  (``{tool_call_id: payload}``), so a step calling the same tool twice (e.g.
+  for two date ranges) keeps both results. Each step that calls a tool
+  replaces that tool's field. The ``ToolMessage`` kept in the state is a
+  copy without the payload; the streamed ``TOOL_CALL_RESULT`` comes from the
+  original message and still carries it.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence
+
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+from app import telemetry
+from app.config import settings
+from app.digests import full_payload, without_payload
+
+# Shared pool for blocking tool work (warehouse queries, mock data generation)
+_executor = ThreadPoolExecutor(
+    max_workers=settings.tool_executor_workers,
+    thread_name_prefix="finops-tool",
+)
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking function on the shared tool thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _error_message(call: ToolCall, content: str) -> ToolMessage:
+    return ToolMessage(
+        content=content,
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error",
+    )
+
+
+async def execute_tool_calls(
+    tools_by_name: dict[str, BaseTool],
+    tool_calls: Sequence[ToolCall],
+    config: RunnableConfig | None = None,
+    *,
+    max_concurrency: int | None = None,
+    timeout_seconds: float | None = None,
+) -> list[ToolMessage]:
+    """Run ``tool_calls`` concurrently; results keep the order of ``tool_calls``."""
+    if max_concurrency is None:
+        max_concurrency = settings.tool_max_concurrency
+    if timeout_seconds is None:
+        timeout_seconds = settings.tool_timeout_seconds
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def run_one(call: ToolCall) -> ToolMessage:
+        tool = tools_by_name.get(call["name"])
+        if tool is None:
+            return _error_message(
+                call,
+                f"Error: {call['name']} is not a valid tool, "
+                f"try one of [{', '.join(tools_by_name)}].",
+            )
+        try:
+            async with semaphore:
+                with telemetry.span(f"tool.{call['name']}"):
+                    result = await asyncio.wait_for(
+                        tool.ainvoke({**call, "type": "tool_call"}, config),
+                        timeout=timeout_seconds or None,
+                    )
+        except asyncio.TimeoutError:
+            return _error_message(
+                call, f"Error: {call['name']} timed out after {timeout_seconds}s.",
+            )
+        except Exception as e:
+            return _error_message(call, f"Error: {e!r}\n Please fix your mistakes.")
+        if isinstance(result, ToolMessage):
+            return result
+        return ToolMessage(content=str(result), name=call["name"], tool_call_id=call["id"])
+
+    return list(await asyncio.gather(*(run_one(call) for call in tool_calls)))
+
+
+def cancelled_tool_results(messages: Sequence[Any]) -> list[ToolMessage]:
+    """Error results for the last AIMessage's tool calls that never got one."""
+    last_ai = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+    if last_ai is None or not last_ai.tool_calls:
+        return []
+    answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    return [
+        _error_message(call, f"Error: {call['name']} was cancelled (client disconnected).")
+        for call in last_ai.tool_calls
+        if call["id"] not in answered
+    ]
+
+
+def make_tools_node(
+    tools: Sequence[BaseTool],
+    state_keys: dict[str, str] | None = None,
+) -> Callable[[dict[str, Any], RunnableConfig], Any]:
+    """Build the graph's tools node: runs the last AIMessage's tool calls in parallel.
+
+    ``state_keys`` maps tool names to the state field receiving their full
+    payloads, by tool call id.
+    """
+    tools_by_name = {t.name: t for t in tools}
+    state_keys = state_keys or {}
+
+    async def run_tools(state: dict[str, Any], config: RunnableConfig) -> dict[str, Any]:
+        last = state["messages"][-1]
+        tool_calls = last.tool_calls if isinstance(last, AIMessage) else []
+        messages = await execute_tool_calls(tools_by_name, tool_calls, config)
+        update: dict[str, Any] = {"messages": []}
+        for msg in messages:
+            key = state_keys.get(msg.name or "")
+            payload = full_payload(msg.artifact)
+            if key and payload is not None and msg.status != "error":
+                update.setdefault(key, {})[msg.tool_call_id] = payload
+                msg = msg.model_copy(update={"artifact": without_payload(msg.artifact)})
+            update["messages"].append(msg)
+        return update
+
+    return run_tools
@@ -1,38 +1,66 @@
-"""LangGraph tools for the FinOps Assistant agent."""
+"""LangGraph tools for the FinOps Assistant agent.
+
+Tools are async so one agent step can run several of them concurrently;
+blocking data access goes through the shared tool thread pool. Results are
+cached per tenant (see app/cache.py). Each tool returns ``(digest, artifact)``:
+the model reads a compact digest of the result (see app/digests.py), while
+the artifact carries the full payload for the UI plus cache hit / data age.
+"""
 from langchain_core.tools import tool
+from app.cache import tool_cache
+from app.digests import (
+    digest_channel_breakdown,
+    digest_sla_compliance,
+    digest_transaction_summary,
+    digested,
+)
+from app.tool_executor import run_blocking
 from app.mock_data import (
     get_transaction_summary as _get_txn_summary,
     get_sla_compliance as _get_sla,
     get_payment_channel_breakdown as _get_channels,
 )
 
+# Per-tool cache TTLs (seconds)
+TRANSACTION_SUMMARY_TTL = 300
+SLA_COMPLIANCE_TTL = 60
+CHANNEL_BREAKDOWN_TTL = 300
+
 
-@tool
-def get_transaction_summary(tenant_id: str, date_range: str = "7d") -> dict:
+@tool(response_format="content_and_artifact")
+@digested(digest_transaction_summary)
+@tool_cache.cached(ttl_seconds=TRANSACTION_SUMMARY_TTL)
+async def get_transaction_summary(tenant_id: str, date_range: str = "7d") -> dict:
     """Get transaction summary for a tenant over a date range.
 
     Args:
         tenant_id: The tenant identifier (e.g. 'tenant-demo-001')
-        date_range: Time period like '7d', '14d', '30d'
+        date_range: Time period like '7d', '30d', '90d', '365d'
     """
-    return _get_txn_summary(tenant_id, date_range)
+    return await run_blocking(_get_txn_summary, tenant_id, date_range)
 
 
-@tool
-def get_sla_compliance(tenant_id: str) -> dict:
-    """Get SLA compliance metrics for a tenant.
+@tool(response_format="content_and_artifact")
+@digested(digest_sla_compliance)
+@tool_cache.cached(ttl_seconds=SLA_COMPLIANCE_TTL)
+async def get_sla_compliance(tenant_id: str, date_range: str | None = None) -> dict:
+    """Get SLA compliance metrics (uptime, latency percentiles, error rate) for a tenant.
 
     Args:
         tenant_id: The tenant identifier
+        date_range: Optional period like '7d', '30d', '90d'; defaults to the current month
     """
-    return _get_sla(tenant_id)
+    return await run_blocking(_get_sla, tenant_id, date_range)
 
 
-@tool
-def get_payment_channel_breakdown(tenant_id: str) -> dict:
+@tool(response_format="content_and_artifact")
+@digested(digest_channel_breakdown)
+@tool_cache.cached(ttl_seconds=CHANNEL_BREAKDOWN_TTL)
+async def get_payment_channel_breakdown(tenant_id: str, date_range: str = "30d") -> dict:
     """Get payment channel breakdown showing volume and success rates per channel.
 
     Args:
         tenant_id: The tenant identifier
+        date_range: Time period like '7d', '30d', '365d'
     """
-    return _get_channels(tenant_id)
+    return await run_blocking(_get_channels, tenant_id, date_range)
@@ -0,0 +1,316 @@
+"""Columnar, NumPy-backed synthetic transaction store.
+
+Each tenant gets a seeded synthetic dataset (``txn_store_rows_per_tenant``
+rows spread over ``txn_store_days`` days) held as parallel column arrays,
+sorted by timestamp:
+
+    ts        int64    epoch seconds (UTC)
+    merchant  uint8    index into MERCHANTS
+    channel   uint8    index into CHANNELS
+    amount    float64  USD
+    latency   float32  processing latency in ms
+    status    uint8    STATUS_SUCCESS / STATUS_DECLINED / STATUS_ERROR
+
+Datasets are generated once per process, or -- when ``txn_store_dir`` is set --
+written to disk as ``.npy`` files and memory-mapped on later starts. Time
+windows are resolved with ``searchsorted`` on the sorted ``ts`` column, so
+aggregations in ``app/mock_data.py`` only touch the rows in range.
+
+New transactions are added with ``append`` (or ``append_synthetic`` for
+simulated live traffic); subscribers such as the rollups in
+``app/rollups.py`` are notified with each appended batch.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from app.config import settings
+
+SECONDS_PER_DAY = 86_400
+MAX_RANGE_DAYS = 365
+
+STATUS_SUCCESS = 0
+STATUS_DECLINED = 1
+STATUS_ERROR = 2
+
+COLUMNS = ("ts", "merchant", "channel", "amount", "latency", "status")
+
+MERCHANTS = (
+    "Stripe Connect",
+    "PayPal Commerce",
+    "Square POS",
+    "Adyen Gateway",
+    "Worldpay Direct",
+    "Braintree",
+    "Checkout.com",
+    "Authorize.Net",
+)
+
+
+@dataclass(frozen=True)
+class ChannelProfile:
+    name: str
+    share: float           # fraction of transaction volume
+    amount_median: float   # USD, lognormal median
+    amount_sigma: float
+    latency_median: float  # ms, lognormal median
+    latency_sigma: float
+    decline_rate: float
+    error_rate: float
+
+
+CHANNELS = (
+    ChannelProfile("Credit Card", 0.43, 70.0, 0.6, 95.0, 0.55, 0.018, 0.0008),
+    ChannelProfile("Debit Card", 0.25, 45.0, 0.55, 85.0, 0.5, 0.010, 0.0006),
+    ChannelProfile("ACH/Bank Transfer", 0.14, 480.0, 0.8, 140.0, 0.6, 0.004, 0.0004),
+    ChannelProfile("Digital Wallet", 0.14, 55.0, 0.5, 60.0, 0.45, 0.006, 0.0005),
+    ChannelProfile("Wire Transfer", 0.04, 14_000.0, 0.9, 220.0, 0.5, 0.002, 0.0002),
+)
+
+_FORMAT_VERSION = 2
+
+
+def parse_date_range(date_range: str | None, default_days: int = 7) -> int:
+    """Convert ``'7d'`` / ``'24h'`` / ``'4w'`` into seconds, capped at one year."""
+    match = re.fullmatch(r"\s*(\d+)\s*([hdw]?)\s*", (date_range or "").lower())
+    if not match or int(match.group(1)) <= 0:
+        seconds = default_days * SECONDS_PER_DAY
+    else:
+        value, unit = int(match.group(1)), match.group(2) or "d"
+        seconds = value * {"h": 3_600, "d": SECONDS_PER_DAY, "w": 7 * SECONDS_PER_DAY}[unit]
+    return min(seconds, MAX_RANGE_DAYS * SECONDS_PER_DAY)
+
+
+def tenant_seed(tenant_id: str) -> int:
+    return (settings.txn_store_seed * 1_000_003 + zlib.crc32(tenant_id.encode())) % 2**32
+
+
+def _tenant_scale(tenant_id: str) -> float:
+    """Per-tenant ticket size multiplier so tenants don't look identical."""
+    return float(np.random.default_rng(tenant_seed(tenant_id)).uniform(0.8, 1.2))
+
+
+def synthesize(
+    rng: np.random.Generator, start_ts: int, end_ts: int, rows: int, scale: float = 1.0,
+) -> dict[str, np.ndarray]:
+    """Generate ``rows`` synthetic transactions in ``[start_ts, end_ts)``, sorted by ts."""
+    ts = np.sort(rng.integers(start_ts, end_ts, size=rows, dtype=np.int64))
+
+    shares = np.array([c.share for c in CHANNELS])
+    channel = rng.choice(len(CHANNELS), size=rows, p=shares / shares.sum()).astype(np.uint8)
+
+    # Zipf-like merchant popularity
+    weights = 1.0 / np.arange(1, len(MERCHANTS) + 1) ** 1.1
+    merchant = rng.choice(len(MERCHANTS), size=rows, p=weights / weights.sum()).astype(np.uint8)
+
+    amount_median = np.array([c.amount_median for c in CHANNELS])[channel] * scale
+    amount_sigma = np.array([c.amount_sigma for c in CHANNELS])[channel]
+    amount = np.round(amount_median * np.exp(rng.standard_normal(rows) * amount_sigma), 2)
+
+    latency_median = np.array([c.latency_median for c in CHANNELS])[channel]
+    latency_sigma = np.array([c.latency_sigma for c in CHANNELS])[channel]
+    latency = (latency_median * np.exp(rng.standard_normal(rows) * latency_sigma)).astype(np.float32)
+
+    u = rng.random(rows)
+    error_p = np.array([c.error_rate for c in CHANNELS])[channel]
+    decline_p = np.array([c.decline_rate for c in CHANNELS])[channel]
+
+    # Incidents: occasional short windows with mostly failing, slow traffic
+    n_incidents = rng.poisson(0.6 * (end_ts - start_ts) / (30 * SECONDS_PER_DAY))
+    for start in rng.integers(start_ts, end_ts, size=n_incidents):
+        rows_in = slice(*np.searchsorted(ts, [start, start + rng.integers(300, 1_200)]))
+        error_p[rows_in] = 0.85
+        latency[rows_in] *= 4
+
+    status = np.full(rows, STATUS_SUCCESS, dtype=np.uint8)
+    status[u < error_p + decline_p] = STATUS_DECLINED
+    status[u < error_p] = STATUS_ERROR
+
+    return {
+        "ts": ts, "merchant": merchant, "channel": channel,
+        "amount": amount, "latency": latency, "status": status,
+    }
+
+
+class TransactionStore:
+    """Column arrays for one tenant, sorted by ``ts``."""
+
+    def __init__(self, tenant_id: str, columns: dict[str, np.ndarray], end_ts: int) -> None:
+        self.tenant_id = tenant_id
+        self.columns = columns
+        self.end_ts = end_ts
+        # Reentrant: append_synthetic holds it across its own append
+        self.append_lock = threading.RLock()
+        self._listeners: list[Callable[[dict[str, np.ndarray]], None]] = []
+        # Materialized rollups, attached on first use by app.rollups.get_rollups
+        self.rollups: Any = None
+
+    def __len__(self) -> int:
+        return len(self.columns["ts"])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.nbytes for col in self.columns.values())
+
+    # -- windows ------------------------------------------------------------
+
+    def day_start(self, ts: int) -> int:
+        return ts - ts % SECONDS_PER_DAY
+
+    def window_start(self, seconds: int) -> int:
+        """Start of a window ending now; day-sized windows align to UTC midnight."""
+        if seconds % SECONDS_PER_DAY == 0:
+            return self.day_start(self.end_ts) - (seconds // SECONDS_PER_DAY - 1) * SECONDS_PER_DAY
+        return self.end_ts - seconds
+
+    def rows_between(self, start_ts: int, end_ts: int | None = None) -> slice:
+        ts = self.columns["ts"]
+        lo = int(np.searchsorted(ts, start_ts, side="left"))
+        hi = len(ts) if end_ts is None else int(np.searchsorted(ts, end_ts, side="left"))
+        return slice(lo, hi)
+
+    def view(self, rows: slice) -> dict[str, np.ndarray]:
+        return {name: col[rows] for name, col in self.columns.items()}
+
+    # -- generation / persistence ------------------------------------------
+
+    @classmethod
+    def generate(
+        cls, tenant_id: str, rows: int, days: int, end_ts: int | None = None,
+    ) -> TransactionStore:
+        rng = np.random.default_rng(tenant_seed(tenant_id))
+        end_ts = int(end_ts if end_ts is not None else time.time())
+        columns = synthesize(rng, end_ts - days * SECONDS_PER_DAY, end_ts, rows, _tenant_scale(tenant_id))
+        return cls(tenant_id, columns, end_ts)
+
+    # -- appends ------------------------------------------------------------
+
+    def append(self, columns: dict[str, np.ndarray], end_ts: int | None = None) -> None:
+        """Append rows (sorted by ``ts``, not older than the current end)."""
+        ts = columns["ts"]
+        if len(ts) and np.any(np.diff(ts) < 0):
+            raise ValueError("appended transactions must be sorted by ts")
+        with self.append_lock:
+            # Checked under the lock: a concurrent append may have moved end_ts
+            if len(ts) and ts[0] < self.end_ts:
+                raise ValueError("appended transactions must not be older than end_ts")
+            # Readers keep working on the previous arrays; swap in one assignment
+            self.columns = {
+                name: np.concatenate((self.columns[name], np.asarray(columns[name], col.dtype)))
+                for name, col in self.columns.items()
+            }
+            if end_ts is None:
+                end_ts = int(ts[-1]) + 1 if len(ts) else self.end_ts
+            self.end_ts = max(self.end_ts, int(end_ts))
+            for listener in self._listeners:
+                listener(columns)
+
+    def append_synthetic(self, until_ts: int | None = None) -> int:
+        """Append synthetic traffic from ``end_ts`` up to ``until_ts`` (default: now)."""
+        until_ts = int(until_ts if until_ts is not None else time.time())
+        # Held from reading end_ts to the append, so concurrent calls don't overlap
+        with self.append_lock:
+            if until_ts <= self.end_ts:
+                return 0
+            span = (
+                max(int(self.columns["ts"][-1] - self.columns["ts"][0]), 1)
+                if len(self) else SECONDS_PER_DAY
+            )
+            rate = len(self) / span if len(self) else 1.0
+            rng = np.random.default_rng((tenant_seed(self.tenant_id), self.end_ts))
+            rows = int(rng.poisson(rate * (until_ts - self.end_ts)))
+            columns = synthesize(rng, self.end_ts, until_ts, rows, _tenant_scale(self.tenant_id))
+            self.append(columns, end_ts=until_ts)
+        return rows
+
+    def subscribe(self, listener: Callable[[dict[str, np.ndarray]], None]) -> None:
+        """Call ``listener(new_columns)`` after every append (e.g. rollups)."""
+        self._listeners.append(listener)
+
+    def save(self, path: Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        for name, col in self.columns.items():
+            np.save(path / f"{name}.npy", np.ascontiguousarray(col))
+        (path / "meta.json").write_text(json.dumps({
+            "version": _FORMAT_VERSION,
+            "tenant_id": self.tenant_id,
+            "rows": len(self),
+            "end_ts": self.end_ts,
+            "seed": tenant_seed(self.tenant_id),
+        }))
+
+    @classmethod
+    def load(cls, tenant_id: str, path: Path, rows: int) -> TransactionStore | None:
+        """Memory-map a saved dataset; ``None`` if missing or built differently."""
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+        if (
+            meta.get("version") != _FORMAT_VERSION
+            or meta.get("tenant_id") != tenant_id
+            or meta.get("rows") != rows
+            or meta.get("seed") != tenant_seed(tenant_id)
+        ):
+            return None
+        columns = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in COLUMNS}
+        return cls(tenant_id, columns, int(meta["end_ts"]))
+
+
+# ---------------------------------------------------------------------------
+# Per-tenant registry
+# ---------------------------------------------------------------------------
+
+_stores: OrderedDict[str, TransactionStore] = OrderedDict()
+_registry_lock = threading.Lock()
+_build_locks: dict[str, threading.Lock] = {}
+
+
+def _store_path(tenant_id: str) -> Path | None:
+    if not settings.txn_store_dir:
+        return None
+    return Path(settings.txn_store_dir) / re.sub(r"[^A-Za-z0-9_.-]", "_", tenant_id)
+
+
+def _build(tenant_id: str) -> TransactionStore:
+    rows = settings.txn_store_rows_per_tenant
+    path = _store_path(tenant_id)
+    if path is not None and (store := TransactionStore.load(tenant_id, path, rows)) is not None:
+        return store
+    store = TransactionStore.generate(tenant_id, rows, settings.txn_store_days)
+    if path is not None:
+        store.save(path)
+        return TransactionStore.load(tenant_id, path, rows) or store
+    return store
+
+
+def get_store(tenant_id: str) -> TransactionStore:
+    """Return the tenant's store, generating or memory-mapping it on first use."""
+    with _registry_lock:
+        if (store := _stores.get(tenant_id)) is not None:
+            _stores.move_to_end(tenant_id)
+            return store
+        build_lock = _build_locks.setdefault(tenant_id, threading.Lock())
+
+    # Build outside the registry lock so other tenants aren't blocked
+    with build_lock:
+        with _registry_lock:
+            if (store := _stores.get(tenant_id)) is not None:
+                return store
+        store = _build(tenant_id)
+        with _registry_lock:
+            _stores[tenant_id] = store
+            _build_locks.pop(tenant_id, None)
+            while len(_stores) > max(settings.txn_store_max_tenants, 1):
+                _stores.popitem(last=False)
+        return store
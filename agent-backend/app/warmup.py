@@ -0,0 +1,181 @@
+"""Lazy graph construction, startup warmup and readiness.
+
+Importing ``app.main`` used to build the agent graph, which imports
+LangGraph and (with AWS credentials) ``langchain_aws`` / boto3 and creates
+the Bedrock client before uvicorn accepts a connection; every worker start
+and ``--reload`` paid for it, and the first request still paid for cold
+connections and the tenant dataset. Now:
+
+- nothing heavy is imported at module import time: the graph is built on
+  first use by ``agent_graph()`` (in a worker thread, once);
+- on startup, ``Warmup.run`` (started by the FastAPI lifespan in
+  app/main.py, in the background) builds the graph, touches the
+  checkpointer, pre-opens ``warmup_model_connections`` Bedrock connections
+  and loads the default tenant's transaction store;
+- ``GET /ready`` answers ``503`` until the required steps have finished
+  (``200`` when warmup is disabled), so a load balancer can hold traffic
+  back while ``GET /health`` keeps reporting liveness. It also answers
+  ``503`` while the checkpointer cannot write (``checkpoint_error()``).
+
+Warmup step durations are reported by ``/ready`` and exported as
+``agent_startup_*`` gauges on ``/metrics``; ``python -m bench.startup``
+measures import time, time to healthy / ready and the first run.
+Requests arriving before warmup finishes are served; they wait for the graph
+build if it is still in progress.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
+
+logger = logging.getLogger(__name__)
+
+# Thread id read by the checkpointer warmup; never written
+WARMUP_THREAD_ID = "__warmup__"
+
+_graph: CompiledStateGraph | None = None
+
+
+def _build_graph() -> CompiledStateGraph:
+    # Deferred: imports LangGraph and the model client
+    from app.agent import get_agent_graph
+
+    return get_agent_graph()
+
+
+async def agent_graph() -> CompiledStateGraph:
+    """The compiled agent graph, built in a worker thread on first use."""
+    global _graph
+    if _graph is None:
+        _graph = await asyncio.to_thread(_build_graph)
+    return _graph
+
+
+def checkpoint_stats() -> dict[str, Any]:
+    """Checkpointer stats, empty until the graph is built."""
+    return _graph.checkpointer.stats() if _graph is not None else {}
+
+
+def checkpoint_error() -> str | None:
+    """Why the checkpointer cannot write (see app/sqlite_checkpoint.py), if so."""
+    error = getattr(_graph.checkpointer, "writer_error", None) if _graph is not None else None
+    return f"{type(error).__name__}: {error}" if error is not None else None
+
+
+# ---------------------------------------------------------------------------
+# Warmup steps
+# ---------------------------------------------------------------------------
+
+async def _warm_checkpointer() -> None:
+    graph = await agent_graph()
+    await graph.checkpointer.aget_tuple({"configurable": {"thread_id": WARMUP_THREAD_ID}})
+
+
+async def _warm_model_connections() -> None:
+    from app.llm import bedrock_configured, open_bedrock_connection
+
+    if not bedrock_configured():
+        return
+    # Concurrently, so each request checks out (and leaves) its own connection
+    await asyncio.gather(*(
+        asyncio.to_thread(open_bedrock_connection)
+        for _ in range(settings.warmup_model_connections)
+    ))
+
+
+async def _warm_txn_store() -> None:
+    from app.txn_store import get_store
+
+    await asyncio.to_thread(get_store, settings.default_tenant_id)
+
+
+@dataclass
+class WarmupStep:
+    name: str
+    run: Callable[[], Awaitable[None]]
+    # Readiness waits for required steps; others are best effort
+    required: bool = True
+
+
+def default_steps() -> list[WarmupStep]:
+    steps = [
+        WarmupStep("graph", agent_graph),
+        WarmupStep("checkpointer", _warm_checkpointer),
+    ]
+    if settings.warmup_model_connections > 0:
+        steps.append(WarmupStep("model_connections", _warm_model_connections, required=False))
+    if settings.warmup_txn_store:
+        steps.append(WarmupStep("txn_store", _warm_txn_store, required=False))
+    return steps
+
+
+# ---------------------------------------------------------------------------
+# Warmup state
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Warmup:
+    """Runs the warmup steps once and tracks readiness and timings."""
+
+    enabled: bool = True
+    started_at: float | None = None
+    finished_at: float | None = None
+    step_seconds: dict[str, float] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    _required_failed: bool = False
+
+    @property
+    def ready(self) -> bool:
+        if checkpoint_error() is not None:
+            return False
+        if not self.enabled:
+            return True
+        return self.finished_at is not None and not self._required_failed
+
+    async def run(self, steps: list[WarmupStep] | None = None) -> None:
+        self.started_at = time.perf_counter()
+        for step in steps if steps is not None else default_steps():
+            started = time.perf_counter()
+            try:
+                await step.run()
+            except Exception as exc:
+                logger.exception("warmup step %s failed", step.name)
+                self.errors[step.name] = f"{type(exc).__name__}: {exc}"
+                self._required_failed |= step.required
+            self.step_seconds[step.name] = time.perf_counter() - started
+        self.finished_at = time.perf_counter()
+        logger.info("warmup finished in %.3fs: %s", self.finished_at - self.started_at,
+                    {name: round(s, 3) for name, s in self.step_seconds.items()})
+
+    def status(self) -> dict[str, Any]:
+        warmup_seconds = None
+        if self.started_at is not None and self.finished_at is not None:
+            warmup_seconds = round(self.finished_at - self.started_at, 4)
+        error = checkpoint_error()
+        return {
+            "ready": self.ready,
+            "warmupEnabled": self.enabled,
+            "warmupSeconds": warmup_seconds,
+            "steps": {name: round(s, 4) for name, s in self.step_seconds.items()},
+            "errors": {**self.errors, "checkpoint_writer": error} if error else self.errors,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {"ready": int(self.ready)}
+        if self.started_at is not None and self.finished_at is not None:
+            stats["warmup_seconds"] = self.finished_at - self.started_at
+        for name, seconds in self.step_seconds.items():
+            stats[f"warmup_{name}_seconds"] = seconds
+        return stats
+
+
+# Shared warmup state used by app/main.py
+warmup = Warmup(enabled=settings.warmup_enabled)
@@ -0,0 +1 @@
+"""Benchmarks and load tests for the agent backend (not shipped in the image)."""
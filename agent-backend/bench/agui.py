@@ -0,0 +1,733 @@
+"""End-to-end benchmark / load test for the ``/agui`` SSE endpoint.
+
+Drives full AG-UI runs against the backend with ``MockLLM`` (AWS credentials
+are cleared for the process under test), either in-process through the ASGI
+app or over HTTP against a local uvicorn server started by the benchmark:
+
+    cd agent-backend
+    python -m bench.agui                                  # in-process, all scenarios
+    python -m bench.agui --mode uvicorn --concurrency 32  # real sockets + SSE framing
+    python -m bench.agui --scenario long-history --sessions 50
+    python -m bench.agui --baseline bench/results/agui-inprocess-20260101-120000.json
+    python -m bench.agui --mock-profile realistic --mock-throttle-rate 0.05
+
+Scenarios (each session uses a fresh ``threadId``; runs inside a session are
+sequential, and later runs resend the history and state rebuilt from the SSE
+events the way the CopilotKit client does):
+
+    single-turn    one greeting run, no tools
+    multi-tool     three runs on one thread, each calling a different tool
+    long-history   first run carries ``--history-turns`` prior exchanges,
+                   then one follow-up run on the same thread
+
+Per scenario it reports requests/s, time to first SSE event (TTFE), time to
+first model output, p50/p95/p99 run latency, SSE bytes and events per run
+and peak RSS of the server process. Results are written as JSON (default
+``bench/results/``); ``--baseline`` compares against an earlier result file
+and ``--max-regression`` turns that comparison into a pass/fail gate.
+
+``MockLLM`` answers instantly by default; ``--mock-profile`` gives it a
+streaming latency model (time to first token, tokens/s; see app/llm.py) and
+``--mock-throttle-rate`` injects throttling errors, drawn from
+``--mock-seed`` so a run can be repeated exactly.
+
+Peak RSS is a high-water mark: in-process it includes the benchmark client,
+and it never decreases between scenarios of one invocation.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+RESULTS_DIR = BACKEND_DIR / "bench" / "results"
+
+# Force the mock model: the benchmark measures the backend, not Bedrock
+MOCK_ENV = {"AWS_ACCESS_KEY_ID": "", "AWS_SECRET_ACCESS_KEY": ""}
+
+# Events that carry model output (used for time-to-first-output)
+OUTPUT_EVENTS = {"TEXT_MESSAGE_CONTENT", "TOOL_CALL_START"}
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    description: str
+    # One run per prompt, sequentially, on the same thread
+    prompts: tuple[str, ...]
+    # Synthetic prior exchanges sent with the first run
+    history_turns: int = 0
+
+
+SCENARIOS: dict[str, Scenario] = {
+    s.name: s
+    for s in (
+        Scenario("single-turn", "One greeting run, no tools", ("Hello, what can you do?",)),
+        Scenario(
+            "multi-tool",
+            "Three runs on one thread, one tool round-trip each",
+            (
+                "Give me a transaction summary for the last week",
+                "How is our SLA compliance this month?",
+                "Show the payment channel breakdown",
+            ),
+        ),
+        Scenario(
+            "long-history",
+            "Large prior history, then a follow-up run",
+            ("What's our uptime this month?", "And the payment channel breakdown?"),
+            history_turns=50,
+        ),
+    )
+}
+
+
+def synthetic_history(turns: int) -> list[dict[str, Any]]:
+    """Prior AG-UI messages: user / assistant pairs, every 5th with a tool round-trip."""
+    messages: list[dict[str, Any]] = []
+    filler = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3
+    for i in range(turns):
+        messages.append({"id": f"hist-u{i}", "role": "user", "content": f"Question {i}: {filler}"})
+        if i % 5 == 4:
+            call_id = f"hist-call{i}"
+            messages.append({
+                "id": f"hist-tc{i}",
+                "role": "assistant",
+                "content": "",
+                "toolCalls": [{
+                    "id": call_id,
+                    "type": "function",
+                    "function": {
+                        "name": "get_transaction_summary",
+                        "arguments": json.dumps({"tenant_id": "tenant-demo-001", "date_range": "7d"}),
+                    },
+                }],
+            })
+            messages.append({
+                "id": f"hist-tr{i}",
+                "role": "tool",
+                "toolCallId": call_id,
+                "content": json.dumps({"total_transactions": 1000 + i, "note": filler}),
+            })
+        messages.append({"id": f"hist-a{i}", "role": "assistant", "content": f"Answer {i}: {filler}"})
+    return messages
+
+
+# ---------------------------------------------------------------------------
+# SSE parsing / client-side history reconstruction
+# ---------------------------------------------------------------------------
+
+class SseParser:
+    """Incremental ``data: {json}\\n\\n`` frame parser."""
+
+    def __init__(self) -> None:
+        self._buffer = ""
+
+    def feed(self, chunk: bytes) -> list[dict[str, Any]]:
+        self._buffer += chunk.decode()
+        *frames, self._buffer = self._buffer.split("\n\n")
+        events = []
+        for frame in frames:
+            data = "".join(
+                line[len("data:"):].lstrip() for line in frame.split("\n") if line.startswith("data:")
+            )
+            if data:
+                events.append(json.loads(data))
+        return events
+
+
+def messages_from_events(events: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Rebuild the AG-UI messages a client would append to its history after a run."""
+    messages: list[dict[str, Any]] = []
+    by_id: dict[str, dict[str, Any]] = {}
+    calls: dict[str, dict[str, Any]] = {}
+    for ev in events:
+        kind = ev["type"]
+        if kind == "TEXT_MESSAGE_START":
+            msg = {"id": ev["messageId"], "role": "assistant", "content": ""}
+            by_id[msg["id"]] = msg
+            messages.append(msg)
+        elif kind == "TEXT_MESSAGE_CONTENT":
+            by_id[ev["messageId"]]["content"] += ev["delta"]
+        elif kind == "TOOL_CALL_START":
+            parent = by_id.get(ev["parentMessageId"])
+            if parent is None:
+                parent = {"id": ev["parentMessageId"], "role": "assistant", "content": ""}
+                by_id[parent["id"]] = parent
+                messages.append(parent)
+            call = {
+                "id": ev["toolCallId"],
+                "type": "function",
+                "function": {"name": ev["toolCallName"], "arguments": ""},
+            }
+            parent.setdefault("toolCalls", []).append(call)
+            calls[call["id"]] = call
+        elif kind == "TOOL_CALL_ARGS":
+            calls[ev["toolCallId"]]["function"]["arguments"] += ev["delta"]
+        elif kind == "TOOL_CALL_RESULT":
+            messages.append({
+                "id": ev["messageId"],
+                "role": "tool",
+                "toolCallId": ev["toolCallId"],
+                "content": ev["content"],
+            })
+    return messages
+
+
+def apply_json_patch(doc: Any, ops: list[dict[str, Any]]) -> Any:
+    """Apply the RFC 6902 add / remove / replace operations of a ``STATE_DELTA``."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        tokens = [t.replace("~1", "/").replace("~0", "~") for t in op["path"].split("/")[1:]]
+        if not tokens:
+            doc = copy.deepcopy(op.get("value"))
+            continue
+        target = doc
+        for token in tokens[:-1]:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        last = tokens[-1]
+        if isinstance(target, list):
+            index = len(target) if last == "-" else int(last)
+            if op["op"] == "add":
+                target.insert(index, op["value"])
+            elif op["op"] == "replace":
+                target[index] = op["value"]
+            else:
+                del target[index]
+        elif op["op"] == "remove":
+            del target[last]
+        else:
+            target[last] = op["value"]
+    return doc
+
+
+def state_from_events(state: dict[str, Any], events: list[dict[str, Any]]) -> dict[str, Any]:
+    """The agent state a client holds after a run (sent back with the next run)."""
+    for ev in events:
+        if ev["type"] == "STATE_SNAPSHOT":
+            state = ev["snapshot"]
+        elif ev["type"] == "STATE_DELTA":
+            state = apply_json_patch(state, ev["delta"])
+    return state
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+# POST a JSON body to /agui; returns (status, async iterator of body chunks)
+PostStream = Callable[[bytes], Awaitable[tuple[int, AsyncIterator[bytes]]]]
+
+
+class InProcessTransport:
+    """Calls the ASGI app directly, forwarding body chunks as they are sent."""
+
+    def __init__(self) -> None:
+        os.environ.update(MOCK_ENV)
+        sys.path.insert(0, str(BACKEND_DIR))
+        from app.main import app
+
+        self.app = app
+
+    def peak_rss_bytes(self) -> int | None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def post(self, body: bytes) -> tuple[int, AsyncIterator[bytes]]:
+        queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+        finished = asyncio.Event()
+        request_sent = False
+
+        async def receive() -> dict[str, Any]:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict[str, Any]) -> None:
+            await queue.put(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/agui",
+            "raw_path": b"/agui",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (b"host", b"bench"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+        }
+
+        async def run_app() -> None:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                await queue.put(None)
+
+        task = asyncio.create_task(run_app())
+        start = await queue.get()
+        if start is None or start["type"] != "http.response.start":
+            await task
+            raise RuntimeError("ASGI app did not start a response")
+
+        async def chunks() -> AsyncIterator[bytes]:
+            try:
+                while (message := await queue.get()) is not None:
+                    if message.get("body"):
+                        yield message["body"]
+                    if not message.get("more_body", False):
+                        break
+            finally:
+                finished.set()
+                await task
+
+        return start["status"], chunks()
+
+
+class UvicornTransport:
+    """Starts ``uvicorn app.main:app`` in a subprocess and streams over HTTP."""
+
+    def __init__(self, concurrency: int, port: int | None = None) -> None:
+        import httpx
+
+        self.port = port or _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.proc: subprocess.Popen[bytes] | None = None
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(120.0),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+    def peak_rss_bytes(self) -> int | None:
+        # VmHWM is the server process' resident high-water mark (Linux only)
+        if self.proc is None:
+            return None
+        try:
+            for line in Path(f"/proc/{self.proc.pid}/status").read_text().splitlines():
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    async def start(self) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env={**os.environ, **MOCK_ENV},
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {self.proc.returncode}")
+            try:
+                if (await self.client.get("/health")).status_code == 200:
+                    return
+            except Exception:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError("uvicorn did not become healthy within 60s")
+
+    async def stop(self) -> None:
+        await self.client.aclose()
+        if self.proc is not None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    async def post(self, body: bytes) -> tuple[int, AsyncIterator[bytes]]:
+        request = self.client.build_request(
+            "POST", "/agui", content=body, headers={"content-type": "application/json"},
+        )
+        response = await self.client.send(request, stream=True)
+
+        async def chunks() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await response.aclose()
+
+        return response.status_code, chunks()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+@dataclass
+class RunSample:
+    latency_ms: float
+    ttfe_ms: float | None
+    first_output_ms: float | None
+    sse_bytes: int
+    events: int
+    error: str | None = None
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    description: str
+    sessions: int
+    concurrency: int
+    samples: list[RunSample] = field(default_factory=list)
+    wall_seconds: float = 0.0
+    peak_rss_bytes: int | None = None
+
+    def summary(self) -> dict[str, Any]:
+        ok = [s for s in self.samples if s.error is None]
+        errors = [s.error for s in self.samples if s.error is not None]
+        return {
+            "description": self.description,
+            "sessions": self.sessions,
+            "concurrency": self.concurrency,
+            "runs": len(self.samples),
+            "errors": len(errors),
+            "error_examples": sorted(set(errors))[:5],
+            "wall_seconds": round(self.wall_seconds, 3),
+            "requests_per_second": round(len(ok) / self.wall_seconds, 2) if self.wall_seconds else 0.0,
+            "ttfe_ms": _distribution([s.ttfe_ms for s in ok if s.ttfe_ms is not None]),
+            "first_output_ms": _distribution(
+                [s.first_output_ms for s in ok if s.first_output_ms is not None]
+            ),
+            "latency_ms": _distribution([s.latency_ms for s in ok]),
+            "sse_bytes_per_run": _distribution([s.sse_bytes for s in ok], digits=0),
+            "events_per_run": _distribution([s.events for s in ok], digits=1),
+            "peak_rss_mb": round(self.peak_rss_bytes / 2**20, 1) if self.peak_rss_bytes else None,
+        }
+
+
+def _distribution(values: list[float], digits: int = 2) -> dict[str, float] | None:
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=float)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "mean": round(float(arr.mean()), digits),
+        "p50": round(float(p50), digits),
+        "p95": round(float(p95), digits),
+        "p99": round(float(p99), digits),
+        "max": round(float(arr.max()), digits),
+    }
+
+
+async def run_once(
+    post: PostStream, thread_id: str, messages: list[dict[str, Any]], state: dict[str, Any],
+) -> tuple[RunSample, list[dict[str, Any]]]:
+    """Execute one AG-UI run; returns the sample and the parsed events."""
+    body = json.dumps({
+        "threadId": thread_id,
+        "runId": str(uuid.uuid4()),
+        "messages": messages,
+        "state": state,
+        "tools": [],
+        "context": [],
+    }).encode()
+    parser = SseParser()
+    events: list[dict[str, Any]] = []
+    nbytes = 0
+    ttfe = first_output = None
+    start = time.perf_counter()
+    try:
+        status, chunks = await post(body)
+        async for chunk in chunks:
+            nbytes += len(chunk)
+            for ev in parser.feed(chunk):
+                now = (time.perf_counter() - start) * 1000
+                if ttfe is None:
+                    ttfe = now
+                if first_output is None and ev["type"] in OUTPUT_EVENTS:
+                    first_output = now
+                events.append(ev)
+    except Exception as e:
+        return RunSample((time.perf_counter() - start) * 1000, ttfe, first_output, nbytes,
+                         len(events), error=type(e).__name__), events
+
+    error = None
+    if status != 200:
+        error = f"HTTP {status}"
+    elif any(ev["type"] == "RUN_ERROR" for ev in events):
+        error = "RUN_ERROR"
+    elif not events or events[-1]["type"] != "RUN_FINISHED":
+        error = "INCOMPLETE"
+    sample = RunSample(
+        (time.perf_counter() - start) * 1000, ttfe, first_output, nbytes, len(events), error,
+    )
+    return sample, events
+
+
+async def run_session(
+    post: PostStream, scenario: Scenario, tenant_id: str, history_turns: int,
+) -> list[RunSample]:
+    thread_id = f"bench-{scenario.name}-{uuid.uuid4().hex[:12]}"
+    history = synthetic_history(history_turns)
+    state: dict[str, Any] = {"tenant_id": tenant_id}
+    samples = []
+    for i, prompt in enumerate(scenario.prompts):
+        history.append({"id": f"u{i}-{uuid.uuid4().hex[:8]}", "role": "user", "content": prompt})
+        sample, events = await run_once(post, thread_id, history, state)
+        samples.append(sample)
+        if sample.error:
+            break
+        history.extend(messages_from_events(events))
+        state = state_from_events(state, events)
+    return samples
+
+
+async def run_scenario(
+    transport: InProcessTransport | UvicornTransport,
+    scenario: Scenario,
+    *,
+    sessions: int,
+    concurrency: int,
+    warmup: int,
+    tenant_id: str,
+    history_turns: int | None,
+) -> ScenarioResult:
+    # --history-turns only overrides scenarios that carry prior history
+    turns = scenario.history_turns
+    if turns and history_turns is not None:
+        turns = history_turns
+    for _ in range(warmup):
+        await run_session(transport.post, scenario, tenant_id, turns)
+
+    result = ScenarioResult(scenario.name, scenario.description, sessions, concurrency)
+    remaining = sessions
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            result.samples.extend(await run_session(transport.post, scenario, tenant_id, turns))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, sessions)))))
+    result.wall_seconds = time.perf_counter() - start
+    result.peak_rss_bytes = transport.peak_rss_bytes()
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+# (metric path, higher is better)
+COMPARED_METRICS: list[tuple[str, bool]] = [
+    ("requests_per_second", True),
+    ("ttfe_ms.p50", False),
+    ("ttfe_ms.p95", False),
+    ("first_output_ms.p95", False),
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("sse_bytes_per_run.mean", False),
+    ("peak_rss_mb", False),
+]
+
+
+def _metric(summary: dict[str, Any], path: str) -> float | None:
+    value: Any = summary
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value if isinstance(value, (int, float)) else None
+
+
+def print_summary(results: dict[str, Any]) -> None:
+    header = f"{'scenario':<14} {'runs':>5} {'err':>4} {'req/s':>8} {'ttfe p50':>9} " \
+             f"{'lat p50':>9} {'lat p95':>9} {'lat p99':>9} {'bytes/run':>10} {'rss MB':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, s in results["scenarios"].items():
+        def fmt(path: str, digits: int = 1) -> str:
+            v = _metric(s, path)
+            return "-" if v is None else f"{v:.{digits}f}"
+        print(
+            f"{name:<14} {s['runs']:>5} {s['errors']:>4} {fmt('requests_per_second'):>8} "
+            f"{fmt('ttfe_ms.p50'):>9} {fmt('latency_ms.p50'):>9} {fmt('latency_ms.p95'):>9} "
+            f"{fmt('latency_ms.p99'):>9} {fmt('sse_bytes_per_run.mean', 0):>10} "
+            f"{fmt('peak_rss_mb'):>7}"
+        )
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], max_regression_pct: float | None) -> bool:
+    """Print per-metric deltas against ``baseline``; False if a metric regressed too far."""
+    ok = True
+    print(f"\nvs baseline {baseline['meta'].get('timestamp')} ({baseline['meta'].get('git_commit')})")
+    if baseline["meta"].get("mode") != results["meta"]["mode"]:
+        print(f"  note: baseline mode {baseline['meta'].get('mode')!r} differs from "
+              f"{results['meta']['mode']!r}; deltas include transport overhead")
+    for name, current in results["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        for path, higher_is_better in COMPARED_METRICS:
+            new, old = _metric(current, path), _metric(base, path)
+            if new is None or not old:
+                continue
+            change = (new - old) / old * 100
+            regression = -change if higher_is_better else change
+            flag = ""
+            if max_regression_pct is not None and regression > max_regression_pct:
+                flag = "  REGRESSION"
+                ok = False
+            print(f"  {name:<14} {path:<24} {old:>10.2f} -> {new:>10.2f}  ({change:+6.1f}%){flag}")
+    return ok
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    p.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                   help="Scenario to run (repeatable; default: all)")
+    p.add_argument("--sessions", type=int, default=20, help="Measured sessions per scenario")
+    p.add_argument("--concurrency", type=int, default=8, help="Sessions in flight at once")
+    p.add_argument("--warmup", type=int, default=1, help="Unmeasured sessions per scenario")
+    p.add_argument("--history-turns", type=int, default=None,
+                   help="Prior exchanges for history scenarios (default: per scenario)")
+    p.add_argument("--tenant", default="tenant-demo-001")
+    p.add_argument("--port", type=int, default=None, help="uvicorn port (default: random)")
+    p.add_argument("--output", type=Path, default=None,
+                   help="Result JSON path (default: bench/results/agui-<mode>-<time>.json)")
+    p.add_argument("--baseline", type=Path, default=None, help="Earlier result JSON to compare with")
+    p.add_argument("--max-regression", type=float, default=None, metavar="PCT",
+                   help="Exit non-zero if a compared metric regresses by more than PCT percent")
+    p.add_argument("--mock-profile", default="instant",
+                   choices=["instant", "fast", "realistic", "slow"],
+                   help="MockLLM latency profile (see app/llm.py)")
+    p.add_argument("--mock-throttle-rate", type=float, default=0.0,
+                   help="Share of MockLLM calls failing with ThrottlingException")
+    p.add_argument("--mock-seed", type=int, default=0, help="MockLLM random seed")
+    return p.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> int:
+    scenarios = [SCENARIOS[name] for name in (args.scenario or SCENARIOS)]
+    # Read by the server's settings (in-process, and inherited by uvicorn)
+    os.environ.update({
+        "MOCK_LLM_PROFILE": args.mock_profile,
+        "MOCK_LLM_THROTTLE_RATE": str(args.mock_throttle_rate),
+        "MOCK_LLM_SEED": str(args.mock_seed),
+    })
+    if args.mode == "inprocess":
+        transport: InProcessTransport | UvicornTransport = InProcessTransport()
+    else:
+        transport = UvicornTransport(args.concurrency, args.port)
+
+    started = datetime.now(timezone.utc)
+    await transport.start()
+    try:
+        scenario_results = {}
+        for scenario in scenarios:
+            print(f"running {scenario.name} ({args.sessions} sessions, "
+                  f"concurrency {args.concurrency}, mode {args.mode})", file=sys.stderr)
+            result = await run_scenario(
+                transport,
+                scenario,
+                sessions=args.sessions,
+                concurrency=args.concurrency,
+                warmup=args.warmup,
+                tenant_id=args.tenant,
+                history_turns=args.history_turns,
+            )
+            scenario_results[scenario.name] = result.summary()
+    finally:
+        await transport.stop()
+
+    results = {
+        "meta": {
+            "timestamp": started.isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "mode": args.mode,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+            "scenarios": {s.name: asdict(s) for s in scenarios},
+        },
+        "scenarios": scenario_results,
+    }
+
+    output = args.output or RESULTS_DIR / f"agui-{args.mode}-{started:%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+
+    print_summary(results)
+    print(f"\nresults written to {output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if not compare(results, baseline, args.max_regression):
+            return 1
+    return 1 if any(s["errors"] for s in scenario_results.values()) else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    return asyncio.run(_main(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Startup benchmark: import time, time to healthy / ready, first run.
+
+Each repetition starts fresh Python processes with ``MockLLM`` (AWS
+credentials are cleared, as in ``bench.agui``):
+
+    cd agent-backend
+    python -m bench.startup                 # 3 repetitions
+    python -m bench.startup --repeat 10 --output /tmp/startup.json
+
+and measures
+
+    import      ``import app.main`` in a bare interpreter
+    healthy     uvicorn process start until ``GET /health`` answers
+    ready       uvicorn process start until ``GET /ready`` answers 200
+    first run   latency of the first ``/agui`` run once ready
+
+plus the per-step warmup durations reported by ``/ready``. Results are
+written as JSON (default ``bench/results/startup-<time>.json``).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from bench.agui import BACKEND_DIR, MOCK_ENV, RESULTS_DIR, _distribution, _free_port, _git_commit
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def measure_import() -> float:
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env={**os.environ, **MOCK_ENV},
+        capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_server(tenant_id: str, timeout: float = 120.0) -> dict[str, Any]:
+    import httpx
+
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **MOCK_ENV},
+    )
+    result: dict[str, Any] = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            deadline = started + timeout
+            while "ready" not in result:
+                if time.perf_counter() > deadline:
+                    raise RuntimeError(f"server not ready within {timeout}s")
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+                try:
+                    if "healthy" not in result and client.get("/health").status_code == 200:
+                        result["healthy"] = time.perf_counter() - started
+                    if "healthy" in result:
+                        response = client.get("/ready")
+                        if response.status_code == 200:
+                            result["ready"] = time.perf_counter() - started
+                            result["warmup"] = response.json()
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+
+            body = {
+                "threadId": f"startup-{uuid.uuid4().hex[:8]}",
+                "runId": uuid.uuid4().hex,
+                "messages": [{"id": "m1", "role": "user", "content": "show sla compliance"}],
+                "state": {"tenant_id": tenant_id},
+            }
+            run_started = time.perf_counter()
+            with client.stream("POST", "/agui", json=body) as response:
+                response.raise_for_status()
+                for _ in response.iter_raw():
+                    pass
+            result["first_run"] = time.perf_counter() - run_started
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return result
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("--repeat", type=int, default=3, help="Fresh processes per measurement")
+    p.add_argument("--tenant", default="tenant-demo-001")
+    p.add_argument("--output", type=Path, default=None,
+                   help="Result JSON path (default: bench/results/startup-<time>.json)")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    started = datetime.now(timezone.utc)
+    imports = [measure_import() for _ in range(args.repeat)]
+    servers = [measure_server(args.tenant) for _ in range(args.repeat)]
+
+    summary = {
+        "import_ms": _distribution([s * 1000 for s in imports]),
+        "healthy_ms": _distribution([s["healthy"] * 1000 for s in servers]),
+        "ready_ms": _distribution([s["ready"] * 1000 for s in servers]),
+        "first_run_ms": _distribution([s["first_run"] * 1000 for s in servers]),
+        "warmup_steps_ms": {
+            name: _distribution([s["warmup"]["steps"][name] * 1000 for s in servers])
+            for name in servers[-1]["warmup"]["steps"]
+        },
+    }
+    results = {
+        "meta": {
+            "timestamp": started.isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "startup": summary,
+    }
+
+    output = args.output or RESULTS_DIR / f"startup-{started:%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+
+    print(f"{'measure':<24}{'p50 ms':>10}{'max ms':>10}")
+    print("-" * 44)
+    rows = [(name, summary[f"{name}_ms"]) for name in ("import", "healthy", "ready", "first_run")]
+    rows += [(f"warmup.{n}", d) for n, d in summary["warmup_steps_ms"].items()]
+    for name, dist in rows:
+        print(f"{name:<24}{dist['p50']:>10.1f}{dist['max']:>10.1f}")
+    print(f"\nresults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
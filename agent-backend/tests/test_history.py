@@ -0,0 +1,130 @@
+"""Client tool results must not put full payloads back in the model's view."""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph.message import add_messages
+
+import app.history
+import app.tools  # noqa: F401  (registers the tool digests)
+from app.digests import digest_sla_compliance
+from app.history import plan_ingestion
+from app.main import agui_messages_to_langchain
+
+PAYLOAD = {
+    "tenant_id": "tenant-demo-001",
+    "period": "2026-10",
+    "uptime_pct": 99.95,
+    "p50_latency_ms": 80,
+    "p95_latency_ms": 210,
+    "p99_latency_ms": 480,
+    "error_rate_pct": 0.12,
+    "incidents": 1,
+    "sla_targets": {
+        "uptime_target_pct": 99.9, "p95_latency_target_ms": 300, "error_rate_target_pct": 0.5,
+    },
+    "compliance_status": {"uptime": "met", "latency": "met", "error_rate": "met"},
+    "hourly_latency": [{"hour": h, "p95_ms": 200 + h} for h in range(24)],
+}
+DIGEST = digest_sla_compliance(PAYLOAD)
+TOOL_CALL = {"id": "call-1", "name": "get_sla_compliance", "args": {"tenant_id": "t"}}
+
+
+def client_history(question: str = "show sla") -> list[dict[str, Any]]:
+    """The transcript as the client holds it after one tool-using turn."""
+    return [
+        {"id": "u1", "role": "user", "content": question},
+        {
+            "id": "a1",
+            "role": "assistant",
+            "content": "",
+            "toolCalls": [{
+                "id": "call-1",
+                "type": "function",
+                "function": {"name": "get_sla_compliance", "arguments": '{"tenant_id": "t"}'},
+            }],
+        },
+        # TOOL_CALL_RESULT content: the full payload
+        {"id": "r1", "role": "tool", "toolCallId": "call-1", "content": json.dumps(PAYLOAD)},
+        {"id": "a2", "role": "assistant", "content": "All SLAs are met."},
+    ]
+
+
+def ingest(agui_messages, checkpoint_messages, index=None):
+    plan, _ = plan_ingestion(agui_messages, checkpoint_messages, index)
+    graph_input = plan.graph_messages(agui_messages_to_langchain(plan.new_messages))
+    return plan, add_messages(checkpoint_messages, graph_input)
+
+
+def tool_contents(messages) -> list[str]:
+    return [m.content for m in messages if isinstance(m, ToolMessage)]
+
+
+def test_rebuild_keeps_the_checkpoint_digest():
+    checkpoint = [
+        HumanMessage("show sla", id="u1"),
+        AIMessage("", id="a1", tool_calls=[TOOL_CALL]),
+        ToolMessage(DIGEST, id="tool-1", tool_call_id="call-1", name="get_sla_compliance"),
+        AIMessage("All SLAs are met.", id="a2"),
+    ]
+    # An edited first message forces a rebuild
+    plan, messages = ingest(client_history("show sla please"), checkpoint, index={
+        "count": 4, "digest": "stale", "checkpoint_len": 4,
+    })
+    assert plan.mode == "rebuild"
+    assert tool_contents(messages) == [DIGEST]
+    assert [m.id for m in messages] == ["u1", "a1", "tool-1", "a2"]
+    assert messages[0].content == "show sla please"
+
+
+def test_rebuild_redigests_tool_results_the_checkpoint_lacks():
+    # The checkpoint lost the tool turn (e.g. another worker ran it)
+    checkpoint = [HumanMessage("show sla", id="u1")]
+    plan, messages = ingest(client_history(), checkpoint, index={
+        "count": 1, "digest": "stale", "checkpoint_len": 1,
+    })
+    assert plan.mode == "rebuild"
+    assert tool_contents(messages) == [DIGEST]
+
+
+def test_fresh_thread_redigests_client_tool_results():
+    plan, messages = ingest(client_history(), [])
+    assert plan.mode == "fresh"
+    assert tool_contents(messages) == [DIGEST]
+    assert [m.name for m in messages if isinstance(m, ToolMessage)] == ["get_sla_compliance"]
+
+
+def test_incremental_turn_hashes_only_new_messages(monkeypatch):
+    history = [{"id": f"m{i}", "role": "user", "content": f"q{i}"} for i in range(200)]
+    _, index = plan_ingestion(history, [], None)
+    checkpoint = agui_messages_to_langchain(history)
+
+    hashed = []
+    fingerprint = app.history._fingerprint
+    monkeypatch.setattr(app.history, "_fingerprint", lambda m: hashed.append(m) or fingerprint(m))
+    history += [{"id": "new", "role": "user", "content": "and channels?"}]
+    plan, next_index = plan_ingestion(history, checkpoint, index)
+    assert plan.mode == "incremental"
+    assert [m["id"] for m in plan.new_messages] == ["new"]
+    # The last known message to check the prefix, then the new one
+    assert [m["id"] for m in hashed] == ["m199", "new"]
+    # Same index as hashing the whole transcript
+    monkeypatch.undo()
+    assert next_index["digest"] == plan_ingestion(history, [], None)[1]["digest"]
+
+
+def test_changed_last_known_message_rebuilds():
+    checkpoint = [HumanMessage("show sla", id="u1")]
+    history = [{"id": "u1", "role": "user", "content": "show sla"}]
+    _, index = plan_ingestion(history, checkpoint, None)
+    edited = [{"id": "u1", "role": "user", "content": "show channels"}]
+    assert plan_ingestion(edited, checkpoint, index)[0].mode == "rebuild"
+
+
+def test_unknown_tool_content_is_kept():
+    history = client_history()
+    history[1]["toolCalls"][0]["function"]["name"] = "frontend_tool"
+    _, messages = ingest(history, [])
+    assert tool_contents(messages) == [json.dumps(PAYLOAD)]
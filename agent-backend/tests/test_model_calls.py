@@ -0,0 +1,58 @@
+"""Model call limits must work on every event loop and forget idle tenants."""
+from __future__ import annotations
+
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from app.config import settings
+from app.llm import MockLLM
+from app.model_calls import ainvoke_model, loop_limiter, model_stats
+
+
+async def calls(tenants: list[str]) -> list[str]:
+    model = MockLLM()
+    responses = await asyncio.gather(*(
+        ainvoke_model(model, [HumanMessage(f"hello {i}")], tenant_id=tenant)
+        for i, tenant in enumerate(tenants)
+    ))
+    assert loop_limiter().in_use() == {}
+    return [r.content for r in responses]
+
+
+def test_limiter_works_across_event_loops():
+    # Each asyncio.run is a new loop; more tenants than global slots makes
+    # calls wait on (and bind) the global semaphore
+    tenants = [f"tenant-{i}" for i in range(2 * settings.llm_max_concurrency)]
+    for _ in range(2):
+        assert all(asyncio.run(calls(tenants)))
+
+
+def test_limiter_drops_idle_tenants():
+    async def run() -> None:
+        await calls([f"tenant-{i}" for i in range(50)])
+        assert loop_limiter()._tenants == {}
+
+    asyncio.run(run())
+    assert model_stats()["tenants_in_flight"] == {}
+
+
+def test_limiter_bounds_tenant_concurrency():
+    async def run() -> int:
+        limiter = loop_limiter()
+        active = peak = 0
+
+        async def call() -> None:
+            nonlocal active, peak
+            async with limiter.slot("busy"):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.001)
+                active -= 1
+
+        await asyncio.gather(*(call() for _ in range(4 * limiter.max_per_tenant)))
+        return peak
+
+    # Contended semaphores bind to their loop: the second run needs its own
+    for _ in range(2):
+        assert asyncio.run(run()) == settings.llm_max_concurrency_per_tenant
@@ -0,0 +1,73 @@
+"""SqliteSaver writes must fail fast, never hang, when the writer can't commit."""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.sqlite_checkpoint import SqliteSaver
+
+
+def config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+class BrokenWriterSaver(SqliteSaver):
+    """A saver whose writer thread cannot open its connection."""
+
+    def _connect(self) -> sqlite3.Connection:
+        if threading.current_thread().name == "checkpoint-writer":
+            raise sqlite3.OperationalError("unable to open database file")
+        return super()._connect()
+
+
+def test_writes_fail_when_the_writer_cannot_connect(tmp_path):
+    saver = BrokenWriterSaver(str(tmp_path / "ckpt.sqlite"))
+    saver._writer.join(timeout=5)
+    assert isinstance(saver.writer_error, sqlite3.OperationalError)
+    for thread_id in ("a", "b"):
+        with pytest.raises(sqlite3.OperationalError):
+            saver.put(config(thread_id), empty_checkpoint(), {}, {})
+
+
+def test_put_and_get_round_trip(tmp_path):
+    saver = SqliteSaver(str(tmp_path / "ckpt.sqlite"))
+    checkpoint = empty_checkpoint()
+    saver.put(config("a"), checkpoint, {"step": 1}, {})
+    loaded = saver.get_tuple(config("a"))
+    assert loaded.checkpoint["id"] == checkpoint["id"]
+    assert loaded.metadata["step"] == 1
+    assert saver.writer_error is None
+
+
+def test_locked_database_fails_the_batch_once(tmp_path):
+    path = str(tmp_path / "ckpt.sqlite")
+    busy_timeout = 0.3
+    saver = SqliteSaver(path, batch_window_seconds=0.05, busy_timeout_seconds=busy_timeout)
+    # Another process holds the write lock
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    errors: list[BaseException] = []
+
+    def put(thread_id: str) -> None:
+        try:
+            saver.put(config(thread_id), empty_checkpoint(), {}, {})
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=put, args=(f"t{i}",)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    holder.execute("ROLLBACK")
+
+    assert len(errors) == 5
+    # One busy timeout for the batch, not one per operation
+    assert elapsed < 3 * busy_timeout
+    saver.put(config("after"), empty_checkpoint(), {}, {})
@@ -0,0 +1,91 @@
+"""json_patch must produce RFC 6902 patches that rebuild the new state exactly."""
+from __future__ import annotations
+
+import copy
+import json
+import random
+from typing import Any
+
+import pytest
+
+from app.state_sync import json_patch
+
+
+def _resolve(doc: Any, pointer: str) -> tuple[Any, str | int]:
+    tokens = [t.replace("~1", "/").replace("~0", "~") for t in pointer.split("/")[1:]]
+    parent = doc
+    for token in tokens[:-1]:
+        parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+    last = tokens[-1]
+    return parent, int(last) if isinstance(parent, list) and last != "-" else last
+
+
+def apply_patch(doc: Any, ops: list[dict[str, Any]]) -> Any:
+    """Minimal RFC 6902 applier (add / remove / replace)."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        if op["path"] == "":
+            assert op["op"] == "replace"
+            doc = copy.deepcopy(op["value"])
+            continue
+        parent, key = _resolve(doc, op["path"])
+        if op["op"] == "remove":
+            del parent[key]
+        elif op["op"] == "add" and isinstance(parent, list):
+            parent.insert(len(parent) if key == "-" else key, copy.deepcopy(op["value"]))
+        else:
+            parent[key] = copy.deepcopy(op["value"])
+    return doc
+
+
+def _canonical(value: Any) -> str:
+    # JSON text keeps true / 1 / 1.0 apart
+    return json.dumps(value, sort_keys=True)
+
+
+@pytest.mark.parametrize("old, new", [
+    ({"k": True}, {"k": 1.0}),
+    ({"k": 1}, {"k": 1.0}),
+    ({"k": [1, True]}, {"k": [1.0, 1]}),
+    ({"a": {"b": [{"c": 0}]}}, {"a": {"b": [{"c": False}]}}),
+    ({"x/y": 1, "m~n": 2}, {"x/y": 2, "m~n": 3}),
+    ({"k": [1, 2, 3]}, {"k": [1]}),
+    ({"k": [1]}, {"k": [1, 2, 3]}),
+    ({"k": {}}, {"k": []}),
+    ([], {}),
+])
+def test_patch_rebuilds_new_state(old: Any, new: Any) -> None:
+    assert _canonical(apply_patch(old, json_patch(old, new))) == _canonical(new)
+
+
+def test_equal_states_give_empty_patch() -> None:
+    state = {"a": [1, {"b": True}], "c": None}
+    assert json_patch(state, copy.deepcopy(state)) == []
+
+
+def _random_value(rng: random.Random, depth: int = 0) -> Any:
+    kind = rng.randrange(8 if depth < 3 else 5)
+    if kind == 0:
+        return rng.choice([True, False, None])
+    if kind == 1:
+        return rng.choice([0, 1, 2])
+    if kind == 2:
+        return rng.choice([0.0, 1.0, 2.5])
+    if kind == 3:
+        return rng.choice(["", "a", "b/c", "d~e"])
+    if kind == 4:
+        return rng.choice([0, 1.0, True])
+    if kind == 5:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {
+        rng.choice(["a", "b", "c", "x/y"]): _random_value(rng, depth + 1)
+        for _ in range(rng.randrange(4))
+    }
+
+
+def test_random_states() -> None:
+    rng = random.Random(0)
+    for _ in range(5000):
+        old, new = _random_value(rng, 1), _random_value(rng, 1)
+        patched = apply_patch(old, json_patch(old, new))
+        assert _canonical(patched) == _canonical(new), (old, new)
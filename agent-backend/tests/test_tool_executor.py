@@ -0,0 +1,42 @@
+"""The tools node must keep every payload of a step, even for a repeated tool."""
+from __future__ import annotations
+
+import asyncio
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import tool
+
+from app.tool_executor import make_tools_node
+
+
+@tool(response_format="content_and_artifact")
+async def get_volume(date_range: str) -> tuple[str, dict]:
+    """Transaction volume over ``date_range``."""
+    payload = {"date_range": date_range, "daily": list(range(30))}
+    return f'{{"date_range":"{date_range}"}}', {"cache": {"hit": False}, "payload": payload}
+
+
+def run_step(tool_calls: list[dict]) -> dict:
+    node = make_tools_node([get_volume], state_keys={"get_volume": "volume"})
+    state = {"messages": [AIMessage("", tool_calls=tool_calls)]}
+    return asyncio.run(node(state, {}))
+
+
+def test_repeated_tool_keeps_both_payloads():
+    update = run_step([
+        {"id": "call-7d", "name": "get_volume", "args": {"date_range": "7d"}},
+        {"id": "call-30d", "name": "get_volume", "args": {"date_range": "30d"}},
+    ])
+    assert {k: v["date_range"] for k, v in update["volume"].items()} == {
+        "call-7d": "7d", "call-30d": "30d",
+    }
+    # Payloads live in the state field only
+    messages = update["messages"]
+    assert all(isinstance(m, ToolMessage) for m in messages)
+    assert [m.artifact for m in messages] == [{"cache": {"hit": False}}] * 2
+
+
+def test_failed_call_writes_no_payload():
+    update = run_step([{"id": "call-bad", "name": "get_volume", "args": {}}])
+    assert "volume" not in update
+    assert update["messages"][0].status == "error"
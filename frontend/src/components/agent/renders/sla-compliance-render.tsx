@@ -22,7 +22,7 @@ interface SlaComplianceData {
     latency: string;
     error_rate: string;
   };
-  incidents_this_month: number;
+  incidents: number;
 }
 
 interface SlaComplianceRenderProps {
@@ -125,8 +125,10 @@ export function SlaComplianceRender({
         <Card>
           <CardContent className="p-3">
             <p className="text-xs text-muted-foreground">Incidents</p>
-            <p className="text-xl font-bold">{result.incidents_this_month}</p>
-            <p className="text-xs text-muted-foreground">This month</p>
+            <p className="text-xl font-bold">{result.incidents}</p>
+            <p className="text-xs text-muted-foreground">
+              {result.period === "current_month" ? "This month" : `Last ${result.period}`}
+            </p>
           </CardContent>
         </Card>
       </div>